@@ -0,0 +1,338 @@
+#!/usr/bin/env python3
+"""
+Market Cache Module
+TTL + LRU cache for market-level aggregates keyed by (city, state), with
+explicit invalidation hooks for ingestion / migration scripts.
+
+Entries live in an in-process LRU and, when REDIS_URL is set, in a shared
+Redis-compatible store as well. Invalidation bumps a per-market generation
+number that is part of every cache key, so stale entries simply stop being
+reachable and age out; with Redis the bump is visible to every worker and
+script immediately. Without Redis, invalidation goes through the running
+API (POST /api/cache/invalidate) and only reaches the worker that serves it.
+
+The same TTLCache also backs the /api/analyze response cache
+(``analysis_cache``): pre-serialized bodies keyed by request, validated by an
+ETag derived from lead / market data versions; and the analyzer memo
+(``analyzer_cache``): CompetitiveAnalyzer output keyed by a content hash of
+the business row, competitor rows and keyword.
+
+While an /api/analyze response is computed, ``market_data_version`` holds
+the market's data version; market entries read in that context are keyed by
+it, so a response behind a new ETag never reuses aggregates from older data.
+
+Invalidate from a script:
+    python api/cache.py invalidate --city Austin --state TX
+    python api/cache.py invalidate --all
+"""
+
+import functools
+import hashlib
+import inspect
+import json
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Optional, Tuple
+from urllib import request as urllib_request
+
+from dotenv import load_dotenv
+
+from json_response import json_default
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:  # Redis is optional; the in-process LRU works on its own
+    aioredis = None
+
+load_dotenv()
+
+MARKET_CACHE_ENABLED = os.getenv('MARKET_CACHE_ENABLED', '1') not in ('0', 'false', 'False')
+MARKET_CACHE_TTL = float(os.getenv('MARKET_CACHE_TTL', '600'))  # seconds
+MARKET_CACHE_MAXSIZE = int(os.getenv('MARKET_CACHE_MAXSIZE', '1024'))
+REDIS_URL = os.getenv('REDIS_URL')
+FUNNEL_API_URL = os.getenv('FUNNEL_API_URL', 'http://localhost:8000')
+ANALYZE_CACHE_TTL = float(os.getenv('ANALYZE_CACHE_TTL', '3600'))  # seconds
+ANALYZE_CACHE_MAXSIZE = int(os.getenv('ANALYZE_CACHE_MAXSIZE', '2048'))
+ANALYZER_CACHE_TTL = float(os.getenv('ANALYZER_CACHE_TTL', '86400'))  # seconds
+ANALYZER_CACHE_MAXSIZE = int(os.getenv('ANALYZER_CACHE_MAXSIZE', '4096'))
+
+KEY_PREFIX = 'market-cache'
+ALL_MARKETS = '*'
+
+# Data version of the market behind the response being computed (set by the
+# funnel API from its ETag versions); part of every market cache key when set
+market_data_version: ContextVar[Optional[str]] = ContextVar('market_data_version', default=None)
+
+
+def market_key(city: Optional[str], state: Optional[str]) -> str:
+    """Normalized market identifier used in cache keys"""
+    return f"{(city or '').strip().lower()}|{(state or '').strip().lower()}"
+
+
+class TTLCache:
+    """Thread-safe in-process LRU whose entries also expire after ``ttl`` seconds"""
+
+    def __init__(self, maxsize: int = MARKET_CACHE_MAXSIZE, ttl: float = MARKET_CACHE_TTL):
+        self.maxsize = max(1, maxsize)
+        self.ttl = ttl
+        self._data: 'OrderedDict[str, Tuple[float, Any]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.counters = {'hits': 0, 'misses': 0, 'evictions': 0, 'expirations': 0, 'sets': 0}
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        """Return ``(found, value)``, dropping the entry if it has expired"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.counters['misses'] += 1
+                return False, None
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                self.counters['expirations'] += 1
+                self.counters['misses'] += 1
+                return False, None
+            self._data.move_to_end(key)
+            self.counters['hits'] += 1
+            return True, value
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        with self._lock:
+            self._data[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+            self._data.move_to_end(key)
+            self.counters['sets'] += 1
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.counters['evictions'] += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class MarketCache:
+    """
+    Market-keyed cache: in-process TTLCache, optionally backed by Redis
+    """
+
+    def __init__(
+        self,
+        enabled: bool = MARKET_CACHE_ENABLED,
+        maxsize: int = MARKET_CACHE_MAXSIZE,
+        ttl: float = MARKET_CACHE_TTL,
+        redis_url: Optional[str] = REDIS_URL,
+    ):
+        self.enabled = enabled
+        self.ttl = ttl
+        self.local = TTLCache(maxsize, ttl)
+        self._generations: Dict[str, int] = {}
+        self._redis = aioredis.from_url(redis_url) if (redis_url and aioredis) else None
+        self.counters = {'invalidations': 0, 'redis_hits': 0, 'redis_errors': 0}
+
+    async def _generation(self, market: str) -> str:
+        """Current '<all>.<market>' generation tag for a market"""
+        if self._redis is not None:
+            try:
+                all_gen, market_gen = await self._redis.mget(
+                    f"{KEY_PREFIX}:gen:{ALL_MARKETS}",
+                    f"{KEY_PREFIX}:gen:{market}",
+                )
+                return f"{int(all_gen or 0)}.{int(market_gen or 0)}"
+            except Exception as e:
+                self.counters['redis_errors'] += 1
+                print(f"Market cache: Redis unavailable, using local generations ({e})")
+        return f"{self._generations.get(ALL_MARKETS, 0)}.{self._generations.get(market, 0)}"
+
+    async def generation(self, city: Optional[str], state: Optional[str]) -> str:
+        """Generation tag that changes whenever the market is invalidated"""
+        return await self._generation(market_key(city, state))
+
+    async def key(self, namespace: str, city: str, state: str, extra: str = '') -> str:
+        market = market_key(city, state)
+        generation = await self._generation(market)
+        return f"{KEY_PREFIX}:{namespace}:{market}:{generation}:{extra}"
+
+    async def get(self, key: str) -> Tuple[bool, Any]:
+        found, value = self.local.get(key)
+        if found or self._redis is None:
+            return found, value
+        try:
+            raw = await self._redis.get(key)
+        except Exception as e:
+            self.counters['redis_errors'] += 1
+            print(f"Market cache: Redis get failed ({e})")
+            return False, None
+        if raw is None:
+            return False, None
+        value = json.loads(raw)
+        self.counters['redis_hits'] += 1
+        self.local.set(key, value)
+        return True, value
+
+    async def set(self, key: str, value: Any):
+        self.local.set(key, value)
+        if self._redis is not None:
+            try:
+                await self._redis.set(key, json.dumps(value, default=json_default), ex=max(1, int(self.ttl)))
+            except Exception as e:
+                self.counters['redis_errors'] += 1
+                print(f"Market cache: Redis set failed ({e})")
+
+    async def invalidate_market(self, city: Optional[str] = None, state: Optional[str] = None) -> str:
+        """
+        Invalidate every cached aggregate for one market, or for all markets
+        when city/state are omitted. Returns the invalidated market key.
+
+        Raises:
+            ValueError: only one of city/state was given
+        """
+        if bool(city) != bool(state):
+            raise ValueError('pass both city and state, or neither to invalidate all markets')
+        market = market_key(city, state) if city else ALL_MARKETS
+        self._generations[market] = self._generations.get(market, 0) + 1
+        self.counters['invalidations'] += 1
+        if market == ALL_MARKETS:
+            self.local.clear()
+        if self._redis is not None:
+            try:
+                await self._redis.incr(f"{KEY_PREFIX}:gen:{market}")
+            except Exception as e:
+                self.counters['redis_errors'] += 1
+                print(f"Market cache: Redis invalidation failed ({e})")
+        return market
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'enabled': self.enabled,
+            'backend': 'memory+redis' if self._redis is not None else 'memory',
+            'size': len(self.local),
+            'maxsize': self.local.maxsize,
+            'ttl_seconds': self.ttl,
+            **self.local.counters,
+            **self.counters,
+        }
+
+
+market_cache = MarketCache()
+
+# /api/analyze responses: {'etag', 'body', 'business_id'} per request key
+analysis_cache = TTLCache(ANALYZE_CACHE_MAXSIZE, ANALYZE_CACHE_TTL)
+
+# CompetitiveAnalyzer (analysis, pitch) results per content_hash of their inputs
+analyzer_cache = TTLCache(ANALYZER_CACHE_MAXSIZE, ANALYZER_CACHE_TTL)
+
+
+def content_hash(*parts: Any) -> str:
+    """Stable digest of JSON-like values (dict key order doesn't matter)"""
+    return hashlib.sha1(json.dumps(parts, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def response_etag(*parts: Any) -> str:
+    """Weak ETag over the values that determine a response"""
+    digest = hashlib.sha1(json.dumps(parts, default=str).encode()).hexdigest()
+    return f'W/"{digest}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match check using weak comparison (RFC 9110 13.1.2)"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    opaque = etag[2:] if etag.startswith('W/') else etag
+    for candidate in if_none_match.split(','):
+        candidate = candidate.strip()
+        if (candidate[2:] if candidate.startswith('W/') else candidate) == opaque:
+            return True
+    return False
+
+
+def cached_market(namespace: str):
+    """
+    Cache an async market query by its (city, state) market plus its other
+    arguments. Results carrying an 'error' key are never cached.
+
+    Usage:
+        @cached_market('market_intelligence')
+        async def get_market_intelligence(city, state, niche='med spa'): ...
+    """
+    def decorator(func: Callable):
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            if not market_cache.enabled:
+                return await func(*args, **kwargs)
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            params = dict(bound.arguments)
+            city, state = params.pop('city', None), params.pop('state', None)
+            extra = json.dumps(params, sort_keys=True, default=str)
+            version = market_data_version.get()
+            if version:
+                extra = f"{extra}@{version}"
+            key = await market_cache.key(namespace, city, state, extra)
+
+            found, value = await market_cache.get(key)
+            if found:
+                return value
+            value = await func(*args, **kwargs)
+            if not (isinstance(value, dict) and 'error' in value):
+                await market_cache.set(key, value)
+            return value
+
+        return wrapper
+    return decorator
+
+
+def _invalidate_via_api(city: Optional[str], state: Optional[str]) -> Dict[str, Any]:
+    """Ask a running funnel API to drop its in-process entries"""
+    body = json.dumps({'city': city, 'state': state}).encode()
+    req = urllib_request.Request(
+        f"{FUNNEL_API_URL}/api/cache/invalidate",
+        data=body,
+        headers={'Content-Type': 'application/json'},
+        method='POST',
+    )
+    with urllib_request.urlopen(req, timeout=10) as response:
+        return json.loads(response.read())
+
+
+def main(argv=None):
+    """CLI entry point for ingestion / migration scripts"""
+    import argparse
+    import asyncio
+
+    parser = argparse.ArgumentParser(description='Invalidate cached market aggregates')
+    sub = parser.add_subparsers(dest='command', required=True)
+    inv = sub.add_parser('invalidate', help='Invalidate one market or all markets')
+    inv.add_argument('--city')
+    inv.add_argument('--state')
+    inv.add_argument('--all', action='store_true', help='Invalidate every market')
+    args = parser.parse_args(argv)
+
+    if not args.all and not (args.city and args.state):
+        parser.error('pass --city and --state, or --all')
+    city, state = (None, None) if args.all else (args.city, args.state)
+
+    if market_cache._redis is not None:
+        # Every worker reads generations from Redis, so one bump reaches them all
+        market = asyncio.run(market_cache.invalidate_market(city, state))
+        print(f"✅ Invalidated market cache for '{market}' (redis)")
+        return
+    try:
+        result = _invalidate_via_api(city, state)
+    except Exception as e:
+        print(f"❌ Could not reach funnel API at {FUNNEL_API_URL}: {e}")
+        sys.exit(1)
+    print(f"✅ Invalidated market cache for '{result.get('market')}' ({FUNNEL_API_URL})")
+
+if __name__ == '__main__':
+    main()
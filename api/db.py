@@ -0,0 +1,102 @@
+"""
+Database Connection Pool Module
+Process-wide pooled Postgres connections shared by the funnel API and
+market intelligence queries, so requests stop paying a TLS + auth handshake
+to Neon for every query.
+
+The pool is an async psycopg 3 pool, so FastAPI handlers never block the
+uvicorn event loop on a query. Its connections hand out TracedAsyncCursor,
+so every statement is timed into the request trace and /metrics (tracing.py).
+"""
+
+import asyncio
+import os
+import time
+from typing import Any, Dict, Optional
+
+from psycopg import AsyncCursor
+from psycopg_pool import AsyncConnectionPool
+from dotenv import load_dotenv
+
+from tracing import record_sql
+
+load_dotenv()
+
+DATABASE_URL = os.getenv('DATABASE_URL')
+
+# Pool sizing / lifecycle, overridable through the environment
+POOL_MIN_SIZE = int(os.getenv('DB_POOL_MIN_SIZE', '1'))
+POOL_MAX_SIZE = int(os.getenv('DB_POOL_MAX_SIZE', '10'))
+POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', '10'))  # seconds to wait for a free connection
+POOL_MAX_IDLE = float(os.getenv('DB_POOL_MAX_IDLE', '300'))  # seconds before an idle connection is reaped
+
+
+class TracedAsyncCursor(AsyncCursor):
+    """
+    Async cursor that reports every statement's fingerprint, row count and
+    duration to the request tracer (tracing.record_sql)
+    """
+
+    async def execute(self, query, params=None, **kwargs):
+        started = time.perf_counter()
+        try:
+            result = await super().execute(query, params, **kwargs)
+        except Exception:
+            record_sql(query, time.perf_counter() - started, None, failed=True)
+            raise
+        record_sql(query, time.perf_counter() - started, self.rowcount)
+        return result
+
+
+_async_pool: Optional[AsyncConnectionPool] = None
+_async_pool_lock: Optional[asyncio.Lock] = None
+
+
+async def init_async_pool(dsn: Optional[str] = None) -> AsyncConnectionPool:
+    """Open the process-wide async pool using the same DB_POOL_* settings"""
+    global _async_pool
+    if _async_pool is not None:
+        await _async_pool.close()
+    pool = AsyncConnectionPool(
+        dsn or DATABASE_URL or '',
+        min_size=POOL_MIN_SIZE,
+        max_size=max(POOL_MAX_SIZE, POOL_MIN_SIZE),
+        timeout=POOL_TIMEOUT,
+        max_idle=POOL_MAX_IDLE,
+        check=AsyncConnectionPool.check_connection,
+        # Autocommit: single-statement reads don't leave the connection INTRANS
+        # when it's returned (which makes the pool warn and issue a ROLLBACK);
+        # writes that need atomicity use an explicit conn.transaction() block
+        kwargs={'cursor_factory': TracedAsyncCursor, 'autocommit': True},
+        open=False,
+    )
+    await pool.open()
+    _async_pool = pool
+    return pool
+
+
+async def get_async_pool() -> AsyncConnectionPool:
+    """Return the async pool, opening it from DATABASE_URL on first use"""
+    global _async_pool_lock
+    if _async_pool is None:
+        if _async_pool_lock is None:
+            _async_pool_lock = asyncio.Lock()
+        async with _async_pool_lock:
+            if _async_pool is None:
+                await init_async_pool()
+    return _async_pool
+
+
+async def close_async_pool():
+    """Close the async pool (e.g. on application shutdown)"""
+    global _async_pool
+    if _async_pool is not None:
+        await _async_pool.close()
+        _async_pool = None
+
+
+def async_pool_stats() -> Dict[str, Any]:
+    """Snapshot of async pool occupancy and wait metrics (psycopg_pool counters)"""
+    if _async_pool is None:
+        return {}
+    return _async_pool.get_stats()
@@ -0,0 +1,392 @@
+"""
+Conversion Event Writer Module
+Buffered, append-only ingestion for /api/track-conversion. Requests only
+append to an in-memory buffer; a background task flushes it to the
+partitioned ``conversion_events`` table with COPY every EVENTS_FLUSH_INTERVAL
+seconds or as soon as EVENTS_BATCH_SIZE events are waiting.
+
+When the database is unreachable a batch is written to a local segment file
+(JSONL under EVENTS_SPOOL_DIR) instead, and segments are replayed oldest
+first once COPY succeeds again. Segments are claimed by rename, so several
+workers can share one spool directory. A batch the database rejects for its
+data (e.g. a value too long for its column) would fail on every retry, so it
+is set aside as a *.rejected segment instead of blocking the replay queue.
+A worker started without a database spools every batch straight away.
+
+The flush loop creates the current and next month's partitions on startup
+and again whenever the UTC month changes, so a long-running worker never
+writes a month's events into the default partition.
+
+Backpressure: once EVENTS_MAX_BUFFER events are buffered or in flight,
+``append`` raises EventBufferFull and the endpoint answers 503 instead of
+growing memory without bound. ``stop`` (the FastAPI shutdown hook) flushes
+whatever is still buffered.
+"""
+
+import asyncio
+import json
+import os
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from psycopg import errors as pg_errors
+from psycopg.types.json import Jsonb
+
+from db import get_async_pool
+from tracing import span
+
+EVENTS_BATCH_SIZE = int(os.getenv('EVENTS_BATCH_SIZE', '500'))
+EVENTS_FLUSH_INTERVAL = float(os.getenv('EVENTS_FLUSH_INTERVAL', '1'))  # seconds
+EVENTS_MAX_BUFFER = int(os.getenv('EVENTS_MAX_BUFFER', '20000'))
+EVENTS_COPY_TIMEOUT = float(os.getenv('EVENTS_COPY_TIMEOUT', '5'))  # seconds before a batch is spooled instead
+EVENTS_SPOOL_DIR = Path(os.getenv('EVENTS_SPOOL_DIR', str(Path(__file__).resolve().parent / 'event_spool')))
+EVENTS_SPOOL_MAX_BYTES = int(os.getenv('EVENTS_SPOOL_MAX_BYTES', str(256 * 1024 * 1024)))
+
+# Segments replayed per successful flush, so recovery after an outage
+# doesn't starve new events
+SPOOL_REPLAY_PER_FLUSH = 4
+
+# Seconds between attempts to create partitions after a failed attempt
+PARTITION_RETRY_INTERVAL = 60
+
+# conversion_events column limits (migrations/create_conversion_events_table.sql)
+BUSINESS_ID_MAX_LENGTH = 64
+ACTION_MAX_LENGTH = 100
+
+# COPY failures caused by the rows themselves; retrying the batch can't succeed
+REJECTED_BATCH_ERRORS = (pg_errors.DataError, pg_errors.IntegrityError)
+
+COPY_COLUMNS = ('event_id', 'occurred_at', 'business_id', 'action', 'value', 'metadata')
+COPY_SQL = f"COPY conversion_events ({', '.join(COPY_COLUMNS)}) FROM STDIN"
+
+
+class EventBufferFull(Exception):
+    """Raised by ``append`` when the buffer is at EVENTS_MAX_BUFFER"""
+
+
+class EventBatchRejected(Exception):
+    """Raised by ``_copy`` when the database rejects a batch's data"""
+
+
+def conversion_event(business_id: str, action: str, value: Optional[float] = None,
+                     metadata: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """JSON-serializable event record (the same shape is written to spool segments)"""
+    return {
+        'event_id': str(uuid.uuid4()),
+        'occurred_at': datetime.now(timezone.utc).isoformat(),
+        'business_id': business_id,
+        'action': action,
+        'value': value,
+        'metadata': metadata or {},
+    }
+
+
+class ConversionEventWriter:
+    """
+    In-memory event buffer flushed with COPY, with a local segment-file
+    fallback while the database is down
+
+    Usage:
+        await writer.start()
+        writer.append(conversion_event(business_id, action))
+        await writer.stop()  # flushes
+    """
+
+    def __init__(
+        self,
+        batch_size: int = EVENTS_BATCH_SIZE,
+        flush_interval: float = EVENTS_FLUSH_INTERVAL,
+        max_buffer: int = EVENTS_MAX_BUFFER,
+        copy_timeout: float = EVENTS_COPY_TIMEOUT,
+        spool_dir: Path = EVENTS_SPOOL_DIR,
+        spool_max_bytes: int = EVENTS_SPOOL_MAX_BYTES,
+    ):
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.max_buffer = max(self.batch_size, max_buffer)
+        self.copy_timeout = copy_timeout
+        self.spool_dir = Path(spool_dir)
+        self.spool_max_bytes = spool_max_bytes
+
+        self._buffer: List[Dict[str, Any]] = []
+        self._in_flight = 0
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+        self._database = True
+        self._partition_month = None  # first day of the month partitions were last created for
+        self._partition_attempted_at = 0.0
+        self.counters = {
+            'accepted': 0,
+            'rejected': 0,
+            'written': 0,
+            'spooled': 0,
+            'replayed': 0,
+            'spool_dropped': 0,
+            'copy_failures': 0,
+            'quarantined': 0,
+        }
+
+    def append(self, event: Dict[str, Any]):
+        """Buffer one event without blocking; raises EventBufferFull under backpressure"""
+        if len(self._buffer) + self._in_flight >= self.max_buffer:
+            self.counters['rejected'] += 1
+            raise EventBufferFull(f'{self.max_buffer} conversion events already pending')
+        self._buffer.append(event)
+        self.counters['accepted'] += 1
+        if len(self._buffer) >= self.batch_size and self._wakeup is not None:
+            self._wakeup.set()
+
+    async def start(self, database: bool = True):
+        """
+        Start the background flush loop (FastAPI startup hook); with
+        ``database=False`` (no DATABASE_URL) batches go straight to the spool
+        """
+        self._flush_lock = asyncio.Lock()
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+        self._database = database
+        await asyncio.to_thread(self._release_stale_claims)
+        if database:
+            await self.ensure_partitions()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the flush loop and flush everything still buffered"""
+        if self._task is not None:
+            # Let an in-flight COPY finish rather than cancelling it mid-batch
+            self._stopping = True
+            self._wakeup.set()
+            await self._task
+            self._task = None
+        while self._buffer:
+            await self.flush(replay=False)
+
+    async def _run(self):
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            if self._stopping:
+                return
+            await self._roll_partitions()
+            try:
+                await self.flush()
+            except Exception as e:
+                print(f"Error flushing conversion events: {e}")
+            if len(self._buffer) >= self.batch_size:
+                self._wakeup.set()
+
+    async def flush(self, replay: bool = True) -> int:
+        """
+        Write up to one batch of buffered events; returns how many were taken.
+        Spools the batch if COPY fails (or there is no database), otherwise
+        replays pending segments
+        """
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+        async with self._flush_lock:
+            batch = self._buffer[:self.batch_size]
+            del self._buffer[:len(batch)]
+            self._in_flight = len(batch)
+            try:
+                if not self._database:
+                    if batch:
+                        await asyncio.to_thread(self._spool, batch)
+                    return len(batch)
+                if batch:
+                    try:
+                        copied = await self._copy(batch)
+                    except EventBatchRejected:
+                        await asyncio.to_thread(self._spool, batch, '.rejected')
+                        return len(batch)
+                    if copied:
+                        self.counters['written'] += len(batch)
+                    else:
+                        await asyncio.to_thread(self._spool, batch)
+                        return len(batch)
+                if replay:
+                    await self._replay_spool()
+                return len(batch)
+            finally:
+                self._in_flight = 0
+
+    async def _copy(self, events: List[Dict[str, Any]]) -> bool:
+        """
+        COPY a batch into conversion_events in one transaction; False on a
+        failure worth retrying (database down, timeout), EventBatchRejected
+        when the rows themselves are invalid
+        """
+        try:
+            with span('events_copy'):
+                await asyncio.wait_for(self._copy_rows(events), self.copy_timeout)
+            return True
+        except REJECTED_BATCH_ERRORS as e:
+            self.counters['copy_failures'] += 1
+            self.counters['quarantined'] += len(events)
+            print(f"Conversion event batch of {len(events)} rejected by the database: {e!r}")
+            raise EventBatchRejected(str(e)) from e
+        except Exception as e:
+            self.counters['copy_failures'] += 1
+            print(f"Error writing {len(events)} conversion events, spooling: {e!r}")
+            return False
+
+    async def _copy_rows(self, events: List[Dict[str, Any]]):
+        pool = await get_async_pool()
+        conn = await pool.getconn()
+        try:
+            async with conn.transaction():
+                cur = conn.cursor()
+                try:
+                    async with cur.copy(COPY_SQL) as copy:
+                        for event in events:
+                            await copy.write_row((
+                                event['event_id'],
+                                event['occurred_at'],
+                                event['business_id'],
+                                event['action'],
+                                event['value'],
+                                Jsonb(event['metadata']),
+                            ))
+                finally:
+                    await cur.close()
+        finally:
+            await pool.putconn(conn)
+
+    def _spool_size(self) -> int:
+        return sum(path.stat().st_size for path in self.spool_dir.glob('*.jsonl'))
+
+    def _spool(self, events: List[Dict[str, Any]], suffix: str = '.jsonl'):
+        """
+        Write a batch to a new segment file (tmp + rename, so readers never
+        see a partial one); suffix '.rejected' sets it aside instead of queueing it
+        """
+        try:
+            self.spool_dir.mkdir(parents=True, exist_ok=True)
+            payload = ''.join(json.dumps(event, separators=(',', ':')) + '\n' for event in events).encode()
+            if self._spool_size() + len(payload) > self.spool_max_bytes:
+                self.counters['spool_dropped'] += len(events)
+                print(f"Conversion event spool is full ({self.spool_max_bytes} bytes), dropping {len(events)} events")
+                return
+            name = f"{time.time_ns():020d}-{os.getpid()}"
+            tmp_path = self.spool_dir / f"{name}.tmp"
+            tmp_path.write_bytes(payload)
+            os.replace(tmp_path, self.spool_dir / f"{name}{suffix}")
+            if suffix == '.jsonl':
+                self.counters['spooled'] += len(events)
+        except OSError as e:
+            self.counters['spool_dropped'] += len(events)
+            print(f"Error spooling {len(events)} conversion events: {e}")
+
+    def _claim_segments(self, limit: int) -> List[Path]:
+        """Rename the oldest segments to *.replaying-<pid>; a lost rename race means another worker has it"""
+        if not self.spool_dir.is_dir():
+            return []
+        claimed = []
+        for path in sorted(self.spool_dir.glob('*.jsonl'))[:limit]:
+            target = path.with_name(f"{path.stem}.replaying-{os.getpid()}")
+            try:
+                os.rename(path, target)
+            except OSError:
+                continue
+            claimed.append(target)
+        return claimed
+
+    def _release_stale_claims(self):
+        """Return segments claimed by workers that have since exited to the queue"""
+        if not self.spool_dir.is_dir():
+            return
+        for path in self.spool_dir.glob('*.replaying-*'):
+            pid = int(path.name.rsplit('-', 1)[-1])
+            try:
+                if pid != os.getpid():
+                    os.kill(pid, 0)
+                    continue
+            except ProcessLookupError:
+                pass
+            except (PermissionError, ValueError):
+                continue
+            try:
+                os.rename(path, path.with_name(f"{path.name.split('.')[0]}.jsonl"))
+            except OSError:
+                pass
+
+    async def _replay_spool(self):
+        claimed = await asyncio.to_thread(self._claim_segments, SPOOL_REPLAY_PER_FLUSH)
+        for index, segment in enumerate(claimed):
+            try:
+                events = [json.loads(line) for line in segment.read_text().splitlines() if line.strip()]
+            except (OSError, ValueError) as e:
+                print(f"Error reading conversion event segment {segment.name}: {e}")
+                segment.rename(segment.with_suffix('.corrupt'))
+                continue
+            try:
+                copied = await self._copy(events)
+            except EventBatchRejected:
+                # Would fail on every retry; set it aside so newer segments still replay
+                segment.rename(segment.with_name(f"{segment.name.split('.')[0]}.rejected"))
+                continue
+            if not copied:
+                # Still down: put this and the rest of the claim back for the next attempt
+                for pending in claimed[index:]:
+                    os.rename(pending, pending.with_name(f"{pending.name.split('.')[0]}.jsonl"))
+                return
+            segment.unlink()
+            self.counters['replayed'] += len(events)
+
+    async def _roll_partitions(self):
+        """Create partitions again once the UTC month has changed (retrying failures at most every PARTITION_RETRY_INTERVAL)"""
+        month = datetime.now(timezone.utc).date().replace(day=1)
+        if not self._database or month == self._partition_month:
+            return
+        if time.monotonic() - self._partition_attempted_at < PARTITION_RETRY_INTERVAL:
+            return
+        await self.ensure_partitions()
+
+    async def ensure_partitions(self) -> bool:
+        """Create this and next month's partitions; failures only mean events land in the default partition"""
+        self._partition_attempted_at = time.monotonic()
+        try:
+            pool = await get_async_pool()
+            conn = await pool.getconn()
+            try:
+                async with conn.transaction():
+                    cur = conn.cursor()
+                    try:
+                        month = datetime.now(timezone.utc).date().replace(day=1)
+                        for partition_month in (month, month + timedelta(days=32)):
+                            await cur.execute("SELECT create_conversion_events_partition(%s)", [partition_month])
+                    finally:
+                        await cur.close()
+            finally:
+                await pool.putconn(conn)
+        except Exception as e:
+            print(f"Error creating conversion event partitions: {e}")
+            return False
+        self._partition_month = month
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        """Buffer depth, spool backlog and throughput counters"""
+        try:
+            spool_segments = len(list(self.spool_dir.glob('*.jsonl'))) if self.spool_dir.is_dir() else 0
+            quarantined_segments = len(list(self.spool_dir.glob('*.rejected'))) if self.spool_dir.is_dir() else 0
+        except OSError:
+            spool_segments = quarantined_segments = 0
+        return {
+            'buffered': len(self._buffer),
+            'in_flight': self._in_flight,
+            'max_buffer': self.max_buffer,
+            'spool_segments': spool_segments,
+            'quarantined_segments': quarantined_segments,
+            **self.counters,
+        }
+
+
+conversion_writer = ConversionEventWriter()
@@ -4,16 +4,18 @@ FastAPI backend for sales funnel
 Serves personalized data to Next.js frontend
 """
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import FileResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
-from typing import Dict, List, Optional
+from typing import Any, Awaitable, Dict, List, Optional, Tuple
+import asyncio
 import json
+import logging
 import os
 import sys
 from pathlib import Path
-import psycopg2
-from psycopg2.extras import RealDictCursor
+from psycopg.rows import dict_row
 
 # Add project root and sales_funnel to sys.path for imports when running directly
 PROJECT_ROOT = Path(__file__).resolve().parents[2]
@@ -29,11 +31,69 @@ from config.config import Config
 from market_intelligence import (
     get_market_intelligence, 
     get_business_percentile,
+    get_market_percentiles,
+    get_market_competitors,
+    get_nearest_markets,
+    get_nearest_markets_to_point,
+    MARKET_COMPETITORS_TOP_N,
     get_rollup_market_stats,
     get_detailed_competitors
 )
+from cache import (
+    market_cache,
+    market_data_version,
+    analysis_cache,
+    analyzer_cache,
+    content_hash,
+    response_etag,
+    etag_matches,
+)
+from json_response import OrjsonResponse, dumps
+from name_search import name_match_sql, name_match_params
+from db import init_async_pool, get_async_pool, close_async_pool, async_pool_stats
+from events import conversion_writer, conversion_event, EventBufferFull, BUSINESS_ID_MAX_LENGTH, ACTION_MAX_LENGTH
+from reports import report_queue, ReportQueueFull
+from rank_checker import (
+    rank_checker,
+    RankCheckRateLimited,
+    RankCheckUnavailable,
+    RANK_CHECK_PREWARM,
+)
+from tracing import (
+    span,
+    start_trace,
+    end_trace,
+    record_request,
+    render_metrics,
+    server_timing,
+    SERVER_TIMING_ENABLED,
+)
+
+logger = logging.getLogger(__name__)
 
-app = FastAPI()
+app = FastAPI(default_response_class=OrjsonResponse)
+
+@app.on_event("startup")
+async def open_db_pool():
+    """Open the shared async connection pool once per worker process"""
+    db_url = Config.DATABASE_URL or os.getenv('DATABASE_URL')
+    if db_url:
+        await init_async_pool(db_url)
+    await conversion_writer.start(database=bool(db_url))
+    await report_queue.start()
+    if RANK_CHECK_PREWARM:
+        try:
+            await rank_checker.pool.start()
+        except RankCheckUnavailable as e:
+            logger.warning("Rank checker browser not prewarmed: %s", e)
+
+@app.on_event("shutdown")
+async def close_db_pool():
+    # Stop DB users while the pool is still open; buffered conversion events are flushed
+    await report_queue.stop()
+    await rank_checker.close()
+    await conversion_writer.stop()
+    await close_async_pool()
 
 # Configure CORS
 app.add_middleware(
@@ -42,16 +102,67 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing", "ETag"],
 )
 
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    """
+    Open a span trace for the request, record its latency by route and,
+    when SERVER_TIMING_ENABLED (or the client sends ``X-Server-Timing: 1``),
+    report the per-stage / SQL breakdown in a Server-Timing header.
+    Streaming responses are timed up to their first byte.
+    """
+    trace, token = start_trace()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        if SERVER_TIMING_ENABLED or request.headers.get('x-server-timing') == '1':
+            response.headers['Server-Timing'] = server_timing(trace)
+        return response
+    finally:
+        # Label by route template so /metrics cardinality stays bounded
+        route = getattr(request.scope.get('route'), 'path', 'unmatched')
+        record_request(request.method, route, status, trace.elapsed_ms() / 1000)
+        end_trace(token)
+
+# Per-stage timeouts (seconds) for the concurrent lookups in /api/analyze
+STAGE_TIMEOUTS = {
+    'competitors': float(os.getenv('ANALYZE_COMPETITORS_TIMEOUT', '5')),
+    'reviews': float(os.getenv('ANALYZE_REVIEWS_TIMEOUT', '3')),
+    'market_intel': float(os.getenv('ANALYZE_MARKET_INTEL_TIMEOUT', '8')),
+    'business_percentile': float(os.getenv('ANALYZE_PERCENTILE_TIMEOUT', '5')),
+}
+
+async def run_stage(name: str, awaitable: Awaitable, default: Any, degraded: List[str]) -> Any:
+    """
+    Await one analysis stage under its timeout, returning ``default`` (and
+    recording the stage in ``degraded``) if it times out or raises
+    """
+    timeout = STAGE_TIMEOUTS.get(name, 5.0)
+    try:
+        with span(name):
+            return await asyncio.wait_for(awaitable, timeout)
+    except asyncio.TimeoutError:
+        logger.warning("[analyze] stage '%s' timed out after %.1fs", name, timeout)
+    except Exception:
+        logger.exception("[analyze] stage '%s' failed", name)
+    degraded.append(name)
+    return default
+
 class AnalysisRequest(BaseModel):
     business_id: Optional[str] = None
     business_name: Optional[str] = None
     niche: Optional[str] = "med spas"
     city: Optional[str] = "Austin"
 
+# Bump when the /api/analyze response shape changes so cached ETags expire
+ANALYZE_RESPONSE_VERSION = 1
+
 @app.get("/api/analyze")
 async def analyze_business(
+    request: Request,
     id: Optional[str] = None,
     name: Optional[str] = None,
     niche: Optional[str] = "med spas",
@@ -59,142 +170,279 @@ async def analyze_business(
 ):
     """
     Analyze a business and return personalized funnel data
+    Responses carry an ETag derived from the lead / market data versions;
+    repeat views revalidate with If-None-Match and get 304 or a cached body
     """
     
     try:
+        cache_key = json.dumps(['analyze', id, name, niche, city])
+        cached, entry = analysis_cache.get(cache_key)
+        if_none_match = request.headers.get('if-none-match')
+
+        # Name lookups learn their lead id on the first computation
+        etag = market_version = None
+        business_id = id or (entry['business_id'] if cached else None)
+        if business_id:
+            etag, market_version = await analysis_etag(cache_key, business_id, niche, city)
+            if etag and etag_matches(if_none_match, etag):
+                return Response(status_code=304, headers={'ETag': etag, 'Cache-Control': 'no-cache'})
+            if etag and cached and entry['etag'] == etag:
+                return Response(content=entry['body'], media_type='application/json',
+                                headers={'ETag': etag, 'Cache-Control': 'no-cache'})
+
         # Load business data (from your scraped data)
-        business_data = load_business_data(id, name, niche, city)
+        with span('load_business'):
+            business_data = await load_business_data(id, name, niche, city)
         
         if not business_data:
             # Use demo data if not found
             business_data = get_demo_business()
+        elif str(business_data.get('id')) != str(business_id):
+            # Read versions before the analysis so the ETag never claims newer data than the body
+            business_id = str(business_data.get('id'))
+            etag, market_version = await analysis_etag(cache_key, business_id, niche, city)
+            if etag and etag_matches(if_none_match, etag):
+                return Response(status_code=304, headers={'ETag': etag, 'Cache-Control': 'no-cache'})
         
-        # Prefer the lead's actual city/niche if not provided
-        effective_city = city or business_data.get('city') or "Austin"
-        effective_state = business_data.get('state')
-        effective_niche = niche or business_data.get('search_niche') or "med spas"
+        response = await run_analysis(business_data, niche, city, market_version)
 
-        # Load competitor data using effective location, excluding the business itself
-        competitors = load_competitor_data(
-            effective_niche,
-            effective_city,
-            state=effective_state,
-            exclude_id=business_data.get('id'),
-            exclude_name=business_data.get('business_name'),
-        )
-        # Debug log: show selected competitors from DB
-        try:
-            print('[analyze] selected_competitors:', [
-                {
-                    'name': c.get('business_name'),
-                    'rating': c.get('rating'),
-                    'review_count': c.get('review_count'),
-                    'local_pack_rank': c.get('local_pack_rank'),
-                    'city': c.get('city'),
-                    'state': c.get('state'),
-                } for c in (competitors or [])
-            ])
-        except Exception:
-            pass
-        
-        # Run competitive analysis
-        analyzer = CompetitiveAnalyzer()
-        analysis = analyzer.analyze_business_ranking(
-            business_data, 
-            competitors,
-            keyword=f"{effective_niche} {effective_city}"
-        )
-        
-        # Generate pitch data
-        pitch = analyzer.generate_pitch_data(analysis)
-        
-        # If we have reviews, analyze them too
-        reviews = load_reviews(business_data.get('business_name'))
-        reputation_analysis = None
-        if reviews:
-            review_analyzer = ReviewAnalyzer()
-            reputation_analysis = review_analyzer.analyze_reviews(reviews)
-            reputation_pitch = review_analyzer.generate_reputation_pitch(
-                reputation_analysis, 
-                business_data.get('business_name')
-            )
-            pitch['reputation'] = reputation_pitch
-        
-        # Calculate additional insights
-        competitors_avg_reviews = sum(c.get('review_count', 0) for c in competitors) / len(competitors) if competitors else 0
-        review_deficit = int(competitors_avg_reviews - business_data.get('review_count', 0))
-        
-        # Get comprehensive market intelligence
-        market_intel = get_market_intelligence(
-            effective_city, 
-            business_data.get('state', ''), 
-            effective_niche
-        )
-        
-        # Get business percentile rankings
-        business_percentile = get_business_percentile(
-            business_data.get('business_name'),
-            effective_city,
-            business_data.get('state', '')
-        )
-        
-        # Format response for frontend
-        response = {
-            'business': {
-                'name': business_data.get('business_name'),
-                'rating': business_data.get('rating'),
-                'reviewCount': business_data.get('review_count'),
-                'city': business_data.get('city') or effective_city,
-                'state': business_data.get('state'),
-                'niche': effective_niche,
-                'website': business_data.get('website'),
-                'phone': business_data.get('phone'),
-                'address': business_data.get('street_address'),
-                'ownerName': business_data.get('owner_name'),
-                'medicalDirector': business_data.get('medical_director_name'),
-                'leadScore': business_data.get('lead_score'),
-                'socialMedia': {
-                    'instagram': business_data.get('instagram_handle'),
-                    'facebook': business_data.get('facebook_handle'),
-                },
-                'pricing': {
-                    'botox': business_data.get('pricing_botox'),
-                    'filler': business_data.get('pricing_filler'),
-                },
-                'businessIntel': {
-                    'isExpanding': business_data.get('is_expanding'),
-                    'isHiring': business_data.get('is_hiring'),
-                    'foundedYear': business_data.get('founded_year'),
-                }
-            },
-            'analysis': {
-                'currentRank': analysis['current_ranking'],
-                'potentialTraffic': analysis['estimated_impact']['potential_traffic'],
-                'lostRevenue': calculate_lost_revenue(analysis),
-                'reviewDeficit': max(0, review_deficit),
-                'competitorsAvgReviews': int(competitors_avg_reviews),
-                'painPoints': format_pain_points(analysis['pain_points']),
-                # Use DB top 3 as source of truth; merge in analysis advantages by name
-                'competitors': merge_competitor_advantages(competitors, analysis['competitor_advantages']),
-                # Don't show competitor locations if they're from fallback metro areas
-                'competitorLocations': [],
-                'solutions': [o['action'] for o in analysis['opportunities']],
-                'timeline': analysis['estimated_impact']['timeline'],
-                'urgency': pitch['urgency'],
-                'actionPlan': analysis['action_plan'],
-                # Add market intelligence
-                'marketIntel': market_intel,
-                'businessPercentile': business_percentile
-            },
-            'pitch': pitch,
-            'reputation': reputation_analysis
-        }
-        
-        return response
+        # Demo and degraded responses are never cached or validated
+        if not etag or response['degraded'] or not business_data.get('id'):
+            with span('serialize'):
+                return OrjsonResponse(response)
+        with span('serialize'):
+            body = dumps(response)
+        analysis_cache.set(cache_key, {'etag': etag, 'body': body, 'business_id': business_id})
+        return Response(content=body, media_type='application/json',
+                        headers={'ETag': etag, 'Cache-Control': 'no-cache'})
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+async def run_analysis(business_data: Dict, niche: Optional[str], city: Optional[str],
+                       market_version: Optional[str] = None) -> Dict:
+    """
+    Resolve the market for a loaded business and run every analysis stage,
+    returning the /api/analyze response body (also rendered by report jobs).
+    ``market_version`` (from analysis_etag) keys the market cache lookups
+    """
+    token = market_data_version.set(market_version)
+    try:
+        return await run_analysis_stages(business_data, niche, city)
+    finally:
+        market_data_version.reset(token)
+
+async def run_analysis_stages(business_data: Dict, niche: Optional[str], city: Optional[str]) -> Dict:
+    """Fan out the analysis lookups for run_analysis and build the response"""
+    # Prefer the lead's actual city/niche if not provided
+    effective_city = city or business_data.get('city') or "Austin"
+    effective_state = business_data.get('state')
+    effective_niche = niche or business_data.get('search_niche') or "med spas"
+
+    # Everything below depends only on the resolved business/location, so
+    # fan the lookups out concurrently; a slow or failing stage degrades to
+    # an empty result instead of failing the whole request
+    degraded: List[str] = []
+    competitors, reviews, market_intel, business_percentile = await asyncio.gather(
+        run_stage(
+            'competitors',
+            # Load competitor data using effective location, excluding the business itself
+            load_competitor_data(
+                effective_niche,
+                effective_city,
+                state=effective_state,
+                exclude_id=business_data.get('id'),
+                exclude_name=business_data.get('business_name'),
+                latitude=business_data.get('latitude'),
+                longitude=business_data.get('longitude'),
+            ),
+            default=[],
+            degraded=degraded,
+        ),
+        run_stage(
+            'reviews',
+            asyncio.to_thread(load_reviews, business_data.get('business_name')),
+            default=[],
+            degraded=degraded,
+        ),
+        run_stage(
+            'market_intel',
+            # Get comprehensive market intelligence
+            get_market_intelligence(
+                effective_city, 
+                business_data.get('state', ''), 
+                effective_niche
+            ),
+            default={},
+            degraded=degraded,
+        ),
+        run_stage(
+            'business_percentile',
+            # Get business percentile rankings
+            get_business_percentile(
+                business_data.get('business_name'),
+                effective_city,
+                business_data.get('state', '')
+            ),
+            default={},
+            degraded=degraded,
+        ),
+    )
+    # Selected competitors from DB (also inspectable via /api/debug-competitors)
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug('selected competitors for %s: %s', business_data.get('business_name'), [
+            {
+                'name': c.get('business_name'),
+                'rating': c.get('rating'),
+                'review_count': c.get('review_count'),
+                'local_pack_rank': c.get('local_pack_rank'),
+                'city': c.get('city'),
+                'state': c.get('state'),
+            } for c in (competitors or [])
+        ])
+    
+    return build_analysis_response(
+        business_data,
+        competitors,
+        reviews,
+        market_intel,
+        business_percentile,
+        effective_city,
+        effective_niche,
+        degraded,
+    )
+
+# /api/analyze/batch limits
+BATCH_MAX_IDS = int(os.getenv('ANALYZE_BATCH_MAX_IDS', '50000'))
+BATCH_MARKET_CONCURRENCY = int(os.getenv('ANALYZE_BATCH_MARKET_CONCURRENCY', '4'))
+BATCH_LOAD_CHUNK = 1000
+# Competitors loaded per market: one spare so excluding the lead itself still leaves a top 3
+BATCH_COMPETITOR_POOL = 4
+
+class BatchAnalysisRequest(BaseModel):
+    business_ids: List[str]
+    niche: Optional[str] = None
+    include_reviews: bool = False
+
+@app.post("/api/analyze/batch")
+async def analyze_batch(request: BatchAnalysisRequest):
+    """
+    Analyze many leads at once (campaign generation). Leads are grouped by
+    market (niche, city, state) so competitors, market intelligence and
+    percentiles are loaded once per market; results stream back as NDJSON,
+    one line per requested id, as each market completes
+    """
+    if len(request.business_ids) > BATCH_MAX_IDS:
+        raise HTTPException(status_code=413, detail=f"At most {BATCH_MAX_IDS} business_ids per batch")
+    return StreamingResponse(stream_batch_analysis(request), media_type='application/x-ndjson')
+
+def ndjson_line(payload: Dict) -> bytes:
+    return dumps(payload) + b'\n'
+
+async def stream_batch_analysis(request: BatchAnalysisRequest):
+    # De-duplicate while keeping the caller's order
+    business_ids = list(dict.fromkeys(str(i).strip() for i in request.business_ids))
+    businesses = await load_businesses_by_ids(business_ids)
+    for business_id in business_ids:
+        if business_id not in businesses:
+            yield ndjson_line({'id': business_id, 'error': 'not found'})
+
+    markets: Dict[tuple, List[Dict]] = {}
+    for business in businesses.values():
+        market = (
+            request.niche or business.get('search_niche') or "med spas",
+            business.get('city') or "Austin",
+            business.get('state'),
+        )
+        markets.setdefault(market, []).append(business)
+
+    semaphore = asyncio.Semaphore(BATCH_MARKET_CONCURRENCY)
+
+    async def run_market(market, members):
+        async with semaphore:
+            return await analyze_market_batch(market, members, request.include_reviews)
+
+    tasks = [asyncio.create_task(run_market(market, members)) for market, members in markets.items()]
+    try:
+        for next_market in asyncio.as_completed(tasks):
+            for line in await next_market:
+                yield line
+    finally:
+        # Client went away mid-stream: stop the remaining markets
+        for task in tasks:
+            task.cancel()
+
+async def analyze_market_batch(market: tuple, members: List[Dict], include_reviews: bool) -> List[bytes]:
+    """
+    Analyze every lead of one market, sharing the market-level lookups
+    """
+    niche, city, state = market
+    market_degraded: List[str] = []
+    competitor_pool, market_intel, percentiles = await asyncio.gather(
+        run_stage(
+            'competitors',
+            load_competitor_data(niche, city, state=state, limit=BATCH_COMPETITOR_POOL),
+            default=[],
+            degraded=market_degraded,
+        ),
+        run_stage(
+            'market_intel',
+            get_market_intelligence(city, state or '', niche),
+            default={},
+            degraded=market_degraded,
+        ),
+        run_stage(
+            'business_percentile',
+            get_market_percentiles(city, state or '', [b.get('business_name') for b in members]),
+            default={},
+            degraded=market_degraded,
+        ),
+    )
+
+    lines = []
+    for business in members:
+        degraded = list(market_degraded)
+        competitors = exclude_competitors(competitor_pool, business.get('id'))[:3]
+        has_point = business.get('latitude') is not None and business.get('longitude') is not None
+        if not competitors and ((competitor_pool and state) or has_point):
+            # The lead was the market's only top-3 entry, or the market has none
+            # and no centroid to fall back from: replay the single-lead lookup
+            # with the lead's coordinates so the nearest-market fallback applies
+            # exactly as in /api/analyze
+            competitors = await run_stage(
+                'competitors',
+                load_competitor_data(
+                    niche, city, state=state,
+                    exclude_id=business.get('id'), exclude_name=business.get('business_name'),
+                    latitude=business.get('latitude'), longitude=business.get('longitude'),
+                ),
+                default=[],
+                degraded=degraded,
+            )
+        reviews = []
+        if include_reviews:
+            reviews = await run_stage(
+                'reviews',
+                asyncio.to_thread(load_reviews, business.get('business_name')),
+                default=[],
+                degraded=degraded,
+            )
+        try:
+            response = build_analysis_response(
+                business,
+                competitors,
+                reviews,
+                market_intel,
+                percentiles.get(business.get('business_name'), {}),
+                city,
+                niche,
+                degraded,
+            )
+            lines.append(ndjson_line({'id': str(business.get('id')), **response}))
+        except Exception as e:
+            lines.append(ndjson_line({'id': str(business.get('id')), 'error': str(e)}))
+    return lines
+
 @app.get("/api/real-time-rank")
 async def get_real_time_rank(
     business_name: str,
@@ -203,21 +451,21 @@ async def get_real_time_rank(
 ):
     """
     Get real-time Google ranking for a business
+    Live Maps lookup through the warm browser pool (rank_checker.py); repeat
+    and concurrent checks for the same keyword/location share one lookup.
+    rank is null when the business isn't in the local results
     """
-    # This would integrate with your scraping system
-    # For now, return mock data
-    return {
-        'business': business_name,
-        'keyword': keyword,
-        'location': location,
-        'rank': 7,
-        'page': 1,
-        'competitors_above': [
-            {'name': 'Competitor 1', 'rank': 1},
-            {'name': 'Competitor 2', 'rank': 2},
-            {'name': 'Competitor 3', 'rank': 3}
-        ]
-    }
+    try:
+        return await rank_checker.check(business_name, keyword, location)
+    except RankCheckRateLimited as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={'Retry-After': str(max(1, round(e.retry_after)))})
+    except RankCheckUnavailable as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="Rank check is still running; retry shortly",
+                            headers={'Retry-After': '5'})
+    except Exception as e:
+        raise HTTPException(status_code=502, detail=f"Rank lookup failed: {e}")
 
 @app.get("/api/debug-competitors")
 async def debug_competitors(
@@ -232,16 +480,18 @@ async def debug_competitors(
     as /api/analyze (filtered by niche/city/state and excluding the business if provided).
     """
     try:
-        business = load_business_data(id, name, niche, city)
+        business = await load_business_data(id, name, niche, city)
         effective_city = city or (business and business.get('city')) or ''
         effective_state = (business and business.get('state')) if state is None else state
         effective_niche = niche or (business and business.get('search_niche')) or 'med spas'
-        competitors = load_competitor_data(
+        competitors = await load_competitor_data(
             effective_niche,
             effective_city,
             state=effective_state,
             exclude_id=(business and business.get('id')),
             exclude_name=(business and business.get('business_name')),
+            latitude=(business and business.get('latitude')),
+            longitude=(business and business.get('longitude')),
         )
         return {
             'params': {
@@ -254,34 +504,311 @@ async def debug_competitors(
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/debug-db-pool")
+async def debug_db_pool():
+    """
+    Connection pool occupancy plus pool-wait / checkout latency metrics
+    """
+    return async_pool_stats()
+
+@app.get("/api/cache-stats")
+async def cache_stats():
+    """
+    Market cache, /api/analyze response cache and analyzer memo
+    hit / miss / eviction counters for monitoring
+    """
+    return {
+        **market_cache.stats(),
+        'analysis_cache': {
+            'size': len(analysis_cache),
+            'maxsize': analysis_cache.maxsize,
+            'ttl_seconds': analysis_cache.ttl,
+            **analysis_cache.counters,
+        },
+        'analyzer_cache': {
+            'size': len(analyzer_cache),
+            'maxsize': analyzer_cache.maxsize,
+            'ttl_seconds': analyzer_cache.ttl,
+            **analyzer_cache.counters,
+        },
+    }
+
+@app.get("/metrics")
+async def metrics():
+    """
+    Prometheus scrape endpoint: request / stage / SQL latency histograms and
+    SQL row counts by query fingerprint, plus pool and cache gauges
+    """
+    body = render_metrics({
+        'funnel_db_pool': ('Async connection pool stat', async_pool_stats()),
+        'funnel_market_cache': ('Market cache stat', market_cache.stats()),
+        'funnel_analysis_cache': ('Analysis response cache stat', {
+            'size': len(analysis_cache),
+            **analysis_cache.counters,
+        }),
+        'funnel_analyzer_cache': ('Analyzer memo cache stat', {
+            'size': len(analyzer_cache),
+            **analyzer_cache.counters,
+        }),
+        'funnel_conversion_events': ('Conversion event writer stat', conversion_writer.stats()),
+        'funnel_report_queue': ('Report job queue stat', report_queue.stats()),
+        'funnel_rank_checker': ('Rank checker stat', rank_checker.stats()),
+    })
+    return PlainTextResponse(body, media_type='text/plain; version=0.0.4; charset=utf-8')
+
+class CacheInvalidationRequest(BaseModel):
+    city: Optional[str] = None
+    state: Optional[str] = None
+
+@app.post("/api/cache/invalidate")
+async def invalidate_cache(request: CacheInvalidationRequest):
+    """
+    Invalidate cached market aggregates for one market (city + state) or all
+    markets; called by ingestion / migration scripts after loading leads
+    """
+    try:
+        market = await market_cache.invalidate_market(request.city, request.state)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {'invalidated': True, 'market': market}
+
 @app.post("/api/generate-report")
 async def generate_report(request: AnalysisRequest):
     """
     Generate a detailed PDF report for a business
+    Rendering runs on the report worker pool (reports.py): the response is
+    202 with a status_url to poll, or 200 straight away when a report for
+    the current data version is already on disk
     """
-    # This would generate a comprehensive report
+    with span('load_business'):
+        business_data = await load_business_data(
+            request.business_id, request.business_name, request.niche, request.city
+        )
+    version = market_version = None
+    if business_data:
+        business_id = str(business_data.get('id'))
+        key = json.dumps(['report', business_id, request.niche, request.city])
+        version, market_version = await analysis_etag(key, business_id, request.niche, request.city)
+    else:
+        # Use demo data if not found; never cached
+        business_data = get_demo_business()
+        key = json.dumps(['report', request.business_id, request.business_name, request.niche, request.city])
+
+    try:
+        job = report_queue.submit(
+            key, version, lambda: run_analysis(business_data, request.niche, request.city, market_version)
+        )
+    except ReportQueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={'Retry-After': '5'})
+    return OrjsonResponse(report_job_response(job), status_code=200 if job['status'] == 'done' else 202)
+
+def report_job_response(job: Dict) -> Dict:
     return {
-        'report_url': f'/reports/{request.business_name}_seo_analysis.pdf',
-        'generated': True
+        **report_queue.view(job),
+        'status_url': f"/api/reports/{job['job_id']}",
+        'report_url': f"/api/reports/{job['job_id']}/pdf" if job['status'] == 'done' else None,
+        'generated': job['status'] == 'done',
     }
 
+@app.get("/api/reports/{job_id}")
+async def report_status(job_id: str):
+    """
+    Poll a report job: queued, running, done (with report_url) or failed
+    """
+    job = report_queue.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Report job not found")
+    return report_job_response(job)
+
+@app.get("/api/reports/{job_id}/pdf")
+async def report_pdf(job_id: str):
+    """
+    Download a finished report
+    """
+    job = report_queue.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Report job not found")
+    if job['status'] != 'done':
+        raise HTTPException(status_code=409, detail=f"Report is {job['status']}")
+    path = report_queue.path(job)
+    if not path:
+        raise HTTPException(status_code=410, detail="Report expired; request it again")
+    return FileResponse(path, media_type='application/pdf', filename='seo_analysis.pdf')
+
 @app.get("/api/track-conversion")
 async def track_conversion(
-    business_id: str,
-    action: str,
+    request: Request,
+    business_id: str = Query(..., max_length=BUSINESS_ID_MAX_LENGTH),
+    action: str = Query(..., max_length=ACTION_MAX_LENGTH),
     value: Optional[float] = None
 ):
     """
     Track funnel conversions and interactions
+    Events are buffered and COPY-loaded into conversion_events in batches
+    (events.py); 503 when the buffer is full so clients back off and retry.
+    Values longer than their columns are refused up front (422) so one bad
+    request can't fail a whole batch
     """
-    # Log conversion event
+    try:
+        conversion_writer.append(conversion_event(
+            business_id,
+            action,
+            value,
+            metadata={
+                'referer': request.headers.get('referer'),
+                'user_agent': request.headers.get('user-agent'),
+            },
+        ))
+    except EventBufferFull as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={'Retry-After': '1'})
     return {
         'tracked': True,
         'action': action,
         'business_id': business_id
     }
 
-def load_business_data(business_id: str = None, name: str = None, 
+# Lead columns selected for every /api/analyze business lookup
+LEAD_COLUMNS = """
+    id, business_name, local_pack_rank, rating, review_count::int AS review_count,
+    city, state, website, phone, street_address, email, email_type,
+    owner_name, medical_director_name, search_niche, lead_score,
+    pricing_botox, pricing_filler, instagram_handle, facebook_handle,
+    is_expanding, is_hiring, founded_year, latitude, longitude,
+    additional_data
+"""
+
+# Data versions behind one /api/analyze response: the lead itself, every
+# other lead the response reads (top 10, rankings and percentiles cover the
+# whole city/state market; COUNT catches deletes), and every market table its
+# analysis reads. City/niche resolve like run_analysis (an empty value falls
+# through, as with Python's `or`). When the lead's own market has no other
+# ranked competitor, the nearest-market fallback may read any market of the
+# niche, so the niche-wide competitor and centroid versions count too.
+ANALYSIS_VERSION_SQL = """
+    WITH lead AS (
+        SELECT
+            id,
+            updated_at,
+            COALESCE(NULLIF(%(city)s, ''), NULLIF(city, ''), 'Austin') as city,
+            state,
+            COALESCE(NULLIF(%(niche)s, ''), NULLIF(search_niche, ''), 'med spas') as niche
+        FROM leads
+        WHERE id = %(id)s
+    ),
+    own_competitors AS (
+        SELECT mc.competitors, mc.refreshed_at
+        FROM lead
+        JOIN market_competitors mc
+          ON mc.niche_key = normalize_niche_key(lead.niche)
+         AND mc.city_key = normalize_market_key(lead.city)
+         AND mc.state = lead.state
+    ),
+    fallback AS (
+        SELECT NOT EXISTS (
+            SELECT 1
+            FROM lead, own_competitors oc, jsonb_array_elements(oc.competitors) c
+            WHERE c->>'id' <> lead.id::text
+        ) as used
+    )
+    SELECT
+        lead.updated_at,
+        lead.city,
+        lead.state,
+        market_leads.lead_count,
+        market_leads.leads_version,
+        (SELECT refreshed_at FROM market_rollups mr
+         WHERE mr.city = lead.city AND mr.state = lead.state) as rollup_version,
+        (SELECT MAX(refreshed_at) FROM market_niche_rollups mnr
+         WHERE mnr.city = lead.city AND mnr.state = lead.state) as niche_rollup_version,
+        (SELECT refreshed_at FROM own_competitors) as competitors_version,
+        -- Without a state, competitors come straight from leads (any state)
+        (SELECT MAX(l.updated_at) FROM leads l
+         WHERE NULLIF(lead.state, '') IS NULL
+         AND l.niche_key = normalize_niche_key(lead.niche)
+         AND l.city_key = normalize_market_key(lead.city)
+         AND l.local_pack_rank BETWEEN 1 AND 3) as stateless_competitors_version,
+        fallback_markets.market_count,
+        fallback_markets.competitors_version,
+        (SELECT MAX(refreshed_at) FROM market_centroids WHERE fallback.used) as centroids_version
+    FROM lead
+    CROSS JOIN fallback
+    CROSS JOIN LATERAL (
+        SELECT COUNT(*) as lead_count, MAX(l.updated_at) as leads_version
+        FROM leads l
+        WHERE l.city = lead.city AND l.state = lead.state
+    ) market_leads
+    CROSS JOIN LATERAL (
+        SELECT COUNT(*) as market_count, MAX(mc.refreshed_at) as competitors_version
+        FROM market_competitors mc
+        WHERE fallback.used AND mc.niche_key = normalize_niche_key(lead.niche)
+    ) fallback_markets
+"""
+
+async def analysis_etag(cache_key: str, business_id: str, niche: Optional[str],
+                        city: Optional[str]) -> Tuple[Optional[str], Optional[str]]:
+    """
+    ETag for an /api/analyze response from its lead and market data versions
+    (plus the market cache generation, so manual invalidation also counts),
+    and the market's data version alone for keying market cache lookups;
+    (None, None) when the lead doesn't exist or versions can't be read
+    """
+    if not str(business_id).isdigit():
+        return None, None
+    try:
+        with span('etag'):
+            pool = await get_async_pool()
+            conn = await pool.getconn()
+            cur = conn.cursor()
+            try:
+                await cur.execute(ANALYSIS_VERSION_SQL, {'id': int(business_id), 'city': city, 'niche': niche})
+                row = await cur.fetchone()
+            finally:
+                await cur.close()
+                await pool.putconn(conn)
+    except Exception:
+        logger.exception("Error loading analysis data version")
+        return None, None
+    if not row:
+        return None, None
+    generation = await market_cache.generation(row[1], row[2])
+    # Everything but the lead's own updated_at describes the market
+    market_version = content_hash(niche, row[1:], generation)
+    return response_etag(ANALYZE_RESPONSE_VERSION, cache_key, business_id, row, generation), market_version
+
+def business_from_row(row: Dict) -> Dict:
+    """
+    Map a LEAD_COLUMNS row onto the business dict used by the analyzers
+    """
+    return {
+        'id': row.get('id'),
+        'business_name': row.get('business_name'),
+        'rating': float(row['rating']) if row.get('rating') is not None else None,
+        'review_count': row.get('review_count'),
+        'city': row.get('city'),
+        'state': row.get('state'),
+        'website': row.get('website'),
+        'phone': row.get('phone'),
+        'street_address': row.get('street_address'),
+        'local_pack_rank': row.get('local_pack_rank'),
+        'email': row.get('email'),
+        'email_type': row.get('email_type'),
+        'owner_name': row.get('owner_name'),
+        'medical_director_name': row.get('medical_director_name'),
+        'search_niche': row.get('search_niche'),
+        'lead_score': row.get('lead_score'),
+        'pricing_botox': row.get('pricing_botox'),
+        'pricing_filler': row.get('pricing_filler'),
+        'instagram_handle': row.get('instagram_handle'),
+        'facebook_handle': row.get('facebook_handle'),
+        'is_expanding': row.get('is_expanding'),
+        'is_hiring': row.get('is_hiring'),
+        'founded_year': row.get('founded_year'),
+        'latitude': float(row['latitude']) if row.get('latitude') is not None else None,
+        'longitude': float(row['longitude']) if row.get('longitude') is not None else None,
+        'match_confidence': round(float(row['name_confidence']), 3) if row.get('name_confidence') is not None else None,
+    }
+
+async def load_business_data(business_id: str = None, name: str = None, 
                        niche: str = None, city: str = None) -> Dict:
     """
     Load business data from your database or scraped files
@@ -290,196 +817,180 @@ def load_business_data(business_id: str = None, name: str = None,
     if not db_url:
         return None
     try:
-        conn = psycopg2.connect(db_url, cursor_factory=RealDictCursor)
-        cur = conn.cursor()
+        pool = await get_async_pool()
+        conn = await pool.getconn()
+        cur = conn.cursor(row_factory=dict_row)
         query = None
         params = []
         if business_id:
-            query = """
-                SELECT id, business_name, local_pack_rank, rating, review_count::int AS review_count, 
-                       city, state, website, phone, street_address, email, email_type,
-                       owner_name, medical_director_name, search_niche, lead_score,
-                       pricing_botox, pricing_filler, instagram_handle, facebook_handle,
-                       is_expanding, is_hiring, founded_year,
-                       additional_data
+            query = f"""
+                SELECT {LEAD_COLUMNS}
                 FROM leads
                 WHERE id = %s
             """
             params = [business_id]
         elif name:
-            # Match by business_name (ILIKE) and optionally city
-            if city:
-                query = """
-                    SELECT id, business_name, local_pack_rank, rating, review_count::int AS review_count, 
-                           city, state, website, phone, street_address, email, email_type,
-                           owner_name, medical_director_name, search_niche, lead_score,
-                           pricing_botox, pricing_filler, instagram_handle, facebook_handle,
-                           is_expanding, is_hiring, founded_year,
-                           additional_data
-                    FROM leads
-                    WHERE business_name ILIKE %s AND city ILIKE %s
-                    ORDER BY review_count DESC NULLS LAST
-                    LIMIT 1
-                """
-                params = [f"%{name}%", f"%{city}%"]
-            else:
-                query = """
-                    SELECT id, business_name, local_pack_rank, rating, review_count::int AS review_count, 
-                           city, state, website, phone, street_address, email, email_type,
-                           owner_name, medical_director_name, search_niche, lead_score,
-                           pricing_botox, pricing_filler, instagram_handle, facebook_handle,
-                           is_expanding, is_hiring, founded_year,
-                           additional_data
-                    FROM leads
-                    WHERE business_name ILIKE %s
-                    ORDER BY review_count DESC NULLS LAST
-                    LIMIT 1
-                """
-                params = [f"%{name}%"]
+            # Fuzzy match by business_name (trigram index), optionally within the city
+            query = f"""
+                WITH best AS ({name_match_sql(in_city=bool(city))})
+                SELECT {LEAD_COLUMNS}, best.name_confidence
+                FROM leads
+                JOIN best USING (id)
+            """
+            params = name_match_params(name, city)
         else:
             # Fallback: first lead in niche/city if present
-            query = """
-                SELECT id, business_name, local_pack_rank, rating, review_count::int AS review_count, 
-                       city, state, website, phone, street_address, email, email_type,
-                       owner_name, medical_director_name, search_niche, lead_score,
-                       pricing_botox, pricing_filler, instagram_handle, facebook_handle,
-                       is_expanding, is_hiring, founded_year,
-                       additional_data
+            where_clauses = ["(niche_key IS NULL OR niche_key = normalize_niche_key(%s))"]
+            params = [niche or 'med spas']
+            if city:
+                where_clauses.append("city_key = normalize_market_key(%s)")
+                params.append(city)
+            query = f"""
+                SELECT {LEAD_COLUMNS}
                 FROM leads
-                WHERE (search_niche IS NULL OR search_niche = %s) AND (city ILIKE %s)
+                WHERE {' AND '.join(where_clauses)}
                 ORDER BY review_count DESC NULLS LAST
                 LIMIT 1
             """
-            params = [niche or 'med spas', f"%{city or ''}%"]
-        cur.execute(query, params)
-        row = cur.fetchone()
-        cur.close()
-        conn.close()
+        try:
+            await cur.execute(query, params)
+            row = await cur.fetchone()
+        finally:
+            await cur.close()
+            await pool.putconn(conn)
         if not row:
             return None
-        return {
-            'id': row.get('id'),
-            'business_name': row.get('business_name'),
-            'rating': float(row['rating']) if row.get('rating') is not None else None,
-            'review_count': row.get('review_count'),
-            'city': row.get('city'),
-            'state': row.get('state'),
-            'website': row.get('website'),
-            'phone': row.get('phone'),
-            'street_address': row.get('street_address'),
-            'local_pack_rank': row.get('local_pack_rank'),
-            'email': row.get('email'),
-            'email_type': row.get('email_type'),
-            'owner_name': row.get('owner_name'),
-            'medical_director_name': row.get('medical_director_name'),
-            'search_niche': row.get('search_niche'),
-            'lead_score': row.get('lead_score'),
-            'pricing_botox': row.get('pricing_botox'),
-            'pricing_filler': row.get('pricing_filler'),
-            'instagram_handle': row.get('instagram_handle'),
-            'facebook_handle': row.get('facebook_handle'),
-            'is_expanding': row.get('is_expanding'),
-            'is_hiring': row.get('is_hiring'),
-            'founded_year': row.get('founded_year'),
-        }
+        return business_from_row(row)
     except Exception:
         # Fail silently; caller will use demo
         return None
 
-def load_competitor_data(niche: str, city: str, state: str | None = None, exclude_id: str | None = None, exclude_name: str | None = None) -> List[Dict]:
+async def load_businesses_by_ids(business_ids: List[str]) -> Dict[str, Dict]:
+    """
+    Load many leads by id with chunked ANY() lookups, keyed by str(id)
+    (same LEAD_COLUMNS as load_business_data, coordinates included, so the
+    point-based competitor fallback sees the same lead as /api/analyze)
+    """
+    db_url = Config.DATABASE_URL or os.getenv('DATABASE_URL')
+    if not db_url:
+        return {}
+    # leads.id is a SERIAL; anything non-numeric can't match
+    numeric_ids = [int(i) for i in business_ids if i.isdigit()]
+    businesses: Dict[str, Dict] = {}
+    pool = await get_async_pool()
+    conn = await pool.getconn()
+    cur = conn.cursor(row_factory=dict_row)
+    try:
+        for start in range(0, len(numeric_ids), BATCH_LOAD_CHUNK):
+            await cur.execute(
+                f"SELECT {LEAD_COLUMNS} FROM leads WHERE id = ANY(%s)",
+                [numeric_ids[start:start + BATCH_LOAD_CHUNK]],
+            )
+            for row in await cur.fetchall():
+                businesses[str(row['id'])] = business_from_row(row)
+    finally:
+        await cur.close()
+        await pool.putconn(conn)
+    return businesses
+
+def competitor_from_row(row: Dict) -> Dict:
+    """
+    Map a competitor row (leads or market_competitors JSON) onto the analyzer dict
+    """
+    return {
+        'id': row.get('id'),
+        'business_name': row.get('business_name'),
+        'rating': float(row['rating']) if row.get('rating') is not None else None,
+        'review_count': row.get('review_count'),
+        'city': row.get('city'),
+        'state': row.get('state'),
+        'website': row.get('website'),
+        'phone': row.get('phone'),
+        'street_address': row.get('street_address'),
+        'local_pack_rank': row.get('local_pack_rank'),
+    }
+
+def exclude_competitors(rows: List[Dict], exclude_id: str | None = None, exclude_name: str | None = None) -> List[Dict]:
+    """
+    Drop the business itself from a market's competitor list, matching the
+    `id <> %s` / `business_name <> %s` filters of the live query
+    """
+    if exclude_id:
+        return [row for row in rows if str(row.get('id')) != str(exclude_id)]
+    if exclude_name:
+        return [row for row in rows if row.get('business_name') != exclude_name]
+    return list(rows)
+
+async def load_competitor_data(niche: str, city: str, state: str | None = None, exclude_id: str | None = None, exclude_name: str | None = None, limit: int = 3,
+                               latitude: float | None = None, longitude: float | None = None) -> List[Dict]:
     """
     Load top competitors for the niche and city
-    If no top 3 in specific city, fallback to broader search
+    If no top 3 in specific city, fallback to the nearest markets that have one
+    (from the city's centroid, or the business's own coordinates)
     """
     db_url = Config.DATABASE_URL or os.getenv('DATABASE_URL')
     if not db_url:
         return []
+    rows = None
+    # Serve from the precomputed per-market top list when the market is fully
+    # specified, dropping the business itself in memory
+    if state and limit <= MARKET_COMPETITORS_TOP_N:
+        try:
+            market_competitors = await get_market_competitors(city, state, niche)
+            rows = exclude_competitors(market_competitors, exclude_id, exclude_name)[:limit]
+        except Exception as e:
+            logger.warning("Error loading precomputed competitors, querying leads: %s", e, exc_info=True)
     try:
-        conn = psycopg2.connect(db_url, cursor_factory=RealDictCursor)
-        cur = conn.cursor()
-        
-        # First try: exact city match
-        where_clauses = [
-            "search_niche = %s",
-            "city ILIKE %s",
-            "local_pack_rank BETWEEN 1 AND 3"
-        ]
-        params = [niche, f"%{city}%"]
-        if state:
-            where_clauses.append("state = %s")
-            params.append(state)
-        if exclude_id:
-            where_clauses.append("id <> %s")
-            params.append(exclude_id)
-        elif exclude_name:
-            where_clauses.append("business_name <> %s")
-            params.append(exclude_name)
-
-        query = f"""
-            SELECT 
-                id, business_name, local_pack_rank, rating, review_count::int AS review_count, 
-                city, state, website, phone, street_address
-            FROM leads
-            WHERE {' AND '.join(where_clauses)}
-            ORDER BY local_pack_rank ASC
-            LIMIT 3
-        """
-        cur.execute(query, params)
-        rows = cur.fetchall()
-        
-        # If no results in specific city, try broader search
-        if len(rows) == 0 and state:
-            # For Texas cities like West Lake Hills, try major metro areas
-            metro_cities = {
-                'TX': ['Austin', 'Dallas', 'Houston', 'San Antonio'],
-                'CA': ['Los Angeles', 'San Francisco', 'San Diego'],
-                'FL': ['Miami', 'Orlando', 'Tampa'],
-            }
-            
-            if state in metro_cities:
-                # Try major cities in the state
+        if rows is None:
+            pool = await get_async_pool()
+            conn = await pool.getconn()
+            cur = conn.cursor(row_factory=dict_row)
+            try:
+                # Exact city match on the normalized keys
                 where_clauses = [
-                    "search_niche = %s",
-                    "state = %s",
-                    "local_pack_rank BETWEEN 1 AND 3",
-                    f"city IN ({','.join(['%s'] * len(metro_cities[state]))})"
+                    "niche_key = normalize_niche_key(%s)",
+                    "city_key = normalize_market_key(%s)",
+                    "local_pack_rank BETWEEN 1 AND 3"
                 ]
-                params = [niche, state] + metro_cities[state]
+                params = [niche, city]
+                if state:
+                    where_clauses.append("state = %s")
+                    params.append(state)
                 if exclude_id:
                     where_clauses.append("id <> %s")
                     params.append(exclude_id)
-                
+                elif exclude_name:
+                    where_clauses.append("business_name <> %s")
+                    params.append(exclude_name)
+
                 query = f"""
                     SELECT 
                         id, business_name, local_pack_rank, rating, review_count::int AS review_count, 
                         city, state, website, phone, street_address
                     FROM leads
                     WHERE {' AND '.join(where_clauses)}
-                    ORDER BY local_pack_rank ASC, review_count DESC
-                    LIMIT 3
+                    ORDER BY local_pack_rank ASC
+                    LIMIT %s
                 """
-                cur.execute(query, params)
-                rows = cur.fetchall()
-        
-        cur.close()
-        conn.close()
-        return [
-            {
-                'id': row.get('id'),
-                'business_name': row.get('business_name'),
-                'rating': float(row['rating']) if row.get('rating') is not None else None,
-                'review_count': row.get('review_count'),
-                'city': row.get('city'),
-                'state': row.get('state'),
-                'website': row.get('website'),
-                'phone': row.get('phone'),
-                'street_address': row.get('street_address'),
-                'local_pack_rank': row.get('local_pack_rank'),
-            }
-            for row in rows
-        ]
-    except Exception as e:
-        print(f"Error loading competitors: {e}")
+                await cur.execute(query, params + [limit])
+                rows = await cur.fetchall()
+            finally:
+                await cur.close()
+                await pool.putconn(conn)
+
+        # If no results in specific city (suburbs like West Lake Hills), borrow
+        # the top competitors of the nearest markets that have them
+        if len(rows) == 0:
+            markets = []
+            if state:
+                markets = await get_nearest_markets(city, state, niche)
+            if not markets and latitude is not None and longitude is not None:
+                markets = await get_nearest_markets_to_point(latitude, longitude, niche, city, state)
+            nearby = [competitor for market in markets for competitor in market['competitors']]
+            rows = exclude_competitors(nearby, exclude_id, exclude_name)[:limit]
+        return [competitor_from_row(row) for row in rows]
+    except Exception:
+        logger.exception("Error loading competitors")
         return []
     # For now, return mock competitors
     
@@ -504,6 +1015,125 @@ def load_competitor_data(niche: str, city: str, state: str | None = None, exclud
         }
     ]
 
+def build_analysis_response(
+    business_data: Dict,
+    competitors: List[Dict],
+    reviews: List[Dict],
+    market_intel: Dict,
+    business_percentile: Dict,
+    effective_city: str,
+    effective_niche: str,
+    degraded: List[str],
+) -> Dict:
+    """
+    Run the competitive / review analysis for one business and shape the
+    /api/analyze response (shared with /api/analyze/batch)
+    """
+    # Run competitive analysis
+    with span('competitive_analysis'):
+        analysis, pitch = run_competitive_analysis(
+            business_data,
+            competitors,
+            keyword=f"{effective_niche} {effective_city}"
+        )
+    # The memoized pitch is shared between requests; copy before adding to it
+    pitch = dict(pitch)
+    
+    # If we have reviews, analyze them too
+    reputation_analysis = None
+    if reviews:
+        with span('review_analysis'):
+            review_analyzer = ReviewAnalyzer()
+            reputation_analysis = review_analyzer.analyze_reviews(reviews)
+            reputation_pitch = review_analyzer.generate_reputation_pitch(
+                reputation_analysis, 
+                business_data.get('business_name')
+            )
+            pitch['reputation'] = reputation_pitch
+    
+    # Calculate additional insights
+    competitors_avg_reviews = sum(c.get('review_count', 0) for c in competitors) / len(competitors) if competitors else 0
+    review_deficit = int(competitors_avg_reviews - business_data.get('review_count', 0))
+    
+    # Format response for frontend
+    response = {
+        'business': {
+            'name': business_data.get('business_name'),
+            'rating': business_data.get('rating'),
+            'reviewCount': business_data.get('review_count'),
+            'city': business_data.get('city') or effective_city,
+            'state': business_data.get('state'),
+            'niche': effective_niche,
+            'website': business_data.get('website'),
+            'phone': business_data.get('phone'),
+            'address': business_data.get('street_address'),
+            'ownerName': business_data.get('owner_name'),
+            'medicalDirector': business_data.get('medical_director_name'),
+            'leadScore': business_data.get('lead_score'),
+            'matchConfidence': business_data.get('match_confidence'),
+            'socialMedia': {
+                'instagram': business_data.get('instagram_handle'),
+                'facebook': business_data.get('facebook_handle'),
+            },
+            'pricing': {
+                'botox': business_data.get('pricing_botox'),
+                'filler': business_data.get('pricing_filler'),
+            },
+            'businessIntel': {
+                'isExpanding': business_data.get('is_expanding'),
+                'isHiring': business_data.get('is_hiring'),
+                'foundedYear': business_data.get('founded_year'),
+            }
+        },
+        'analysis': {
+            'currentRank': analysis['current_ranking'],
+            'potentialTraffic': analysis['estimated_impact']['potential_traffic'],
+            'lostRevenue': calculate_lost_revenue(analysis),
+            'reviewDeficit': max(0, review_deficit),
+            'competitorsAvgReviews': int(competitors_avg_reviews),
+            'painPoints': format_pain_points(analysis['pain_points']),
+            # Use DB top 3 as source of truth; merge in analysis advantages by name
+            'competitors': merge_competitor_advantages(competitors, analysis['competitor_advantages']),
+            # Don't show competitor locations if they're from fallback metro areas
+            'competitorLocations': [],
+            'solutions': [o['action'] for o in analysis['opportunities']],
+            'timeline': analysis['estimated_impact']['timeline'],
+            'urgency': pitch['urgency'],
+            'actionPlan': analysis['action_plan'],
+            # Add market intelligence
+            'marketIntel': market_intel,
+            'businessPercentile': business_percentile
+        },
+        'pitch': pitch,
+        'reputation': reputation_analysis,
+        # Stages that timed out or failed and were served empty
+        'degraded': degraded
+    }
+    
+    return response
+
+def run_competitive_analysis(business_data: Dict, competitors: List[Dict], keyword: str) -> tuple:
+    """
+    CompetitiveAnalyzer ranking analysis and pitch, memoized by a content hash
+    of (business row, competitor rows, keyword) so unchanged inputs skip the
+    analyzer; cached results are shared and must not be mutated
+    """
+    key = content_hash(business_data, competitors, keyword)
+    found, result = analyzer_cache.get(key)
+    if found:
+        return result
+    analyzer = CompetitiveAnalyzer()
+    analysis = analyzer.analyze_business_ranking(
+        business_data, 
+        competitors,
+        keyword=keyword
+    )
+    
+    # Generate pitch data
+    pitch = analyzer.generate_pitch_data(analysis)
+    analyzer_cache.set(key, (analysis, pitch))
+    return analysis, pitch
+
 def load_reviews(business_name: str) -> List[Dict]:
     """
     Load reviews for a business
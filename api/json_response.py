@@ -0,0 +1,67 @@
+"""
+JSON Serialization Module
+orjson-backed response class for the funnel API. Endpoints that return an
+OrjsonResponse directly skip FastAPI's jsonable_encoder pass over the nested
+analysis dicts; database types (Decimal, datetime, UUID) are handled in one
+place and encoded the same way jsonable_encoder would.
+Falls back to the stdlib json module when orjson is not installed.
+"""
+
+import dataclasses
+import json
+from datetime import date, datetime, time
+from decimal import Decimal
+from enum import Enum
+from typing import Any
+from uuid import UUID
+
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; stdlib json produces the same output
+    orjson = None
+
+
+def json_default(value: Any) -> Any:
+    """
+    Encode types neither serializer handles natively (numeric columns come
+    back as Decimal); mirrors jsonable_encoder: whole Decimals become ints
+    """
+    if isinstance(value, Decimal):
+        return int(value) if value.as_tuple().exponent >= 0 else float(value)
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if isinstance(value, UUID):
+        return str(value)
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, (set, frozenset, tuple)):
+        return list(value)
+    if isinstance(value, (bytes, memoryview)):
+        return bytes(value).decode('utf-8', errors='replace')
+    if dataclasses.is_dataclass(value) and not isinstance(value, type):
+        return dataclasses.asdict(value)
+    if hasattr(value, 'model_dump'):
+        return value.model_dump()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    """Serialize to compact UTF-8 JSON bytes"""
+    if orjson is not None:
+        return orjson.dumps(content, default=json_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, default=json_default, ensure_ascii=False, separators=(',', ':')).encode()
+
+
+class OrjsonResponse(JSONResponse):
+    """
+    JSONResponse rendered with orjson
+
+    Usage:
+        app = FastAPI(default_response_class=OrjsonResponse)
+        return OrjsonResponse(payload)  # skips jsonable_encoder entirely
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -1,229 +1,297 @@
 """
 Market Intelligence Query Module
 Provides aggregated market data for specific city/state areas
+All queries run natively async on the shared psycopg 3 pool
 """
 
-import psycopg2
-from typing import Dict, Any, List, Optional
+import math
 import os
-from dotenv import load_dotenv
+from typing import Dict, Any, List, Optional
+
+from cache import cached_market
+from db import get_async_pool
+
+# Number of businesses returned in market_rankings
+MARKET_RANKINGS_LIMIT = 20
+
+# Competitors stored per market in market_competitors (see
+# migrations/create_market_competitors_table.sql)
+MARKET_COMPETITORS_TOP_N = 5
 
-load_dotenv()
+# Nearest-market competitor fallback (see migrations/create_market_centroids_table.sql)
+NEAREST_MARKETS_LIMIT = 3
+NEAREST_MARKETS_CANDIDATES = 10
+NEAREST_MARKETS_MIN_COMPETITORS = 3
+NEAREST_MARKETS_MAX_MILES = float(os.getenv('NEAREST_MARKETS_MAX_MILES', '60'))
 
-DATABASE_URL = os.getenv('DATABASE_URL')
+# KNN over market_centroids (GiST on niche_key, location) joined to the
+# precomputed market_competitors lists; {origin} is a point expression.
+# Candidates come back in planar (degree) order and are re-ranked by
+# great-circle distance in nearest_markets().
+NEAREST_MARKETS_SQL = """
+    SELECT
+        mc.city,
+        mc.state,
+        mc.location[1] as latitude,
+        mc.location[0] as longitude,
+        ({origin})[1] as origin_latitude,
+        ({origin})[0] as origin_longitude,
+        c.competitors
+    FROM market_centroids mc
+    JOIN market_competitors c USING (niche_key, city_key, state)
+    WHERE mc.niche_key = normalize_niche_key(%(niche)s)
+    AND jsonb_array_length(c.competitors) >= %(min_competitors)s
+    AND NOT (mc.city_key IS NOT DISTINCT FROM normalize_market_key(%(city)s)
+             AND mc.state IS NOT DISTINCT FROM %(state)s)
+    AND ({origin}) IS NOT NULL
+    ORDER BY mc.location <-> ({origin})
+    LIMIT %(candidates)s
+"""
+
+# Origin = centroid of the requested city (its best-sampled niche)
+CITY_ORIGIN_SQL = """
+    SELECT location FROM market_centroids
+    WHERE city_key = normalize_market_key(%(city)s) AND state = %(state)s
+    ORDER BY geocoded_businesses DESC
+    LIMIT 1
+"""
+
+# Single-pass market intelligence: aggregates are merged from the
+# market_niche_rollups rows matching the niche filter (see
+# migrations/create_market_rollup_tables.sql); only the top 10 and rankings
+# touch leads. Everything comes back in a single round-trip.
+MARKET_INTELLIGENCE_SQL = """
+    WITH rollups AS MATERIALIZED (
+        SELECT *
+        FROM market_niche_rollups
+        WHERE city = %(city)s AND state = %(state)s 
+        AND (search_niche ILIKE %(niche)s OR niche_is_null)
+    ),
+    review_freq AS (
+        SELECT f.key as review_count, SUM(f.value::int) as business_count
+        FROM rollups, jsonb_each_text(rollups.review_count_freq) f
+        GROUP BY f.key
+    ),
+    review_histogram AS (
+        SELECT 
+            h.key as review_range,
+            SUM(h.value::int) as business_count,
+            CASE h.key
+                WHEN '0' THEN 1
+                WHEN '1-10' THEN 2
+                WHEN '11-50' THEN 3
+                WHEN '51-100' THEN 4
+                WHEN '101-200' THEN 5
+                WHEN '201-500' THEN 6
+                ELSE 7
+            END as range_order
+        FROM rollups, jsonb_each_text(rollups.review_histogram) h
+        GROUP BY h.key
+    ),
+    top_10 AS (
+        SELECT business_name, rating, review_count, local_pack_rank, website,
+               pricing_botox, instagram_handle, owner_name
+        FROM leads
+        WHERE city = %(city)s AND state = %(state)s 
+        AND (search_niche ILIKE %(niche)s OR search_niche IS NULL)
+        ORDER BY review_count DESC NULLS LAST
+        LIMIT 10
+    ),
+    city_review_ranks AS (
+        -- Position = 1 + number of businesses in the city (any niche) with more
+        -- reviews, computed with one window sort instead of a per-row subquery
+        SELECT 
+            l3.business_name,
+            l3.review_count,
+            l3.search_niche,
+            CASE 
+                WHEN l3.review_count IS NULL THEN 1
+                ELSE RANK() OVER (ORDER BY l3.review_count DESC NULLS LAST)
+            END as review_rank
+        FROM leads l3
+        WHERE l3.city = %(city)s AND l3.state = %(state)s
+    ),
+    rankings AS (
+        SELECT business_name, review_count, review_rank
+        FROM city_review_ranks
+        WHERE (search_niche ILIKE %(niche)s OR search_niche IS NULL)
+        ORDER BY review_count DESC, business_name
+        LIMIT %(rankings_limit)s
+    )
+    SELECT 
+        -- 1. Overall market summary
+        COALESCE(SUM(total_businesses), 0) as total_businesses,
+        SUM(rating_sum) / NULLIF(SUM(rating_count), 0) as avg_rating,
+        SUM(review_sum)::numeric / NULLIF(SUM(reviewed_count), 0) as avg_reviews,
+        (SELECT json_object_agg(review_count, business_count) FROM review_freq) as review_count_freq,
+        MAX(max_reviews) as max_reviews,
+        MIN(min_reviews) as min_reviews,
+        COALESCE(SUM(top_3_count), 0) as top_3_count,
+        COALESCE(SUM(rank_4_to_10), 0) as rank_4_to_10,
+        COALESCE(SUM(with_email), 0) as with_email,
+        COALESCE(SUM(with_owner), 0) as with_owner,
+        -- 4. Pricing intelligence
+        COALESCE(SUM(with_botox_pricing), 0) as with_botox_pricing,
+        SUM(botox_price_sum) / NULLIF(SUM(botox_price_count), 0) as avg_botox_price,
+        MIN(min_botox_price) as min_botox_price,
+        MAX(max_botox_price) as max_botox_price,
+        -- 5. Growth indicators
+        COALESCE(SUM(with_instagram), 0) as with_instagram,
+        COALESCE(SUM(with_facebook), 0) as with_facebook,
+        COALESCE(SUM(with_website), 0) as with_website,
+        COALESCE(SUM(with_medical_director), 0) as with_medical_director,
+        -- 2. Top 10 competitors by review count
+        (SELECT json_agg(json_build_array(
+                    business_name, rating, review_count, local_pack_rank, website,
+                    pricing_botox, instagram_handle, owner_name
+                ) ORDER BY review_count DESC NULLS LAST)
+         FROM top_10) as top_competitors,
+        -- 3. Review distribution analysis
+        (SELECT json_agg(json_build_array(review_range, business_count) ORDER BY range_order)
+         FROM review_histogram) as review_distribution,
+        -- 6. Market ranking positions
+        (SELECT json_agg(json_build_array(business_name, review_count, review_rank)
+                         ORDER BY review_count DESC, business_name)
+         FROM rankings) as market_rankings
+    FROM rollups
+"""
 
-def get_market_intelligence(city: str, state: str, niche: str = 'med spa') -> Dict[str, Any]:
+def median_from_frequencies(freq: Optional[Dict[str, int]]) -> Optional[float]:
+    """
+    PERCENTILE_CONT(0.5) over a {value: occurrences} frequency map
+    """
+    if not freq:
+        return None
+    values = sorted((int(value), int(count)) for value, count in freq.items())
+    total = sum(count for _, count in values)
+    position = 0.5 * (total - 1)
+    lower_idx, upper_idx = int(position), min(int(position) + 1, total - 1)
+
+    lower = upper = None
+    seen = 0
+    for value, count in values:
+        seen += count
+        if lower is None and seen > lower_idx:
+            lower = value
+        if seen > upper_idx:
+            upper = value
+            break
+    return lower + (upper - lower) * (position - lower_idx)
+
+def market_intelligence_params(city: str, state: str, niche: str) -> Dict[str, Any]:
+    """
+    Bind parameters for MARKET_INTELLIGENCE_SQL
+    """
+    return {
+        'city': city,
+        'state': state,
+        'niche': f'%{niche}%',
+        'rankings_limit': MARKET_RANKINGS_LIMIT,
+    }
+
+def build_market_intelligence(result) -> Dict[str, Any]:
+    """
+    Shape a MARKET_INTELLIGENCE_SQL row into the market intelligence response
+    """
+    market_data = {}
+    if not result:
+        return market_data
+
+    market_data['market_summary'] = {
+        'total_businesses': result[0],
+        'avg_rating': float(result[1]) if result[1] else 0,
+        'avg_reviews': int(result[2]) if result[2] else 0,
+        'median_reviews': int(median_from_frequencies(result[3]) or 0),
+        'max_reviews': result[4] or 0,
+        'min_reviews': result[5] or 0,
+        'top_3_count': result[6],
+        'rank_4_to_10': result[7],
+        'with_email': result[8],
+        'with_owner': result[9]
+    }
+
+    market_data['top_competitors'] = [
+        {
+            'name': row[0],
+            'rating': float(row[1]) if row[1] is not None else None,
+            'reviews': row[2] or 0,
+            'rank': row[3],
+            'website': row[4],
+            'botox_price': row[5],
+            'instagram': row[6],
+            'has_owner': bool(row[7])
+        }
+        for row in result[18] or []
+    ]
+
+    market_data['review_distribution'] = [
+        {
+            'range': row[0],
+            'count': row[1]
+        }
+        for row in result[19] or []
+    ]
+
+    market_data['pricing_intelligence'] = {
+        'businesses_with_pricing': result[10] or 0,
+        'avg_botox_price': float(result[11]) if result[11] else None,
+        'min_botox_price': float(result[12]) if result[12] else None,
+        'max_botox_price': float(result[13]) if result[13] else None
+    }
+
+    market_data['digital_presence'] = {
+        'with_instagram': result[14] or 0,
+        'with_facebook': result[15] or 0,
+        'with_website': result[16] or 0,
+        'with_medical_director': result[17] or 0
+    }
+
+    market_data['market_rankings'] = [
+        {
+            'business': row[0],
+            'reviews': row[1] or 0,
+            'position': row[2]
+        }
+        for row in result[20] or []
+    ]
+    return market_data
+
+@cached_market('market_intelligence')
+async def get_market_intelligence(city: str, state: str, niche: str = 'med spa') -> Dict[str, Any]:
     """
     Get comprehensive market intelligence for a specific city/state area
     """
-    conn = psycopg2.connect(DATABASE_URL)
+    pool = await get_async_pool()
+    conn = await pool.getconn()
     cur = conn.cursor()
     
     market_data = {}
     
     try:
-        # 1. Overall market summary for the city
-        cur.execute("""
-            SELECT 
-                COUNT(*) as total_businesses,
-                AVG(rating) as avg_rating,
-                AVG(review_count) as avg_reviews,
-                PERCENTILE_CONT(0.5) WITHIN GROUP (ORDER BY review_count) as median_reviews,
-                MAX(review_count) as max_reviews,
-                MIN(review_count) as min_reviews,
-                COUNT(CASE WHEN local_pack_rank <= 3 THEN 1 END) as top_3_count,
-                COUNT(CASE WHEN local_pack_rank BETWEEN 4 AND 10 THEN 1 END) as rank_4_to_10,
-                COUNT(CASE WHEN email IS NOT NULL THEN 1 END) as with_email,
-                COUNT(CASE WHEN owner_name IS NOT NULL THEN 1 END) as with_owner
-            FROM leads 
-            WHERE city = %s AND state = %s 
-            AND (search_niche ILIKE %s OR search_niche IS NULL)
-        """, (city, state, f'%{niche}%'))
-        
-        result = cur.fetchone()
-        if result:
-            market_data['market_summary'] = {
-                'total_businesses': result[0],
-                'avg_rating': float(result[1]) if result[1] else 0,
-                'avg_reviews': int(result[2]) if result[2] else 0,
-                'median_reviews': int(result[3]) if result[3] else 0,
-                'max_reviews': result[4] or 0,
-                'min_reviews': result[5] or 0,
-                'top_3_count': result[6],
-                'rank_4_to_10': result[7],
-                'with_email': result[8],
-                'with_owner': result[9]
-            }
-        
-        # 2. Top 10 competitors by review count
-        cur.execute("""
-            SELECT 
-                business_name,
-                rating,
-                review_count,
-                local_pack_rank,
-                website,
-                CASE 
-                    WHEN pricing_botox IS NOT NULL THEN pricing_botox
-                    ELSE NULL
-                END as botox_price,
-                instagram_handle,
-                owner_name
-            FROM leads 
-            WHERE city = %s AND state = %s 
-            AND (search_niche ILIKE %s OR search_niche IS NULL)
-            ORDER BY review_count DESC NULLS LAST
-            LIMIT 10
-        """, (city, state, f'%{niche}%'))
-        
-        top_competitors = []
-        for row in cur.fetchall():
-            top_competitors.append({
-                'name': row[0],
-                'rating': float(row[1]) if row[1] is not None else None,
-                'reviews': row[2] or 0,
-                'rank': row[3],
-                'website': row[4],
-                'botox_price': row[5],
-                'instagram': row[6],
-                'has_owner': bool(row[7])
-            })
-        market_data['top_competitors'] = top_competitors
-        
-        # 3. Review distribution analysis
-        cur.execute("""
-            SELECT 
-                CASE 
-                    WHEN review_count = 0 THEN '0'
-                    WHEN review_count BETWEEN 1 AND 10 THEN '1-10'
-                    WHEN review_count BETWEEN 11 AND 50 THEN '11-50'
-                    WHEN review_count BETWEEN 51 AND 100 THEN '51-100'
-                    WHEN review_count BETWEEN 101 AND 200 THEN '101-200'
-                    WHEN review_count BETWEEN 201 AND 500 THEN '201-500'
-                    ELSE '500+'
-                END as review_range,
-                COUNT(*) as business_count
-            FROM leads 
-            WHERE city = %s AND state = %s 
-            AND (search_niche ILIKE %s OR search_niche IS NULL)
-            GROUP BY review_range
-            ORDER BY 
-                CASE review_range
-                    WHEN '0' THEN 1
-                    WHEN '1-10' THEN 2
-                    WHEN '11-50' THEN 3
-                    WHEN '51-100' THEN 4
-                    WHEN '101-200' THEN 5
-                    WHEN '201-500' THEN 6
-                    ELSE 7
-                END
-        """, (city, state, f'%{niche}%'))
-        
-        review_distribution = []
-        for row in cur.fetchall():
-            review_distribution.append({
-                'range': row[0],
-                'count': row[1]
-            })
-        market_data['review_distribution'] = review_distribution
-        
-        # 4. Pricing intelligence
-        cur.execute("""
-            SELECT 
-                COUNT(CASE WHEN pricing_botox IS NOT NULL THEN 1 END) as with_botox_pricing,
-                AVG(CASE 
-                    WHEN pricing_botox ~ '^[0-9]+$' THEN CAST(pricing_botox AS NUMERIC)
-                    WHEN pricing_botox ~ '^\\$([0-9]+)' THEN CAST(SUBSTRING(pricing_botox FROM '\\$([0-9]+)') AS NUMERIC)
-                    ELSE NULL
-                END) as avg_botox_price,
-                MIN(CASE 
-                    WHEN pricing_botox ~ '^[0-9]+$' THEN CAST(pricing_botox AS NUMERIC)
-                    WHEN pricing_botox ~ '^\\$([0-9]+)' THEN CAST(SUBSTRING(pricing_botox FROM '\\$([0-9]+)') AS NUMERIC)
-                    ELSE NULL
-                END) as min_botox_price,
-                MAX(CASE 
-                    WHEN pricing_botox ~ '^[0-9]+$' THEN CAST(pricing_botox AS NUMERIC)
-                    WHEN pricing_botox ~ '^\\$([0-9]+)' THEN CAST(SUBSTRING(pricing_botox FROM '\\$([0-9]+)') AS NUMERIC)
-                    ELSE NULL
-                END) as max_botox_price
-            FROM leads 
-            WHERE city = %s AND state = %s 
-            AND (search_niche ILIKE %s OR search_niche IS NULL)
-        """, (city, state, f'%{niche}%'))
-        
-        pricing_result = cur.fetchone()
-        if pricing_result:
-            market_data['pricing_intelligence'] = {
-                'businesses_with_pricing': pricing_result[0] or 0,
-                'avg_botox_price': float(pricing_result[1]) if pricing_result[1] else None,
-                'min_botox_price': float(pricing_result[2]) if pricing_result[2] else None,
-                'max_botox_price': float(pricing_result[3]) if pricing_result[3] else None
-            }
-        
-        # 5. Growth indicators
-        cur.execute("""
-            SELECT 
-                COUNT(CASE WHEN instagram_handle IS NOT NULL THEN 1 END) as with_instagram,
-                COUNT(CASE WHEN facebook_handle IS NOT NULL THEN 1 END) as with_facebook,
-                COUNT(CASE WHEN website IS NOT NULL THEN 1 END) as with_website,
-                COUNT(CASE WHEN medical_director_name IS NOT NULL THEN 1 END) as with_medical_director
-            FROM leads 
-            WHERE city = %s AND state = %s 
-            AND (search_niche ILIKE %s OR search_niche IS NULL)
-        """, (city, state, f'%{niche}%'))
-        
-        growth_result = cur.fetchone()
-        if growth_result:
-            market_data['digital_presence'] = {
-                'with_instagram': growth_result[0] or 0,
-                'with_facebook': growth_result[1] or 0,
-                'with_website': growth_result[2] or 0,
-                'with_medical_director': growth_result[3] or 0
-            }
-            
-        # 6. Get business's own ranking position
-        cur.execute("""
-            SELECT 
-                business_name,
-                review_count,
-                (SELECT COUNT(*) + 1 FROM leads l2 
-                 WHERE l2.city = l1.city AND l2.state = l1.state 
-                 AND l2.review_count > l1.review_count) as review_rank
-            FROM leads l1
-            WHERE city = %s AND state = %s 
-            AND (search_niche ILIKE %s OR search_niche IS NULL)
-            ORDER BY review_count DESC
-        """, (city, state, f'%{niche}%'))
-        
-        rankings = []
-        for row in cur.fetchall():
-            rankings.append({
-                'business': row[0],
-                'reviews': row[1] or 0,
-                'position': row[2]
-            })
-        market_data['market_rankings'] = rankings[:20]  # Top 20 for context
+        await cur.execute(MARKET_INTELLIGENCE_SQL, market_intelligence_params(city, state, niche))
+        market_data = build_market_intelligence(await cur.fetchone())
         
     except Exception as e:
         print(f"Error fetching market intelligence: {e}")
         market_data['error'] = str(e)
     finally:
-        cur.close()
-        conn.close()
+        await cur.close()
+        await pool.putconn(conn)
     
     return market_data
 
-def get_business_percentile(business_name: str, city: str, state: str) -> Dict[str, Any]:
+async def get_business_percentile(business_name: str, city: str, state: str) -> Dict[str, Any]:
     """
     Get a specific business's percentile rankings in their market
     """
-    conn = psycopg2.connect(DATABASE_URL)
+    pool = await get_async_pool()
+    conn = await pool.getconn()
     cur = conn.cursor()
     
     percentile_data = {}
     
     try:
-        cur.execute("""
+        await cur.execute("""
             WITH business_data AS (
                 SELECT 
                     business_name,
@@ -256,7 +324,7 @@ def get_business_percentile(business_name: str, city: str, state: str) -> Dict[s
             LEFT JOIN market_stats ms ON bd.business_name = ms.business_name
         """, (business_name, city, state, city, state, city, state))
         
-        result = cur.fetchone()
+        result = await cur.fetchone()
         if result:
             percentile_data = {
                 'business_name': result[0],
@@ -272,133 +340,248 @@ def get_business_percentile(business_name: str, city: str, state: str) -> Dict[s
         print(f"Error fetching percentile data: {e}")
         percentile_data['error'] = str(e)
     finally:
-        cur.close()
-        conn.close()
+        await cur.close()
+        await pool.putconn(conn)
     
     return percentile_data
 
-def get_rollup_market_stats(city: str, state: str, niche: str = 'med spa') -> Dict[str, Any]:
+async def get_market_percentiles(city: str, state: str, business_names: List[str]) -> Dict[str, Dict[str, Any]]:
     """
-    Get aggregated market statistics from roll-up tables
+    Percentile rankings for many businesses in one market with a single
+    window pass; values match get_business_percentile, keyed by business_name
     """
-    conn = psycopg2.connect(DATABASE_URL)
+    pool = await get_async_pool()
+    conn = await pool.getconn()
+    cur = conn.cursor()
+
+    percentiles = {}
+
+    try:
+        await cur.execute("""
+            SELECT business_name, review_count, rating, local_pack_rank,
+                   review_percentile, rating_percentile, total_businesses
+            FROM (
+                SELECT
+                    business_name,
+                    review_count,
+                    rating,
+                    local_pack_rank,
+                    PERCENT_RANK() OVER (ORDER BY review_count) as review_percentile,
+                    PERCENT_RANK() OVER (ORDER BY rating) as rating_percentile,
+                    COUNT(*) OVER () as total_businesses
+                FROM leads
+                WHERE city = %s AND state = %s
+            ) ranked
+            WHERE business_name = ANY(%s)
+        """, (city, state, list(business_names)))
+
+        for result in await cur.fetchall():
+            percentiles.setdefault(result[0], {
+                'business_name': result[0],
+                'review_count': result[1] or 0,
+                'rating': float(result[2]) if result[2] else 0,
+                'local_pack_rank': result[3],
+                'review_percentile': round((result[4] or 0) * 100, 1),
+                'rating_percentile': round((result[5] or 0) * 100, 1),
+                'total_businesses': result[6]
+            })
+
+    except Exception as e:
+        print(f"Error fetching market percentiles: {e}")
+    finally:
+        await cur.close()
+        await pool.putconn(conn)
+
+    return percentiles
+
+@cached_market('market_competitors')
+async def get_market_competitors(city: str, state: str, niche: str) -> List[Dict[str, Any]]:
+    """
+    Precomputed top local-pack competitors for a (niche, city, state) market
+    (market_competitors, kept current by triggers on leads), best rank first.
+    Returns [] when the market has no top-3 entries; errors propagate so a
+    failed lookup is never cached.
+    """
+    pool = await get_async_pool()
+    conn = await pool.getconn()
+    cur = conn.cursor()
+
+    try:
+        await cur.execute("""
+            SELECT competitors
+            FROM market_competitors
+            WHERE niche_key = normalize_niche_key(%s)
+            AND city_key = normalize_market_key(%s)
+            AND state = %s
+        """, (niche, city, state))
+        row = await cur.fetchone()
+    finally:
+        await cur.close()
+        await pool.putconn(conn)
+
+    return row[0] if row else []
+
+def haversine_miles(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    """
+    Great-circle distance between two coordinates in miles
+    """
+    lat1, lng1, lat2, lng2 = map(math.radians, (lat1, lng1, lat2, lng2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    return 3958.8 * 2 * math.asin(math.sqrt(a))
+
+async def nearest_markets(origin_sql: str, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Nearest markets (by great-circle distance, within NEAREST_MARKETS_MAX_MILES)
+    that have at least NEAREST_MARKETS_MIN_COMPETITORS ranked competitors
+    """
+    pool = await get_async_pool()
+    conn = await pool.getconn()
+    cur = conn.cursor()
+
+    try:
+        await cur.execute(NEAREST_MARKETS_SQL.format(origin=origin_sql), {
+            'min_competitors': NEAREST_MARKETS_MIN_COMPETITORS,
+            'candidates': NEAREST_MARKETS_CANDIDATES,
+            **params,
+        })
+        rows = await cur.fetchall()
+    finally:
+        await cur.close()
+        await pool.putconn(conn)
+
+    markets = [
+        {
+            'city': row[0],
+            'state': row[1],
+            'distance_miles': round(haversine_miles(row[4], row[5], row[2], row[3]), 1),
+            'competitors': row[6],
+        }
+        for row in rows
+    ]
+    markets = [m for m in markets if m['distance_miles'] <= NEAREST_MARKETS_MAX_MILES]
+    markets.sort(key=lambda m: m['distance_miles'])
+    return markets[:NEAREST_MARKETS_LIMIT]
+
+@cached_market('nearest_markets')
+async def get_nearest_markets(city: str, state: str, niche: str) -> List[Dict[str, Any]]:
+    """
+    Nearest markets with ranked competitors, measured from the city's own
+    centroid; cached per city. [] when the city has no geocoded leads.
+    """
+    return await nearest_markets(
+        f"({CITY_ORIGIN_SQL})",
+        {'city': city, 'state': state, 'niche': niche},
+    )
+
+async def get_nearest_markets_to_point(latitude: float, longitude: float, niche: str,
+                                       city: Optional[str] = None, state: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    Nearest markets with ranked competitors, measured from a business's own
+    coordinates (for cities without a centroid)
+    """
+    return await nearest_markets(
+        "point(%(longitude)s::float8, %(latitude)s::float8)",
+        {'city': city, 'state': state, 'niche': niche, 'latitude': latitude, 'longitude': longitude},
+    )
+
+@cached_market('rollup_market_stats')
+async def get_rollup_market_stats(city: str, state: str, niche: str = 'med spa') -> Dict[str, Any]:
+    """
+    Get aggregated market statistics from roll-up tables (market_rollups,
+    kept current by triggers on leads)
+    """
+    pool = await get_async_pool()
+    conn = await pool.getconn()
     cur = conn.cursor()
     
     rollup_data = {}
     
     try:
-        # 1. Service Distribution - What services are most common
-        cur.execute("""
+        await cur.execute("""
             SELECT 
-                COUNT(CASE WHEN pricing_botox IS NOT NULL THEN 1 END) as offers_botox,
-                COUNT(CASE WHEN pricing_filler IS NOT NULL THEN 1 END) as offers_filler,
-                COUNT(CASE WHEN pricing_membership IS NOT NULL THEN 1 END) as has_membership,
-                COUNT(CASE WHEN instagram_handle IS NOT NULL THEN 1 END) as active_instagram,
-                COUNT(CASE WHEN medical_director_name IS NOT NULL THEN 1 END) as has_med_director,
-                COUNT(DISTINCT owner_name) as unique_owners
-            FROM leads 
+                offers_botox,
+                offers_filler,
+                has_membership,
+                active_instagram,
+                has_med_director,
+                unique_owners,
+                rating_distribution,
+                competitor_count,
+                avg_reviews,
+                leader_reviews,
+                top_quartile_reviews,
+                has_website,
+                has_email,
+                has_social,
+                transparent_pricing
+            FROM market_rollups 
             WHERE city = %s AND state = %s
         """, (city, state))
         
-        services = cur.fetchone()
-        if services:
-            rollup_data['service_distribution'] = {
-                'offers_botox': services[0],
-                'offers_filler': services[1],
-                'has_membership': services[2],
-                'active_instagram': services[3],
-                'has_med_director': services[4],
-                'unique_owners': services[5]
-            }
+        # A market with no leads has no rollup row; report it as empty
+        row = await cur.fetchone() or (0, 0, 0, 0, 0, 0, [], 0, None, None, None, 0, 0, 0, 0)
         
-        # 2. Rating Distribution
-        cur.execute("""
-            SELECT 
-                CASE 
-                    WHEN rating >= 4.8 THEN 'Excellent (4.8+)'
-                    WHEN rating >= 4.5 THEN 'Very Good (4.5-4.7)'
-                    WHEN rating >= 4.0 THEN 'Good (4.0-4.4)'
-                    WHEN rating >= 3.5 THEN 'Average (3.5-3.9)'
-                    ELSE 'Below Average (<3.5)'
-                END as rating_tier,
-                COUNT(*) as count,
-                AVG(review_count) as avg_reviews
-            FROM leads 
-            WHERE city = %s AND state = %s AND rating IS NOT NULL
-            GROUP BY rating_tier
-            ORDER BY MIN(rating) DESC
-        """, (city, state))
+        # 1. Service Distribution - What services are most common
+        rollup_data['service_distribution'] = {
+            'offers_botox': row[0],
+            'offers_filler': row[1],
+            'has_membership': row[2],
+            'active_instagram': row[3],
+            'has_med_director': row[4],
+            'unique_owners': row[5]
+        }
         
-        rating_distribution = []
-        for row in cur.fetchall():
-            rating_distribution.append({
-                'tier': row[0],
-                'count': row[1],
-                'avg_reviews': int(row[2]) if row[2] else 0
-            })
-        rollup_data['rating_distribution'] = rating_distribution
+        # 2. Rating Distribution
+        rollup_data['rating_distribution'] = [
+            {
+                'tier': tier['tier'],
+                'count': tier['count'],
+                'avg_reviews': tier['avg_reviews']
+            }
+            for tier in row[6] or []
+        ]
         
         # 3. Competition Intensity by Area
-        cur.execute("""
-            SELECT 
-                COUNT(*) as competitor_count,
-                AVG(review_count) as avg_reviews,
-                MAX(review_count) as leader_reviews,
-                PERCENTILE_CONT(0.75) WITHIN GROUP (ORDER BY review_count) as top_quartile_reviews
-            FROM leads 
-            WHERE city = %s AND state = %s
-        """, (city, state))
-        
-        intensity = cur.fetchone()
-        if intensity:
-            rollup_data['competition_intensity'] = {
-                'total_competitors': intensity[0],
-                'avg_reviews': int(intensity[1]) if intensity[1] else 0,
-                'market_leader_reviews': intensity[2] or 0,
-                'top_quartile_threshold': int(intensity[3]) if intensity[3] else 0
-            }
+        rollup_data['competition_intensity'] = {
+            'total_competitors': row[7],
+            'avg_reviews': int(row[8]) if row[8] else 0,
+            'market_leader_reviews': row[9] or 0,
+            'top_quartile_threshold': int(row[10]) if row[10] else 0
+        }
         
         # 4. Digital Maturity Score
-        cur.execute("""
-            SELECT 
-                COUNT(*) as total,
-                COUNT(CASE WHEN website IS NOT NULL THEN 1 END) as has_website,
-                COUNT(CASE WHEN email IS NOT NULL THEN 1 END) as has_email,
-                COUNT(CASE WHEN instagram_handle IS NOT NULL OR facebook_handle IS NOT NULL THEN 1 END) as has_social,
-                COUNT(CASE WHEN pricing_botox IS NOT NULL OR pricing_filler IS NOT NULL THEN 1 END) as transparent_pricing
-            FROM leads 
-            WHERE city = %s AND state = %s
-        """, (city, state))
-        
-        digital = cur.fetchone()
-        if digital and digital[0] > 0:
+        total = row[7]
+        if total > 0:
             rollup_data['digital_maturity'] = {
-                'website_adoption': round(100 * digital[1] / digital[0], 1),
-                'email_capture': round(100 * digital[2] / digital[0], 1),
-                'social_presence': round(100 * digital[3] / digital[0], 1),
-                'price_transparency': round(100 * digital[4] / digital[0], 1)
+                'website_adoption': round(100 * row[11] / total, 1),
+                'email_capture': round(100 * row[12] / total, 1),
+                'social_presence': round(100 * row[13] / total, 1),
+                'price_transparency': round(100 * row[14] / total, 1)
             }
             
     except Exception as e:
         print(f"Error fetching rollup stats: {e}")
         rollup_data['error'] = str(e)
     finally:
-        cur.close()
-        conn.close()
+        await cur.close()
+        await pool.putconn(conn)
     
     return rollup_data
 
-def get_detailed_competitors(business_name: str, city: str, state: str, limit: int = 20) -> List[Dict[str, Any]]:
+@cached_market('detailed_competitors')
+async def get_detailed_competitors(business_name: str, city: str, state: str, limit: int = 20) -> List[Dict[str, Any]]:
     """
-    Get detailed competitor information for display
+    Get detailed competitor information for display; errors propagate so a
+    failed lookup is never cached
     """
-    conn = psycopg2.connect(DATABASE_URL)
+    pool = await get_async_pool()
+    conn = await pool.getconn()
     cur = conn.cursor()
     
     competitors = []
     
     try:
-        cur.execute("""
+        await cur.execute("""
             SELECT 
                 business_name,
                 rating,
@@ -426,7 +609,7 @@ def get_detailed_competitors(business_name: str, city: str, state: str, limit: i
             LIMIT %s
         """, (city, state, limit))
         
-        for row in cur.fetchall():
+        for row in await cur.fetchall():
             competitors.append({
                 'name': row[0],
                 'rating': float(row[1]) if row[1] else None,
@@ -445,10 +628,8 @@ def get_detailed_competitors(business_name: str, city: str, state: str, limit: i
                 'tier': row[14]
             })
             
-    except Exception as e:
-        print(f"Error fetching detailed competitors: {e}")
     finally:
-        cur.close()
-        conn.close()
+        await cur.close()
+        await pool.putconn(conn)
     
     return competitors
\ No newline at end of file
@@ -0,0 +1,62 @@
+"""
+Business Name Search Module
+Fuzzy lookup of a lead by business name for /api/analyze?name=
+Uses the pg_trgm GiST index (migrations/create_business_name_search_index.sql):
+a KNN scan on word-similarity distance pulls the nearest names, which are then
+re-scored so the best match comes back with a 0..1 confidence. The index is
+maintained by Postgres on every insert/update, so new leads are searchable
+immediately.
+"""
+
+import os
+from typing import Any, Dict, Optional
+
+# Matches scoring below this are treated as "not found"
+NAME_MATCH_MIN_CONFIDENCE = float(os.getenv('NAME_MATCH_MIN_CONFIDENCE', '0.4'))
+
+# Nearest names pulled from the index before re-scoring
+NAME_MATCH_CANDIDATES = 20
+
+# `business_name <->> name` is 1 - word_similarity(name, business_name): how
+# well the requested name matches some run of words inside business_name, so
+# partial names ("Glow Med") and small typos still land. Ties are broken by
+# whole-string similarity, then by the larger business.
+NAME_MATCH_SQL = """
+    WITH candidates AS MATERIALIZED (
+        SELECT id, business_name, review_count
+        FROM leads
+        WHERE business_name IS NOT NULL {city_filter}
+        ORDER BY business_name <->> %(name)s
+        LIMIT %(candidates)s
+    ),
+    scored AS (
+        SELECT
+            id,
+            review_count,
+            word_similarity(%(name)s, business_name) as name_confidence,
+            similarity(%(name)s, business_name) as name_similarity
+        FROM candidates
+    )
+    SELECT id, name_confidence
+    FROM scored
+    WHERE name_confidence >= %(min_confidence)s
+    ORDER BY name_confidence DESC, name_similarity DESC, review_count DESC NULLS LAST
+    LIMIT 1
+"""
+
+
+def name_match_sql(in_city: bool = False) -> str:
+    """NAME_MATCH_SQL, optionally restricted to one city by its normalized key"""
+    city_filter = "AND city_key = normalize_market_key(%(city)s)" if in_city else ""
+    return NAME_MATCH_SQL.format(city_filter=city_filter)
+
+
+def name_match_params(name: str, city: Optional[str] = None,
+                      min_confidence: float = NAME_MATCH_MIN_CONFIDENCE) -> Dict[str, Any]:
+    """Bind parameters for name_match_sql()"""
+    return {
+        'name': name.strip(),
+        'city': city,
+        'candidates': NAME_MATCH_CANDIDATES,
+        'min_confidence': min_confidence,
+    }
@@ -0,0 +1,405 @@
+"""
+Rank Checker Module
+Live Google Maps rank checks for /api/real-time-rank.
+
+- A warm pool of headless Chromium pages (one browser, RANK_CHECK_PAGES
+  isolated contexts) is launched on first use and reused across checks;
+  a page that errors is closed and replaced
+- Results are looked up per (keyword, location): concurrent checks for the
+  same search share one in-flight lookup, and the extracted local results
+  are cached for RANK_CHECK_CACHE_TTL seconds, so different businesses in
+  the same market are ranked from the same SERP
+- Outbound lookups go through a token bucket (RANK_CHECK_RATE_PER_MINUTE,
+  RANK_CHECK_BURST); a check that would wait longer than
+  RANK_CHECK_MAX_QUEUE_WAIT seconds is refused with RankCheckRateLimited
+
+Point RANK_CHECK_SERP_URL at scripts/fake_serp_server.py to exercise the
+pipeline locally without touching Google.
+"""
+
+import asyncio
+import os
+import re
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+from urllib.parse import quote_plus
+
+from cache import TTLCache
+from tracing import span
+
+try:
+    from playwright.async_api import async_playwright
+except ImportError:  # Playwright is optional; rank checks report unavailable without it
+    async_playwright = None
+
+RANK_CHECK_SERP_URL = os.getenv('RANK_CHECK_SERP_URL', 'https://www.google.com/maps/search/{query}')
+RANK_CHECK_PAGES = int(os.getenv('RANK_CHECK_PAGES', '2'))
+RANK_CHECK_CACHE_TTL = float(os.getenv('RANK_CHECK_CACHE_TTL', '300'))  # seconds
+RANK_CHECK_CACHE_MAXSIZE = int(os.getenv('RANK_CHECK_CACHE_MAXSIZE', '512'))
+RANK_CHECK_RATE_PER_MINUTE = float(os.getenv('RANK_CHECK_RATE_PER_MINUTE', '20'))
+RANK_CHECK_BURST = int(os.getenv('RANK_CHECK_BURST', '5'))
+RANK_CHECK_MAX_QUEUE_WAIT = float(os.getenv('RANK_CHECK_MAX_QUEUE_WAIT', '10'))  # seconds
+RANK_CHECK_TIMEOUT = float(os.getenv('RANK_CHECK_TIMEOUT', '25'))  # seconds a request waits for its lookup
+RANK_CHECK_PAGE_TIMEOUT_MS = int(os.getenv('RANK_CHECK_PAGE_TIMEOUT_MS', '20000'))
+RANK_CHECK_PREWARM = os.getenv('RANK_CHECK_PREWARM', '0') not in ('0', 'false', 'False')
+
+MAX_RESULTS = 20
+RESULTS_PER_PAGE = 20
+FEED_SCROLLS = 5
+FEED_SCROLL_WAIT_MS = 2000  # per scroll, for lazy-loaded cards to appear
+
+BROWSER_ARGS = [
+    '--no-sandbox',
+    '--disable-setuid-sandbox',
+    '--disable-dev-shm-usage',
+    '--disable-gpu',
+    '--disable-background-timer-throttling',
+    '--disable-backgrounding-occluded-windows',
+    '--disable-renderer-backgrounding',
+]
+
+CARD_SELECTOR = '[role="article"], .Nv2PK'
+
+# Same card extraction as scripts/maps_page_pool.py
+EXTRACT_RESULTS_JS = '''() => {
+    const businesses = [];
+    const cards = document.querySelectorAll('[role="article"], .Nv2PK');
+    for (let i = 0; i < cards.length; i++) {
+        const card = cards[i];
+        const name = card.querySelector('.fontHeadlineSmall, .qBF1Pd')?.textContent ||
+                     card.getAttribute('aria-label')?.split(',')[0] || '';
+        if (!name) continue;
+        let rating = null;
+        let reviews = null;
+        const ratingEl = card.querySelector('[role="img"][aria-label*="star"]');
+        if (ratingEl) {
+            const ariaLabel = ratingEl.getAttribute('aria-label') || '';
+            const ratingMatch = ariaLabel.match(/([0-9.]+)/);
+            const reviewMatch = ariaLabel.match(/\\(([0-9,]+)\\)/);
+            if (ratingMatch) rating = parseFloat(ratingMatch[1]);
+            if (reviewMatch) reviews = parseInt(reviewMatch[1].replace(/,/g, ''));
+        }
+        businesses.push({rank: businesses.length + 1, name: name.trim(), rating: rating, reviews: reviews});
+    }
+    return businesses;
+}'''
+
+COUNT_CARDS_JS = f"() => document.querySelectorAll('{CARD_SELECTOR}').length"
+CARDS_GREW_JS = f"count => document.querySelectorAll('{CARD_SELECTOR}').length > count"
+
+# Maps' own empty state ("Google Maps can't find ...")
+NO_RESULTS_JS = r"() => /can[\u2019']t find|no results found/i.test(document.body ? document.body.innerText : '')"
+
+PLACE_NAME_JS = "() => document.querySelector('h1')?.textContent?.trim() || ''"
+
+
+class RankCheckUnavailable(Exception):
+    """Raised when no browser can be launched (Playwright missing or broken)"""
+
+
+class SerpNotLoaded(Exception):
+    """
+    Raised when a search page shows neither results nor Maps' no-results
+    state (captcha, consent wall, slow load), so it is never cached as "not ranked"
+    """
+
+
+class RankCheckRateLimited(Exception):
+    """Raised when the outbound lookup budget is exhausted for longer than the allowed wait"""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f'Rank check rate limit reached; retry in {retry_after:.0f}s')
+        self.retry_after = retry_after
+
+
+def normalize_name(name: Optional[str]) -> str:
+    return re.sub(r'[^a-z0-9]+', ' ', (name or '').lower()).strip()
+
+
+def names_match(name: Optional[str], target: Optional[str]) -> bool:
+    """
+    Same business name: equal once normalized, or the same set of words
+    ("Spa Glow Med" / "Glow Med Spa"). A shorter name that merely appears
+    inside the other ("Med Spa" in "Glow Med Spa") is a different business
+    """
+    name, target = normalize_name(name), normalize_name(target)
+    if not name or not target:
+        return False
+    return name == target or set(name.split()) == set(target.split())
+
+
+def serp_key(keyword: str, location: str) -> str:
+    return f"{normalize_name(keyword)}|{normalize_name(location)}"
+
+
+class TokenBucket:
+    """
+    Async token bucket; ``acquire`` reserves a token and sleeps until it is
+    due, or raises RankCheckRateLimited if that would take over ``max_wait``
+    """
+
+    def __init__(self, rate_per_minute: float = RANK_CHECK_RATE_PER_MINUTE, burst: int = RANK_CHECK_BURST):
+        self.rate = max(rate_per_minute, 0.001) / 60.0
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, max_wait: float = RANK_CHECK_MAX_QUEUE_WAIT):
+        async with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            wait = 0.0 if self._tokens >= 1 else (1 - self._tokens) / self.rate
+            if wait > max_wait:
+                raise RankCheckRateLimited(wait)
+            # Tokens may go negative: later callers queue behind this reservation
+            self._tokens -= 1
+        if wait:
+            await asyncio.sleep(wait)
+
+
+class BrowserPool:
+    """Warm headless Chromium pages handed out one lookup at a time"""
+
+    def __init__(self, size: int = RANK_CHECK_PAGES, page_timeout_ms: int = RANK_CHECK_PAGE_TIMEOUT_MS):
+        self.size = max(1, size)
+        self.page_timeout_ms = page_timeout_ms
+        self._playwright = None
+        self._browser = None
+        self._pages: Optional[asyncio.Queue] = None
+        self._lock = asyncio.Lock()
+        self.counters = {'launches': 0, 'pages_created': 0, 'pages_recycled': 0}
+
+    async def start(self):
+        """Launch the browser and open the page pool (idempotent; relaunches after a crash)"""
+        async with self._lock:
+            if self._browser is not None and self._browser.is_connected():
+                return
+            if async_playwright is None:
+                raise RankCheckUnavailable('Playwright is not installed')
+            await self._shutdown()
+            try:
+                self._playwright = await async_playwright().start()
+                self._browser = await self._playwright.chromium.launch(headless=True, args=BROWSER_ARGS)
+            except Exception as e:
+                await self._shutdown()
+                raise RankCheckUnavailable(f'Could not launch browser: {e}') from e
+            self.counters['launches'] += 1
+            self._pages = asyncio.Queue()
+            for _ in range(self.size):
+                # Pages are opened on first checkout
+                self._pages.put_nowait(None)
+
+    async def _new_page(self):
+        context = await self._browser.new_context(
+            viewport={'width': 1280, 'height': 900},
+            locale='en-US',
+            user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120 Safari/537.36',
+        )
+        page = await context.new_page()
+        page.set_default_timeout(self.page_timeout_ms)
+        self.counters['pages_created'] += 1
+        return page
+
+    @staticmethod
+    async def _close_page(page):
+        try:
+            await page.context.close()
+        except Exception:
+            pass
+
+    @asynccontextmanager
+    async def page(self):
+        """
+        Borrow a page for one lookup; a page whose lookup raised is closed
+        and its slot refilled on next checkout
+        """
+        await self.start()
+        pages = self._pages
+        page = await pages.get()
+        healthy = False
+        try:
+            if page is None or page.is_closed():
+                page = await self._new_page()
+            yield page
+            healthy = True
+        finally:
+            if not healthy and page is not None:
+                self.counters['pages_recycled'] += 1
+                await self._close_page(page)
+                page = None
+            pages.put_nowait(page)
+
+    async def _shutdown(self):
+        if self._pages is not None:
+            while not self._pages.empty():
+                page = self._pages.get_nowait()
+                if page is not None:
+                    await self._close_page(page)
+        for resource, method in ((self._browser, 'close'), (self._playwright, 'stop')):
+            if resource is not None:
+                try:
+                    await getattr(resource, method)()
+                except Exception:
+                    pass
+        self._browser = None
+        self._playwright = None
+
+    async def close(self):
+        async with self._lock:
+            await self._shutdown()
+
+
+class RankChecker:
+    """
+    Rank a business in the local results for (keyword, location)
+
+    Usage:
+        result = await rank_checker.check('Glow Med Spa', 'med spa', 'Austin, TX')
+    """
+
+    def __init__(
+        self,
+        pool: Optional[BrowserPool] = None,
+        limiter: Optional[TokenBucket] = None,
+        cache: Optional[TTLCache] = None,
+        serp_url: str = RANK_CHECK_SERP_URL,
+        timeout: float = RANK_CHECK_TIMEOUT,
+    ):
+        self.pool = pool or BrowserPool()
+        self.limiter = limiter or TokenBucket()
+        self.cache = cache or TTLCache(RANK_CHECK_CACHE_MAXSIZE, RANK_CHECK_CACHE_TTL)
+        self.serp_url = serp_url
+        self.timeout = timeout
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.counters = {'checks': 0, 'cache_hits': 0, 'coalesced': 0, 'lookups': 0, 'lookup_failures': 0}
+
+    async def check(self, business_name: str, keyword: str, location: str) -> Dict[str, Any]:
+        """
+        Rank ``business_name`` for ``keyword`` in ``location``; raises
+        asyncio.TimeoutError after ``timeout`` seconds (the lookup keeps
+        running and fills the cache for a retry)
+        """
+        self.counters['checks'] += 1
+        key = serp_key(keyword, location)
+        cached, serp = self.cache.get(key)
+        if cached:
+            self.counters['cache_hits'] += 1
+        else:
+            task = self._inflight.get(key)
+            if task is None:
+                task = asyncio.create_task(self._lookup(key, keyword, location))
+                self._inflight[key] = task
+                task.add_done_callback(lambda done: self._lookup_done(key, done))
+            else:
+                self.counters['coalesced'] += 1
+            # Shielded: one caller timing out or disconnecting doesn't cancel the shared lookup
+            serp = await asyncio.wait_for(asyncio.shield(task), self.timeout)
+        return rank_result(business_name, keyword, location, serp, cached)
+
+    def _lookup_done(self, key: str, task: asyncio.Task):
+        self._inflight.pop(key, None)
+        # Mark the error retrieved even if every waiter already timed out
+        if not task.cancelled():
+            task.exception()
+
+    async def _lookup(self, key: str, keyword: str, location: str) -> Dict[str, Any]:
+        await self.limiter.acquire()
+        self.counters['lookups'] += 1
+        url = self.serp_url.format(query=quote_plus(f"{keyword} {location}"))
+        try:
+            with span('rank_lookup'):
+                async with self.pool.page() as page:
+                    await page.goto(url, wait_until='domcontentloaded')
+                    results = await extract_results(page)
+        except Exception:
+            self.counters['lookup_failures'] += 1
+            raise
+        serp = {'results': results[:MAX_RESULTS], 'checked_at': datetime.now(timezone.utc).isoformat()}
+        self.cache.set(key, serp)
+        return serp
+
+    async def close(self):
+        for task in list(self._inflight.values()):
+            task.cancel()
+        await self.pool.close()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'inflight': len(self._inflight),
+            'cache_size': len(self.cache),
+            **self.counters,
+            **self.pool.counters,
+        }
+
+
+async def extract_results(page) -> List[Dict[str, Any]]:
+    """Local result cards from a loaded Maps search page, scrolling the feed to load more"""
+    try:
+        await page.wait_for_selector(f'[role="feed"], {CARD_SELECTOR}', timeout=RANK_CHECK_PAGE_TIMEOUT_MS / 2)
+    except Exception:
+        return await results_without_feed(page)
+    feed = await page.query_selector('[role="feed"]') or await page.query_selector('.m6QErb')
+    if feed:
+        await scroll_feed(page, feed)
+    return await page.evaluate(EXTRACT_RESULTS_JS)
+
+
+async def scroll_feed(page, feed, max_results: int = MAX_RESULTS):
+    """Scroll the result feed until max_results cards are loaded or a scroll loads nothing new"""
+    for _ in range(FEED_SCROLLS):
+        count = await page.evaluate(COUNT_CARDS_JS)
+        if count >= max_results:
+            return
+        await feed.evaluate('element => element.scrollTop = element.scrollHeight')
+        try:
+            await page.wait_for_function(CARDS_GREW_JS, arg=count, timeout=FEED_SCROLL_WAIT_MS)
+        except Exception:
+            # Nothing new within the wait: end of the list
+            return
+
+
+async def results_without_feed(page) -> List[Dict[str, Any]]:
+    """
+    Results for a page that never showed a result list: a single-place
+    redirect ranks that place first and Maps' no-results state is a genuine
+    empty SERP; anything else raises SerpNotLoaded
+    """
+    if '/maps/place/' in page.url:
+        name = await page.evaluate(PLACE_NAME_JS)
+        if name:
+            return [{'rank': 1, 'name': name, 'rating': None, 'reviews': None}]
+    if await page.evaluate(NO_RESULTS_JS):
+        return []
+    raise SerpNotLoaded(f"Maps search page showed no results list: {page.url}")
+
+
+def rank_result(business_name: str, keyword: str, location: str, serp: Dict[str, Any], cached: bool) -> Dict[str, Any]:
+    """/api/real-time-rank response for one business from a (keyword, location) SERP"""
+    results = serp.get('results') or []
+    rank = None
+    for result in results:
+        if names_match(result.get('name'), business_name):
+            rank = result['rank']
+            break
+    above = results[:rank - 1] if rank else results[:3]
+    return {
+        'business': business_name,
+        'keyword': keyword,
+        'location': location,
+        'rank': rank,
+        'page': (rank - 1) // RESULTS_PER_PAGE + 1 if rank else None,
+        'competitors_above': [
+            {'name': r.get('name'), 'rank': r.get('rank'), 'rating': r.get('rating'), 'reviews': r.get('reviews')}
+            for r in above
+        ],
+        'total_results': len(results),
+        'checked_at': serp.get('checked_at'),
+        'cached': cached,
+    }
+
+
+rank_checker = RankChecker()
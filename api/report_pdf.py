@@ -0,0 +1,193 @@
+"""
+Report PDF Module
+Renders an /api/analyze response into a plain multi-page PDF for
+/api/generate-report. Writes the PDF objects directly (Helvetica, WinAnsi
+text, no images), so report generation has no rendering dependency and runs
+comfortably in a worker thread.
+"""
+
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+PAGE_WIDTH = 612  # US Letter, points
+PAGE_HEIGHT = 792
+MARGIN = 54
+
+# (text, font size, bold)
+Line = Tuple[str, float, bool]
+
+
+def pdf_text(value: str) -> str:
+    """Escape a string for a PDF literal, dropping characters WinAnsi can't show"""
+    text = str(value).encode('cp1252', errors='replace').decode('cp1252')
+    return text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+
+def wrap(text: str, size: float, indent: float = 0) -> List[str]:
+    """Greedy word wrap using Helvetica's average glyph width (~0.5em)"""
+    max_chars = max(20, int((PAGE_WIDTH - 2 * MARGIN - indent) / (size * 0.5)))
+    lines, current = [], ''
+    for word in str(text).split():
+        candidate = f"{current} {word}" if current else word
+        if len(candidate) > max_chars and current:
+            lines.append(current)
+            current = word
+        else:
+            current = candidate
+    lines.append(current)
+    return lines
+
+
+def fmt_money(value: Any) -> str:
+    try:
+        return f"${float(value):,.0f}"
+    except (TypeError, ValueError):
+        return 'n/a'
+
+
+def fmt_value(value: Any) -> str:
+    if value is None or value == '':
+        return 'n/a'
+    if isinstance(value, float):
+        return f"{value:,.1f}"
+    return str(value)
+
+
+class ReportBuilder:
+    """Accumulates styled lines and lays them out onto pages"""
+
+    def __init__(self):
+        self.lines: List[Tuple[str, float, bool, float]] = []  # (text, size, bold, indent)
+
+    def heading(self, text: str):
+        self.lines.append(('', 8, False, 0))
+        self.lines.append((text, 14, True, 0))
+
+    def text(self, text: str, size: float = 10, bold: bool = False, indent: float = 0):
+        for line in wrap(text, size, indent):
+            self.lines.append((line, size, bold, indent))
+
+    def bullet(self, text: str, indent: float = 12):
+        wrapped = wrap(text, 10, indent + 10)
+        self.lines.append((f"- {wrapped[0]}", 10, False, indent))
+        for line in wrapped[1:]:
+            self.lines.append((line, 10, False, indent + 10))
+
+    def pages(self) -> List[bytes]:
+        """Content streams, one per page"""
+        pages, ops = [], []
+        y = PAGE_HEIGHT - MARGIN
+        for text, size, bold, indent in self.lines:
+            leading = size * 1.4
+            if y - leading < MARGIN:
+                pages.append('\n'.join(ops))
+                ops, y = [], PAGE_HEIGHT - MARGIN
+            y -= leading
+            if text:
+                font = 'F2' if bold else 'F1'
+                ops.append(f"BT /{font} {size:g} Tf {MARGIN + indent:.1f} {y:.1f} Td ({pdf_text(text)}) Tj ET")
+        pages.append('\n'.join(ops))
+        return [page.encode('cp1252', errors='replace') for page in pages]
+
+
+def build_pdf(streams: List[bytes], title: str) -> bytes:
+    """Assemble page content streams into a PDF file"""
+    objects: List[bytes] = []
+    page_ids = [5 + 2 * i for i in range(len(streams))]
+    objects.append(b"<< /Type /Catalog /Pages 2 0 R >>")
+    objects.append(f"<< /Type /Pages /Kids [{' '.join(f'{pid} 0 R' for pid in page_ids)}] /Count {len(streams)} >>".encode())
+    objects.append(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>")
+    objects.append(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica-Bold /Encoding /WinAnsiEncoding >>")
+    for page_id, stream in zip(page_ids, streams):
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {PAGE_WIDTH} {PAGE_HEIGHT}] "
+            f"/Resources << /Font << /F1 3 0 R /F2 4 0 R >> >> /Contents {page_id + 1} 0 R >>".encode()
+        )
+        objects.append(b"<< /Length " + str(len(stream)).encode() + b" >>\nstream\n" + stream + b"\nendstream")
+    info_id = len(objects) + 1
+    objects.append(f"<< /Title ({pdf_text(title)}) /Producer (GetRankedLocal) >>".encode('cp1252', errors='replace'))
+
+    out = bytearray(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n".encode() + body + b"\nendobj\n"
+    xref_at = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    for offset in offsets:
+        out += f"{offset:010d} 00000 n \n".encode()
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R /Info {info_id} 0 R >>\nstartxref\n{xref_at}\n%%EOF\n".encode()
+    return bytes(out)
+
+
+def render_report_pdf(report: Dict[str, Any], generated_at: Optional[datetime] = None) -> bytes:
+    """
+    Render an analysis response (build_analysis_response() shape) as a PDF
+    """
+    business = report.get('business') or {}
+    analysis = report.get('analysis') or {}
+    market = (analysis.get('marketIntel') or {}).get('market_summary') or {}
+    generated_at = generated_at or datetime.now(timezone.utc)
+    name = business.get('name') or 'Business'
+
+    doc = ReportBuilder()
+    doc.text(f"SEO Competitive Analysis: {name}", size=18, bold=True)
+    location = ', '.join(part for part in (business.get('city'), business.get('state')) if part)
+    doc.text(f"{business.get('niche') or ''} - {location}".strip(' -'), size=11)
+    doc.text(f"Generated {generated_at:%B %d, %Y}", size=9)
+
+    doc.heading('Snapshot')
+    for label, value in (
+        ('Current local rank', fmt_value(analysis.get('currentRank'))),
+        ('Rating', fmt_value(business.get('rating'))),
+        ('Reviews', fmt_value(business.get('reviewCount'))),
+        ('Competitor average reviews', fmt_value(analysis.get('competitorsAvgReviews'))),
+        ('Review deficit', fmt_value(analysis.get('reviewDeficit'))),
+        ('Estimated lost revenue / year', fmt_money(analysis.get('lostRevenue'))),
+        ('Potential traffic gain', fmt_value(analysis.get('potentialTraffic'))),
+        ('Timeline', fmt_value(analysis.get('timeline'))),
+    ):
+        doc.text(f"{label}: {value}", indent=12)
+
+    if analysis.get('painPoints'):
+        doc.heading('Key Issues')
+        for point in analysis['painPoints']:
+            doc.bullet(f"{point.get('issue')} ({point.get('severity')}): {point.get('impact')}")
+
+    if analysis.get('competitors'):
+        doc.heading('Top Competitors')
+        for competitor in analysis['competitors']:
+            doc.text(
+                f"#{competitor.get('rank')} {competitor.get('name')} - "
+                f"{fmt_value(competitor.get('rating'))} stars, {fmt_value(competitor.get('reviews'))} reviews",
+                bold=True, indent=12,
+            )
+            for advantage in competitor.get('advantages') or []:
+                doc.bullet(str(advantage), indent=24)
+
+    if analysis.get('solutions'):
+        doc.heading('Recommended Actions')
+        for solution in analysis['solutions']:
+            doc.bullet(str(solution))
+
+    if analysis.get('actionPlan'):
+        doc.heading('Action Plan')
+        plan = analysis['actionPlan']
+        for step in plan if isinstance(plan, list) else [plan]:
+            if isinstance(step, dict):
+                doc.bullet('; '.join(f"{key}: {fmt_value(value)}" for key, value in step.items()))
+            else:
+                doc.bullet(str(step))
+
+    if market:
+        doc.heading('Market Overview')
+        for label, key in (
+            ('Businesses in market', 'total_businesses'),
+            ('Average rating', 'avg_rating'),
+            ('Average reviews', 'avg_reviews'),
+            ('Median reviews', 'median_reviews'),
+            ('Most reviews', 'max_reviews'),
+        ):
+            doc.text(f"{label}: {fmt_value(market.get(key))}", indent=12)
+
+    return build_pdf(doc.pages(), f"SEO Competitive Analysis - {name}")
@@ -0,0 +1,227 @@
+"""
+Report Job Queue Module
+Background PDF generation for /api/generate-report. Requests enqueue a job
+and return immediately; a small pool of asyncio workers runs the analysis,
+renders it (report_pdf.py) in a thread and writes the PDF under REPORTS_DIR.
+Clients poll GET /api/reports/{job_id} and download the finished file.
+
+- Concurrent requests for the same business and data version share one job
+- Reports are cached on disk by data version (the /api/analyze ETag), so a
+  report is only re-rendered after the lead or its market data changes;
+  degraded or unversioned (demo) reports are never reused
+- At most REPORT_QUEUE_MAX jobs wait; beyond that ``submit`` raises
+  ReportQueueFull and the endpoint answers 503
+
+Job records live in the worker process that accepted the request (bounded
+to REPORT_JOBS_MAX); the cached files on disk are shared by every worker.
+"""
+
+import asyncio
+import hashlib
+import os
+import re
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from report_pdf import render_report_pdf
+from tracing import span
+
+REPORTS_DIR = Path(os.getenv('REPORTS_DIR', str(Path(__file__).resolve().parent / 'generated_reports')))
+REPORT_WORKERS = int(os.getenv('REPORT_WORKERS', '2'))
+REPORT_QUEUE_MAX = int(os.getenv('REPORT_QUEUE_MAX', '100'))
+REPORT_JOB_TIMEOUT = float(os.getenv('REPORT_JOB_TIMEOUT', '60'))  # seconds for the analysis behind one report
+REPORT_JOBS_MAX = int(os.getenv('REPORT_JOBS_MAX', '1000'))  # finished job records kept for polling
+REPORT_CACHE_MAX_FILES = int(os.getenv('REPORT_CACHE_MAX_FILES', '500'))
+
+JOB_ID_PATTERN = re.compile(r'^[0-9a-f]{32}$')
+
+# Fields of a job record returned to clients
+PUBLIC_JOB_FIELDS = ('job_id', 'status', 'created_at', 'started_at', 'finished_at', 'error', 'cached', 'degraded')
+
+
+class ReportQueueFull(Exception):
+    """Raised by ``submit`` when REPORT_QUEUE_MAX jobs are already waiting"""
+
+
+def utc_now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+class ReportQueue:
+    """
+    Deduplicating PDF job queue with a fixed pool of asyncio workers
+
+    Usage:
+        await report_queue.start()
+        job = report_queue.submit(key, version, lambda: run_analysis(...))
+        report_queue.get(job['job_id'])
+        await report_queue.stop()
+    """
+
+    def __init__(
+        self,
+        reports_dir: Path = REPORTS_DIR,
+        workers: int = REPORT_WORKERS,
+        max_pending: int = REPORT_QUEUE_MAX,
+        job_timeout: float = REPORT_JOB_TIMEOUT,
+        max_jobs: int = REPORT_JOBS_MAX,
+        max_files: int = REPORT_CACHE_MAX_FILES,
+    ):
+        self.reports_dir = Path(reports_dir)
+        self.workers = max(1, workers)
+        self.max_pending = max(1, max_pending)
+        self.job_timeout = job_timeout
+        self.max_jobs = max(1, max_jobs)
+        self.max_files = max(1, max_files)
+
+        self._jobs: 'OrderedDict[str, Dict[str, Any]]' = OrderedDict()
+        self._inflight: Dict[str, str] = {}  # dedup key -> job_id of its queued/running job
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self.counters = {
+            'submitted': 0,
+            'deduplicated': 0,
+            'cache_hits': 0,
+            'completed': 0,
+            'failed': 0,
+            'rejected': 0,
+        }
+
+    async def start(self):
+        """Start the worker pool (FastAPI startup hook)"""
+        self._queue = asyncio.Queue()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        """Cancel the workers; queued reports are simply regenerated on the next request"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def submit(self, key: str, version: Optional[str], producer: Callable[[], Awaitable[Dict]]) -> Dict[str, Any]:
+        """
+        Return the job for ``key`` at data ``version``: an in-flight job for
+        the same key/version, an already-rendered cached report, or a newly
+        queued job that awaits ``producer()`` for the analysis to render
+        """
+        if self._queue is None:
+            raise RuntimeError('Report queue is not started')
+        dedup_key = f"{key}|{version or ''}"
+        inflight_id = self._inflight.get(dedup_key)
+        if inflight_id in self._jobs:
+            self.counters['deduplicated'] += 1
+            return self._jobs[inflight_id]
+
+        cache_name = hashlib.sha1(dedup_key.encode()).hexdigest()[:32] if version else None
+        job = {
+            'job_id': uuid.uuid4().hex,
+            'status': 'queued',
+            'created_at': utc_now(),
+            'started_at': None,
+            'finished_at': None,
+            'error': None,
+            'cached': False,
+            'degraded': [],
+            'dedup_key': dedup_key,
+            'cache_name': cache_name,
+            'file': None,
+        }
+        if cache_name and (self.reports_dir / f"{cache_name}.pdf").is_file():
+            job.update(status='done', finished_at=job['created_at'], cached=True, file=f"{cache_name}.pdf")
+            self.counters['cache_hits'] += 1
+            self._remember(job)
+            return job
+
+        if self._queue.qsize() >= self.max_pending:
+            self.counters['rejected'] += 1
+            raise ReportQueueFull(f'{self.max_pending} reports already queued')
+        self.counters['submitted'] += 1
+        self._remember(job)
+        self._inflight[dedup_key] = job['job_id']
+        self._queue.put_nowait((job, producer))
+        return job
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        if not JOB_ID_PATTERN.match(job_id or ''):
+            return None
+        return self._jobs.get(job_id)
+
+    def path(self, job: Dict[str, Any]) -> Optional[Path]:
+        """File of a finished job, if it is still on disk"""
+        if job.get('status') != 'done' or not job.get('file'):
+            return None
+        path = self.reports_dir / job['file']
+        return path if path.is_file() else None
+
+    @staticmethod
+    def view(job: Dict[str, Any]) -> Dict[str, Any]:
+        """Client-facing fields of a job record"""
+        return {field: job.get(field) for field in PUBLIC_JOB_FIELDS}
+
+    def _remember(self, job: Dict[str, Any]):
+        self._jobs[job['job_id']] = job
+        # Forget the oldest finished jobs; queued/running ones are always kept
+        while len(self._jobs) > self.max_jobs:
+            oldest_id = next((job_id for job_id, record in self._jobs.items()
+                              if record['status'] in ('done', 'failed')), None)
+            if oldest_id is None:
+                break
+            del self._jobs[oldest_id]
+
+    async def _worker(self):
+        while True:
+            job, producer = await self._queue.get()
+            job['status'] = 'running'
+            job['started_at'] = utc_now()
+            try:
+                with span('report_job'):
+                    report = await asyncio.wait_for(producer(), self.job_timeout)
+                    pdf = await asyncio.to_thread(render_report_pdf, report)
+                degraded = report.get('degraded') or []
+                # Only complete, versioned reports are reusable
+                name = job['cache_name'] if job['cache_name'] and not degraded else job['job_id']
+                await asyncio.to_thread(self._write, f"{name}.pdf", pdf)
+                job.update(status='done', degraded=degraded, file=f"{name}.pdf")
+                self.counters['completed'] += 1
+            except Exception as e:
+                job.update(status='failed', error=str(e) or type(e).__name__)
+                self.counters['failed'] += 1
+                print(f"Error generating report {job['job_id']}: {e!r}")
+            finally:
+                job['finished_at'] = utc_now()
+                self._inflight.pop(job['dedup_key'], None)
+                self._queue.task_done()
+
+    def _write(self, filename: str, pdf: bytes):
+        """Atomically write a report, then trim the cache to the newest max_files"""
+        self.reports_dir.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.reports_dir / f"{filename}.{os.getpid()}.tmp"
+        tmp_path.write_bytes(pdf)
+        os.replace(tmp_path, self.reports_dir / filename)
+
+        try:
+            files = sorted(self.reports_dir.glob('*.pdf'), key=lambda path: path.stat().st_mtime)
+        except OSError:
+            # Another worker pruned concurrently; trim on the next write
+            return
+        for path in files[:max(0, len(files) - self.max_files)]:
+            try:
+                path.unlink()
+            except OSError:
+                pass
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'queued': self._queue.qsize() if self._queue is not None else 0,
+            'running': sum(1 for job in self._jobs.values() if job['status'] == 'running'),
+            'jobs': len(self._jobs),
+            'workers': self.workers,
+            **self.counters,
+        }
+
+
+report_queue = ReportQueue()
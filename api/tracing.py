@@ -0,0 +1,296 @@
+"""
+Request Tracing Module
+Per-request span timing for the funnel API: each /api/analyze stage and every
+SQL statement run through the async pool is recorded as a span on the current
+request's trace and aggregated into Prometheus histograms.
+
+- ``span(name)`` times a block and attaches it to the active request trace
+  (a contextvar, so spans from ``asyncio.gather`` tasks and ``to_thread``
+  calls land on the request that started them)
+- ``record_sql`` is called by the traced cursor in db.py with the statement's
+  fingerprint (literals stripped, whitespace collapsed), row count and duration
+- ``render_metrics`` produces the Prometheus text exposition for GET /metrics
+- ``server_timing`` formats a trace as a ``Server-Timing`` header value
+
+Metrics are per worker process, like the caches; scrape each worker.
+"""
+
+import contextvars
+import hashlib
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional, Tuple
+
+TRACING_ENABLED = os.getenv('TRACING_ENABLED', '1') not in ('0', 'false', 'False')
+SERVER_TIMING_ENABLED = os.getenv('SERVER_TIMING_ENABLED', '0') not in ('0', 'false', 'False')
+
+# Histogram bucket upper bounds in seconds
+DURATION_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Spans kept per request trace; a runaway loop of queries shouldn't grow it unbounded
+MAX_SPANS_PER_TRACE = 200
+
+# Normalized query text kept per fingerprint for the info metric
+FINGERPRINT_TEXT_LENGTH = 160
+
+
+class Histogram:
+    """Thread-safe Prometheus histogram keyed by a tuple of label values"""
+
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...], buckets: Tuple[float, ...] = DURATION_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.buckets = buckets
+        self._series: Dict[Tuple[str, ...], List[float]] = {}  # bucket counts + [sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values: str):
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0.0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = sorted(self._series.items())
+        for label_values, counts in series:
+            labels = format_labels(self.labels, label_values)
+            for bound, count in zip(self.buckets, counts):
+                lines.append(f'{self.name}_bucket{{{labels},le="{bound}"}} {int(count)}')
+            lines.append(f'{self.name}_bucket{{{labels},le="+Inf"}} {int(counts[-1])}')
+            lines.append(f"{self.name}_sum{{{labels}}} {counts[-2]:.6f}")
+            lines.append(f"{self.name}_count{{{labels}}} {int(counts[-1])}")
+        return lines
+
+
+class Counter:
+    """Thread-safe Prometheus counter keyed by a tuple of label values"""
+
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...]):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self._series: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float, *label_values: str):
+        with self._lock:
+            self._series[label_values] = self._series.get(label_values, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            series = sorted(self._series.items())
+        for label_values, value in series:
+            lines.append(f"{self.name}{{{format_labels(self.labels, label_values)}}} {value:g}")
+        return lines
+
+
+def escape_label(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def format_labels(names: Iterable[str], values: Iterable[str]) -> str:
+    return ','.join(f'{name}="{escape_label(value)}"' for name, value in zip(names, values))
+
+
+REQUEST_DURATION = Histogram(
+    'funnel_http_request_duration_seconds', 'HTTP request latency', ('method', 'route', 'status'),
+)
+STAGE_DURATION = Histogram(
+    'funnel_stage_duration_seconds', 'Duration of traced request stages', ('stage', 'outcome'),
+)
+SQL_DURATION = Histogram(
+    'funnel_sql_duration_seconds', 'SQL statement latency by query fingerprint', ('fingerprint',),
+)
+SQL_ROWS = Counter(
+    'funnel_sql_rows_total', 'Rows returned or affected by query fingerprint', ('fingerprint',),
+)
+SQL_ERRORS = Counter(
+    'funnel_sql_errors_total', 'Failed SQL statements by query fingerprint', ('fingerprint',),
+)
+
+_fingerprint_text: Dict[str, str] = {}
+_fingerprint_cache: Dict[str, Tuple[str, str]] = {}
+_fingerprint_lock = threading.Lock()
+
+_COMMENTS = re.compile(r'--[^\n]*|/\*.*?\*/', re.S)
+_STRINGS = re.compile(r"'(?:[^']|'')*'")
+_NUMBERS = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PLACEHOLDERS = re.compile(r'%\(\w+\)s|%s|\$\d+')
+_WHITESPACE = re.compile(r'\s+')
+
+
+def fingerprint_query(query) -> Tuple[str, str]:
+    """
+    ``(fingerprint, normalized_text)`` for a SQL statement: comments dropped,
+    literals and placeholders replaced by ``?``, whitespace collapsed
+    """
+    if not isinstance(query, str):
+        # psycopg.sql.Composed and friends
+        query = str(query)
+    cached = _fingerprint_cache.get(query)
+    if cached is not None:
+        return cached
+    text = _COMMENTS.sub(' ', query)
+    text = _STRINGS.sub('?', text)
+    text = _PLACEHOLDERS.sub('?', text)
+    text = _NUMBERS.sub('?', text)
+    text = _WHITESPACE.sub(' ', text).strip().lower()
+    fingerprint = hashlib.sha1(text.encode()).hexdigest()[:12]
+    result = (fingerprint, text)
+    with _fingerprint_lock:
+        # Queries are built from a handful of templates; cap in case one isn't
+        if len(_fingerprint_cache) < 1000:
+            _fingerprint_cache[query] = result
+        _fingerprint_text.setdefault(fingerprint, text[:FINGERPRINT_TEXT_LENGTH])
+    return result
+
+
+class RequestTrace:
+    """Spans recorded while serving one request"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.spans: List[Dict] = []
+        self._lock = threading.Lock()
+
+    def add(self, span: Dict):
+        with self._lock:
+            if len(self.spans) < MAX_SPANS_PER_TRACE:
+                self.spans.append(span)
+
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self.started) * 1000
+
+
+_current_trace: contextvars.ContextVar[Optional[RequestTrace]] = contextvars.ContextVar('funnel_trace', default=None)
+
+
+def start_trace() -> Tuple[RequestTrace, contextvars.Token]:
+    """Begin a trace for the current request; pass the token to ``end_trace``"""
+    trace = RequestTrace()
+    return trace, _current_trace.set(trace)
+
+
+def end_trace(token: contextvars.Token):
+    _current_trace.reset(token)
+
+
+def current_trace() -> Optional[RequestTrace]:
+    return _current_trace.get()
+
+
+@contextmanager
+def span(name: str):
+    """
+    Time a block as a request stage
+
+    Usage:
+        with span('load_business'):
+            business = await load_business_data(...)
+    """
+    if not TRACING_ENABLED:
+        yield
+        return
+    started = time.perf_counter()
+    outcome = 'ok'
+    try:
+        yield
+    except BaseException:
+        outcome = 'error'
+        raise
+    finally:
+        duration = time.perf_counter() - started
+        STAGE_DURATION.observe(duration, name, outcome)
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.add({'name': name, 'duration_ms': round(duration * 1000, 2), 'outcome': outcome})
+
+
+def record_sql(query, duration: float, rows: Optional[int], failed: bool = False):
+    """Record one executed statement against its fingerprint and the current trace"""
+    if not TRACING_ENABLED:
+        return
+    fingerprint, _ = fingerprint_query(query)
+    SQL_DURATION.observe(duration, fingerprint)
+    if failed:
+        SQL_ERRORS.inc(1, fingerprint)
+    elif rows is not None and rows >= 0:
+        SQL_ROWS.inc(rows, fingerprint)
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add({
+            'name': 'sql',
+            'fingerprint': fingerprint,
+            'rows': rows,
+            'duration_ms': round(duration * 1000, 2),
+            'outcome': 'error' if failed else 'ok',
+        })
+
+
+def record_request(method: str, route: str, status: int, duration: float):
+    REQUEST_DURATION.observe(duration, method, route, str(status))
+
+
+def server_timing(trace: RequestTrace) -> str:
+    """
+    ``Server-Timing`` header value: one entry per stage (repeated stages
+    summed) plus a single ``sql`` entry with the statement count
+    """
+    stages: Dict[str, float] = {}
+    sql_ms, sql_count = 0.0, 0
+    with trace._lock:
+        spans = list(trace.spans)
+    for entry in spans:
+        if entry['name'] == 'sql':
+            sql_ms += entry['duration_ms']
+            sql_count += 1
+        else:
+            stages[entry['name']] = stages.get(entry['name'], 0.0) + entry['duration_ms']
+    parts = [f"{re.sub(r'[^A-Za-z0-9_-]', '_', name)};dur={ms:.1f}" for name, ms in stages.items()]
+    if sql_count:
+        parts.append(f'sql;dur={sql_ms:.1f};desc="{sql_count} queries"')
+    parts.append(f"total;dur={trace.elapsed_ms():.1f}")
+    return ', '.join(parts)
+
+
+def gauge_lines(name: str, help_text: str, values: Dict[str, float]) -> List[str]:
+    """Unlabelled gauges ``{name}_{key}`` for a dict of numeric stats"""
+    lines = []
+    for key, value in values.items():
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            continue
+        metric = f"{name}_{re.sub(r'[^a-zA-Z0-9_]', '_', key)}"
+        lines += [f"# HELP {metric} {help_text} ({key})", f"# TYPE {metric} gauge", f"{metric} {value:g}"]
+    return lines
+
+
+def render_metrics(extra_gauges: Optional[Dict[str, Tuple[str, Dict[str, float]]]] = None) -> str:
+    """
+    Prometheus text exposition of every histogram / counter, the fingerprint
+    -> normalized query info series, and any ``extra_gauges``
+    (``{prefix: (help, {key: value})}``, e.g. pool and cache stats)
+    """
+    lines: List[str] = []
+    for metric in (REQUEST_DURATION, STAGE_DURATION, SQL_DURATION, SQL_ROWS, SQL_ERRORS):
+        lines += metric.render()
+    lines += ['# HELP funnel_sql_query_info Normalized SQL text per query fingerprint',
+              '# TYPE funnel_sql_query_info gauge']
+    with _fingerprint_lock:
+        fingerprints = sorted(_fingerprint_text.items())
+    for fingerprint, text in fingerprints:
+        lines.append(f'funnel_sql_query_info{{fingerprint="{fingerprint}",query="{escape_label(text)}"}} 1')
+    for prefix, (help_text, values) in (extra_gauges or {}).items():
+        lines += gauge_lines(prefix, help_text, values)
+    return '\n'.join(lines) + '\n'
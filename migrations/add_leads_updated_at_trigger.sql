@@ -0,0 +1,19 @@
+-- Keep leads.updated_at current on every UPDATE
+-- /api/analyze derives its ETag from leads.updated_at plus the market tables'
+-- refreshed_at (api/funnel_api.py), so the column must change whenever a lead
+-- does - not only when the writer remembers to set it.
+
+CREATE OR REPLACE FUNCTION leads_touch_updated_at()
+RETURNS trigger AS $$
+BEGIN
+  NEW.updated_at := CURRENT_TIMESTAMP;
+  RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS leads_updated_at ON leads;
+CREATE TRIGGER leads_updated_at
+  BEFORE UPDATE ON leads
+  FOR EACH ROW
+  WHEN (OLD.* IS DISTINCT FROM NEW.*)
+  EXECUTE FUNCTION leads_touch_updated_at();
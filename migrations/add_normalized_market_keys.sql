@@ -0,0 +1,125 @@
+-- Normalized market keys for leads
+-- Replaces `city ILIKE '%Austin%'` matching (slow, and wrong: it also matches
+-- "West Austin Hills") with equality on canonical keys:
+--   city_key  - lower-cased, punctuation-free city ("St. Louis" -> "st louis")
+--   niche_key - canonical niche via niche_aliases ("med spas" -> "med spa")
+-- Keys are filled by a BEFORE trigger, so every ingest path (Node scripts,
+-- migrations, manual SQL) populates them without code changes.
+-- Run with psql outside a transaction (uses CREATE INDEX CONCURRENTLY).
+
+-- ============================================
+-- 1. NICHE ALIASES
+-- ============================================
+CREATE TABLE IF NOT EXISTS niche_aliases (
+  alias_key VARCHAR(255) PRIMARY KEY,  -- normalized alias text
+  niche_key VARCHAR(255) NOT NULL,     -- canonical niche
+  created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
+
+INSERT INTO niche_aliases (alias_key, niche_key) VALUES
+  ('med spa', 'med spa'),
+  ('med spas', 'med spa'),
+  ('medspa', 'med spa'),
+  ('medspas', 'med spa'),
+  ('medical spa', 'med spa'),
+  ('medical spas', 'med spa'),
+  ('medical aesthetics', 'med spa'),
+  ('aesthetic clinic', 'med spa'),
+  ('aesthetics clinic', 'med spa'),
+  ('dentist', 'dentist'),
+  ('dentists', 'dentist'),
+  ('dental office', 'dentist'),
+  ('dental clinic', 'dentist'),
+  ('plastic surgeon', 'plastic surgeon'),
+  ('plastic surgeons', 'plastic surgeon'),
+  ('plastic surgery', 'plastic surgeon'),
+  ('dermatologist', 'dermatologist'),
+  ('dermatologists', 'dermatologist'),
+  ('dermatology', 'dermatologist'),
+  ('chiropractor', 'chiropractor'),
+  ('chiropractors', 'chiropractor'),
+  ('plumber', 'plumber'),
+  ('plumbers', 'plumber')
+ON CONFLICT (alias_key) DO NOTHING;
+
+-- ============================================
+-- 2. NORMALIZATION FUNCTIONS
+-- ============================================
+-- Lower-case, punctuation to spaces, collapsed whitespace
+CREATE OR REPLACE FUNCTION normalize_market_key(value TEXT)
+RETURNS TEXT AS $$
+  SELECT NULLIF(btrim(regexp_replace(lower(value), '[^a-z0-9]+', ' ', 'g')), '')
+$$ LANGUAGE sql IMMUTABLE;
+
+-- Canonical niche: alias lookup on the normalized text, else the text itself
+CREATE OR REPLACE FUNCTION normalize_niche_key(value TEXT)
+RETURNS TEXT AS $$
+  SELECT COALESCE(
+    (SELECT a.niche_key FROM niche_aliases a WHERE a.alias_key = normalize_market_key(value)),
+    normalize_market_key(value)
+  )
+$$ LANGUAGE sql STABLE;
+
+-- ============================================
+-- 3. KEY COLUMNS + INGEST TRIGGER
+-- ============================================
+ALTER TABLE leads ADD COLUMN IF NOT EXISTS city_key VARCHAR(100);
+ALTER TABLE leads ADD COLUMN IF NOT EXISTS niche_key VARCHAR(255);
+
+CREATE OR REPLACE FUNCTION leads_set_market_keys()
+RETURNS trigger AS $$
+BEGIN
+  NEW.city_key := normalize_market_key(NEW.city);
+  NEW.niche_key := normalize_niche_key(NEW.search_niche);
+  RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS leads_market_keys ON leads;
+CREATE TRIGGER leads_market_keys
+  BEFORE INSERT OR UPDATE OF city, search_niche ON leads
+  FOR EACH ROW EXECUTE FUNCTION leads_set_market_keys();
+
+-- Re-derive niche keys after editing niche_aliases:
+--   SELECT refresh_niche_keys();
+CREATE OR REPLACE FUNCTION refresh_niche_keys()
+RETURNS INTEGER AS $$
+DECLARE
+  updated INTEGER;
+BEGIN
+  UPDATE leads
+  SET niche_key = normalize_niche_key(search_niche)
+  WHERE niche_key IS DISTINCT FROM normalize_niche_key(search_niche);
+  GET DIAGNOSTICS updated = ROW_COUNT;
+  RETURN updated;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Backfill existing leads
+UPDATE leads
+SET city_key = normalize_market_key(city),
+    niche_key = normalize_niche_key(search_niche)
+WHERE city_key IS DISTINCT FROM normalize_market_key(city)
+   OR niche_key IS DISTINCT FROM normalize_niche_key(search_niche);
+
+-- ============================================
+-- 4. KEY INDEXES
+-- ============================================
+-- load_competitor_data: niche_key = ? AND city_key = ? AND local_pack_rank BETWEEN 1 AND 3
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_leads_top3_competitors_keys
+  ON leads (niche_key, city_key, state, local_pack_rank)
+  INCLUDE (id, business_name, rating, review_count, city, website, phone, street_address)
+  WHERE local_pack_rank BETWEEN 1 AND 3;
+
+-- load_business_data fallback: city_key = ? ORDER BY review_count DESC
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_leads_city_key_reviews
+  ON leads (city_key, review_count DESC NULLS LAST);
+
+-- Superseded by the key indexes above (the API no longer uses city ILIKE)
+DROP INDEX CONCURRENTLY IF EXISTS idx_leads_top3_competitors;
+DROP INDEX CONCURRENTLY IF EXISTS idx_leads_city_trgm;
+
+ANALYZE leads;
+
+COMMENT ON COLUMN leads.city_key IS 'normalize_market_key(city), maintained by trigger leads_market_keys';
+COMMENT ON COLUMN leads.niche_key IS 'normalize_niche_key(search_niche) via niche_aliases, maintained by trigger leads_market_keys';
@@ -0,0 +1,18 @@
+-- Fuzzy business-name search for /api/analyze?name= (api/name_search.py)
+-- GiST trigram indexes support KNN ordering (`business_name <->> 'name'`), so
+-- the nearest names come straight off the index instead of scanning every
+-- ILIKE match and sorting by review_count.
+-- Run outside a transaction (CREATE INDEX CONCURRENTLY), e.g.:
+--   psql "$DATABASE_URL" -f migrations/create_business_name_search_index.sql
+-- Benchmark: python scripts/benchmark_name_search.py --dsn ... --leads 1000000
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_leads_business_name_trgm_gist
+  ON leads USING gist (business_name gist_trgm_ops);
+
+-- The GIN trigram index only served business_name ILIKE '%name%', which the
+-- API no longer issues
+DROP INDEX CONCURRENTLY IF EXISTS idx_leads_business_name_trgm;
+
+ANALYZE leads;
@@ -0,0 +1,62 @@
+-- Conversion Events
+-- Append-only log of funnel interactions recorded by /api/track-conversion.
+-- The API buffers events in memory and writes them in batches with COPY
+-- (api/events.py), so the table has no unique constraints or triggers that
+-- would slow bulk loads. Monthly range partitions on occurred_at keep recent
+-- data small and let old months be detached or dropped wholesale.
+
+-- ============================================
+-- 1. TABLE
+-- ============================================
+CREATE TABLE IF NOT EXISTS conversion_events (
+  event_id UUID NOT NULL,               -- assigned by the API; replayed spool segments can be de-duplicated on it
+  occurred_at TIMESTAMP WITH TIME ZONE NOT NULL,
+  business_id VARCHAR(64) NOT NULL,
+  action VARCHAR(100) NOT NULL,
+  value NUMERIC,
+  metadata JSONB NOT NULL DEFAULT '{}'::jsonb,  -- referer, user agent
+  received_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP
+) PARTITION BY RANGE (occurred_at);
+
+-- Catches events outside every monthly partition so a COPY never fails on a
+-- missing month; rows here should be moved once the partition exists
+CREATE TABLE IF NOT EXISTS conversion_events_default
+  PARTITION OF conversion_events DEFAULT;
+
+CREATE INDEX IF NOT EXISTS idx_conversion_events_business
+  ON conversion_events (business_id, occurred_at);
+
+CREATE INDEX IF NOT EXISTS idx_conversion_events_action
+  ON conversion_events (action, occurred_at);
+
+-- ============================================
+-- 2. PARTITIONS
+-- ============================================
+-- Creates conversion_events_YYYY_MM for the month containing `month`.
+-- The API calls this for the current and next month on startup and again
+-- whenever the UTC month changes:
+--   SELECT create_conversion_events_partition(CURRENT_DATE);
+CREATE OR REPLACE FUNCTION create_conversion_events_partition(month DATE)
+RETURNS TEXT AS $$
+DECLARE
+  month_start DATE := date_trunc('month', month)::date;
+  partition_name TEXT := format('conversion_events_%s', to_char(month_start, 'YYYY_MM'));
+BEGIN
+  PERFORM pg_advisory_xact_lock(hashtext('conversion_events_partitions'));
+
+  IF to_regclass(partition_name) IS NULL THEN
+    EXECUTE format(
+      'CREATE TABLE %I PARTITION OF conversion_events FOR VALUES FROM (%L) TO (%L)',
+      partition_name,
+      month_start,
+      (month_start + INTERVAL '1 month')::date
+    );
+  END IF;
+  RETURN partition_name;
+END;
+$$ LANGUAGE plpgsql;
+
+SELECT create_conversion_events_partition((CURRENT_DATE + make_interval(months => n))::date)
+FROM generate_series(0, 2) AS n;
+
+COMMENT ON TABLE conversion_events IS 'Funnel interaction events from /api/track-conversion, COPY-loaded in batches; partitioned by month';
@@ -0,0 +1,40 @@
+-- Lookup indexes for the funnel API access paths on `leads`
+-- Run outside a transaction (CREATE INDEX CONCURRENTLY), e.g.:
+--   psql "$DATABASE_URL" -f migrations/create_leads_lookup_indexes.sql
+-- or let scripts/index_advisor.py apply it and report EXPLAIN plans before/after.
+-- Needs migrations/add_normalized_market_keys.sql first (city_key / niche_key);
+-- business_name lookups are indexed by create_business_name_search_index.sql.
+
+-- ============================================
+-- 1. load_competitor_data: niche_key = ? AND city_key = ? AND state = ? AND local_pack_rank BETWEEN 1 AND 3
+-- ============================================
+-- Partial + covering: only top-3 rows are indexed and every selected column
+-- is included, so the lookup is an index-only scan
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_leads_top3_competitors_keys
+  ON leads (niche_key, city_key, state, local_pack_rank)
+  INCLUDE (id, business_name, rating, review_count, city, website, phone, street_address)
+  WHERE local_pack_rank BETWEEN 1 AND 3;
+
+-- ============================================
+-- 2. load_business_data fallback: city_key = ? ORDER BY review_count DESC
+-- ============================================
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_leads_city_key_reviews
+  ON leads (city_key, review_count DESC NULLS LAST);
+
+-- ============================================
+-- 3. market_intelligence: city = ? AND state = ? ORDER BY review_count DESC
+-- ============================================
+-- Serves the top 10, the city-wide review_rank window, percentiles and
+-- detailed competitors; INCLUDE covers the top 10 / ranking columns
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_leads_market_reviews
+  ON leads (city, state, review_count DESC NULLS LAST)
+  INCLUDE (search_niche, business_name, rating, local_pack_rank, website,
+           pricing_botox, instagram_handle, owner_name);
+
+-- ============================================
+-- 4. get_business_percentile: business_name = ? AND city = ? AND state = ?
+-- ============================================
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_leads_market_business_name
+  ON leads (city, state, business_name);
+
+ANALYZE leads;
@@ -0,0 +1,74 @@
+-- Market Centroids for the nearest-market competitor fallback
+-- When a suburb has no local-pack top 3 of its own, load_competitor_data
+-- (api/funnel_api.py) borrows competitors from the geographically nearest
+-- markets instead of a hardcoded list of metros. Each (niche_key, city_key,
+-- state) market gets the mean position of its geocoded leads; a GiST index
+-- answers "nearest markets for this niche" as a KNN scan, joined to the
+-- precomputed market_competitors lists in the same statement.
+-- Requires add_normalized_market_keys.sql and create_market_competitors_table.sql.
+
+-- Equality on niche_key inside the GiST index
+CREATE EXTENSION IF NOT EXISTS btree_gist;
+
+-- ============================================
+-- 1. TABLE
+-- ============================================
+CREATE TABLE IF NOT EXISTS market_centroids (
+  niche_key VARCHAR(255) NOT NULL,
+  city_key VARCHAR(100) NOT NULL,
+  state VARCHAR(50) NOT NULL,
+  city VARCHAR(100),                  -- most common spelling, for display
+  location POINT NOT NULL,            -- (longitude, latitude)
+  geocoded_businesses INTEGER NOT NULL DEFAULT 0,
+  refreshed_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+  PRIMARY KEY (niche_key, city_key, state)
+);
+
+CREATE INDEX IF NOT EXISTS idx_market_centroids_niche_location
+  ON market_centroids USING gist (niche_key, location);
+
+-- Origin lookup for a city regardless of niche
+CREATE INDEX IF NOT EXISTS idx_market_centroids_city
+  ON market_centroids (city_key, state);
+
+-- ============================================
+-- 2. REFRESH
+-- ============================================
+-- Centroids only move when a market gains or loses geocoded leads, so they
+-- are rebuilt after ingests (process-search-results-v2.js) rather than by
+-- per-row triggers:
+--   SELECT refresh_market_centroids();
+CREATE OR REPLACE FUNCTION refresh_market_centroids()
+RETURNS INTEGER AS $$
+DECLARE
+  refreshed INTEGER;
+BEGIN
+  PERFORM pg_advisory_xact_lock(hashtext('market_centroids'));
+
+  DELETE FROM market_centroids;
+
+  INSERT INTO market_centroids (niche_key, city_key, state, city, location, geocoded_businesses, refreshed_at)
+  SELECT
+    niche_key,
+    city_key,
+    state,
+    MODE() WITHIN GROUP (ORDER BY city),
+    point(AVG(longitude), AVG(latitude)),
+    COUNT(*),
+    CURRENT_TIMESTAMP
+  FROM leads
+  WHERE niche_key IS NOT NULL AND city_key IS NOT NULL AND state IS NOT NULL
+  AND latitude IS NOT NULL AND longitude IS NOT NULL
+  GROUP BY niche_key, city_key, state;
+
+  GET DIAGNOSTICS refreshed = ROW_COUNT;
+  RETURN refreshed;
+END;
+$$ LANGUAGE plpgsql;
+
+-- ============================================
+-- 3. BACKFILL
+-- ============================================
+SELECT refresh_market_centroids();
+
+COMMENT ON TABLE market_centroids IS 'Mean lead position per (niche_key, city_key, state) market; rebuilt by refresh_market_centroids()';
@@ -0,0 +1,139 @@
+-- Precomputed Top Competitors per Market
+-- load_competitor_data (api/funnel_api.py) used to re-run its top-3 query for
+-- every business in a market, although the answer only differs by excluding
+-- the business itself. This table keeps the top 5 local-pack entries per
+-- (niche_key, city_key, state); the API drops the requesting business in
+-- memory and still has three left. Requires add_normalized_market_keys.sql.
+-- Refreshed by statement-level triggers whenever a top-3 row changes.
+
+-- ============================================
+-- 1. TABLE
+-- ============================================
+CREATE TABLE IF NOT EXISTS market_competitors (
+  niche_key VARCHAR(255) NOT NULL,
+  city_key VARCHAR(100) NOT NULL,
+  state VARCHAR(50) NOT NULL,
+
+  -- [{id, business_name, local_pack_rank, rating, review_count, city, state,
+  --   website, phone, street_address}] ordered by local_pack_rank, id
+  competitors JSONB NOT NULL DEFAULT '[]'::jsonb,
+
+  refreshed_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+  PRIMARY KEY (niche_key, city_key, state)
+);
+
+-- ============================================
+-- 2. REFRESH ONE MARKET
+-- ============================================
+-- Top 5 rather than 3: excluding the requesting business (or a duplicate row
+-- of it) must still leave a full top 3
+CREATE OR REPLACE FUNCTION refresh_market_competitors(p_niche_key TEXT, p_city_key TEXT, p_state TEXT)
+RETURNS void AS $$
+BEGIN
+  PERFORM pg_advisory_xact_lock(hashtext('market_competitors:' || p_niche_key || '|' || p_city_key || '|' || p_state));
+
+  DELETE FROM market_competitors
+  WHERE niche_key = p_niche_key AND city_key = p_city_key AND state = p_state;
+
+  INSERT INTO market_competitors (niche_key, city_key, state, competitors, refreshed_at)
+  SELECT p_niche_key, p_city_key, p_state,
+         jsonb_agg(to_jsonb(t) ORDER BY t.local_pack_rank, t.id),
+         CURRENT_TIMESTAMP
+  FROM (
+    SELECT id, business_name, local_pack_rank, rating, review_count::int AS review_count,
+           city, state, website, phone, street_address
+    FROM leads
+    WHERE niche_key = p_niche_key AND city_key = p_city_key AND state = p_state
+    AND local_pack_rank BETWEEN 1 AND 3
+    ORDER BY local_pack_rank, id
+    LIMIT 5
+  ) t
+  HAVING COUNT(*) > 0;
+END;
+$$ LANGUAGE plpgsql;
+
+-- ============================================
+-- 3. INCREMENTAL MAINTENANCE TRIGGERS
+-- ============================================
+-- Only rows that are (or were) in a local-pack top 3 can change a market's list
+CREATE OR REPLACE FUNCTION leads_refresh_market_competitors()
+RETURNS trigger AS $$
+DECLARE
+  m RECORD;
+BEGIN
+  IF TG_OP = 'INSERT' THEN
+    FOR m IN
+      SELECT DISTINCT niche_key, city_key, state FROM new_rows
+      WHERE local_pack_rank BETWEEN 1 AND 3
+      AND niche_key IS NOT NULL AND city_key IS NOT NULL AND state IS NOT NULL
+    LOOP
+      PERFORM refresh_market_competitors(m.niche_key, m.city_key, m.state);
+    END LOOP;
+  ELSIF TG_OP = 'DELETE' THEN
+    FOR m IN
+      SELECT DISTINCT niche_key, city_key, state FROM old_rows
+      WHERE local_pack_rank BETWEEN 1 AND 3
+      AND niche_key IS NOT NULL AND city_key IS NOT NULL AND state IS NOT NULL
+    LOOP
+      PERFORM refresh_market_competitors(m.niche_key, m.city_key, m.state);
+    END LOOP;
+  ELSE
+    FOR m IN
+      WITH changed AS (
+        SELECT o.niche_key as old_niche, o.city_key as old_city, o.state as old_state,
+               o.local_pack_rank as old_rank,
+               n.niche_key as new_niche, n.city_key as new_city, n.state as new_state,
+               n.local_pack_rank as new_rank
+        FROM old_rows o
+        JOIN new_rows n ON n.id = o.id
+        WHERE (o.niche_key, o.city_key, o.state, o.local_pack_rank, o.business_name, o.rating,
+               o.review_count, o.city, o.website, o.phone, o.street_address)
+          IS DISTINCT FROM
+              (n.niche_key, n.city_key, n.state, n.local_pack_rank, n.business_name, n.rating,
+               n.review_count, n.city, n.website, n.phone, n.street_address)
+      )
+      SELECT old_niche as niche_key, old_city as city_key, old_state as state FROM changed
+      WHERE old_rank BETWEEN 1 AND 3
+      AND old_niche IS NOT NULL AND old_city IS NOT NULL AND old_state IS NOT NULL
+      UNION
+      SELECT new_niche, new_city, new_state FROM changed
+      WHERE new_rank BETWEEN 1 AND 3
+      AND new_niche IS NOT NULL AND new_city IS NOT NULL AND new_state IS NOT NULL
+    LOOP
+      PERFORM refresh_market_competitors(m.niche_key, m.city_key, m.state);
+    END LOOP;
+  END IF;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Transition tables require one trigger per event
+DROP TRIGGER IF EXISTS leads_market_competitors_insert ON leads;
+CREATE TRIGGER leads_market_competitors_insert
+  AFTER INSERT ON leads
+  REFERENCING NEW TABLE AS new_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION leads_refresh_market_competitors();
+
+DROP TRIGGER IF EXISTS leads_market_competitors_update ON leads;
+CREATE TRIGGER leads_market_competitors_update
+  AFTER UPDATE ON leads
+  REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION leads_refresh_market_competitors();
+
+DROP TRIGGER IF EXISTS leads_market_competitors_delete ON leads;
+CREATE TRIGGER leads_market_competitors_delete
+  AFTER DELETE ON leads
+  REFERENCING OLD TABLE AS old_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION leads_refresh_market_competitors();
+
+-- ============================================
+-- 4. BACKFILL
+-- ============================================
+SELECT refresh_market_competitors(niche_key, city_key, state)
+FROM (
+  SELECT DISTINCT niche_key, city_key, state FROM leads
+  WHERE local_pack_rank BETWEEN 1 AND 3
+  AND niche_key IS NOT NULL AND city_key IS NOT NULL AND state IS NOT NULL
+) markets;
+
+COMMENT ON TABLE market_competitors IS 'Top 5 local-pack competitors per (niche_key, city_key, state), refreshed by leads triggers';
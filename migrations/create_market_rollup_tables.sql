@@ -0,0 +1,323 @@
+-- Market Rollup Tables
+-- Per-market aggregates read by api/market_intelligence.py so market pages are
+-- single-row lookups instead of scans of `leads`. Maintained incrementally by
+-- statement-level triggers: every INSERT/UPDATE/DELETE on leads refreshes only
+-- the (city, state) markets whose rows actually changed.
+
+-- ============================================
+-- 1. CITY-LEVEL ROLLUP (get_rollup_market_stats)
+-- ============================================
+CREATE TABLE IF NOT EXISTS market_rollups (
+  city VARCHAR(100) NOT NULL,
+  state VARCHAR(50) NOT NULL,
+
+  -- Service distribution
+  offers_botox INTEGER NOT NULL DEFAULT 0,
+  offers_filler INTEGER NOT NULL DEFAULT 0,
+  has_membership INTEGER NOT NULL DEFAULT 0,
+  active_instagram INTEGER NOT NULL DEFAULT 0,
+  has_med_director INTEGER NOT NULL DEFAULT 0,
+  unique_owners INTEGER NOT NULL DEFAULT 0,
+
+  -- Rating tiers: [{tier, count, avg_reviews}] ordered best tier first
+  rating_distribution JSONB NOT NULL DEFAULT '[]'::jsonb,
+
+  -- Competition intensity
+  competitor_count INTEGER NOT NULL DEFAULT 0,
+  avg_reviews NUMERIC,
+  leader_reviews INTEGER,
+  top_quartile_reviews DOUBLE PRECISION,
+
+  -- Digital maturity
+  has_website INTEGER NOT NULL DEFAULT 0,
+  has_email INTEGER NOT NULL DEFAULT 0,
+  has_social INTEGER NOT NULL DEFAULT 0,
+  transparent_pricing INTEGER NOT NULL DEFAULT 0,
+
+  refreshed_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+  PRIMARY KEY (city, state)
+);
+
+-- ============================================
+-- 2. CITY + NICHE ROLLUP (get_market_intelligence)
+-- ============================================
+-- One row per exact search_niche value in a market. Every column is mergeable
+-- (sums, counts, min/max, frequency maps) so the API can combine all niches
+-- matching its ILIKE filter without touching leads.
+CREATE TABLE IF NOT EXISTS market_niche_rollups (
+  city VARCHAR(100) NOT NULL,
+  state VARCHAR(50) NOT NULL,
+  niche_is_null BOOLEAN NOT NULL,
+  search_niche VARCHAR(255) NOT NULL DEFAULT '',  -- '' when niche_is_null
+
+  -- Market summary
+  total_businesses INTEGER NOT NULL DEFAULT 0,
+  rating_sum NUMERIC NOT NULL DEFAULT 0,
+  rating_count INTEGER NOT NULL DEFAULT 0,
+  review_sum BIGINT NOT NULL DEFAULT 0,
+  reviewed_count INTEGER NOT NULL DEFAULT 0,
+  max_reviews INTEGER,
+  min_reviews INTEGER,
+  review_count_freq JSONB NOT NULL DEFAULT '{}'::jsonb,  -- {review_count: businesses}, for the median
+  top_3_count INTEGER NOT NULL DEFAULT 0,
+  rank_4_to_10 INTEGER NOT NULL DEFAULT 0,
+  with_email INTEGER NOT NULL DEFAULT 0,
+  with_owner INTEGER NOT NULL DEFAULT 0,
+
+  -- Review histogram: {range: businesses}
+  review_histogram JSONB NOT NULL DEFAULT '{}'::jsonb,
+
+  -- Pricing intelligence
+  with_botox_pricing INTEGER NOT NULL DEFAULT 0,
+  botox_price_sum NUMERIC NOT NULL DEFAULT 0,
+  botox_price_count INTEGER NOT NULL DEFAULT 0,
+  min_botox_price NUMERIC,
+  max_botox_price NUMERIC,
+
+  -- Digital presence
+  with_instagram INTEGER NOT NULL DEFAULT 0,
+  with_facebook INTEGER NOT NULL DEFAULT 0,
+  with_website INTEGER NOT NULL DEFAULT 0,
+  with_medical_director INTEGER NOT NULL DEFAULT 0,
+
+  refreshed_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+  PRIMARY KEY (city, state, niche_is_null, search_niche)
+);
+
+-- ============================================
+-- 3. REFRESH ONE MARKET
+-- ============================================
+CREATE OR REPLACE FUNCTION refresh_market_rollup(p_city TEXT, p_state TEXT)
+RETURNS void AS $$
+BEGIN
+  -- Serialize refreshes of the same market across concurrent writers
+  PERFORM pg_advisory_xact_lock(hashtext('market_rollup:' || p_city || '|' || p_state));
+
+  DELETE FROM market_rollups WHERE city = p_city AND state = p_state;
+  DELETE FROM market_niche_rollups WHERE city = p_city AND state = p_state;
+
+  INSERT INTO market_rollups (
+    city, state,
+    offers_botox, offers_filler, has_membership, active_instagram, has_med_director, unique_owners,
+    rating_distribution,
+    competitor_count, avg_reviews, leader_reviews, top_quartile_reviews,
+    has_website, has_email, has_social, transparent_pricing,
+    refreshed_at
+  )
+  SELECT
+    p_city, p_state,
+    COUNT(*) FILTER (WHERE pricing_botox IS NOT NULL),
+    COUNT(*) FILTER (WHERE pricing_filler IS NOT NULL),
+    COUNT(*) FILTER (WHERE pricing_membership IS NOT NULL),
+    COUNT(*) FILTER (WHERE instagram_handle IS NOT NULL),
+    COUNT(*) FILTER (WHERE medical_director_name IS NOT NULL),
+    COUNT(DISTINCT owner_name),
+    (
+      SELECT COALESCE(jsonb_agg(jsonb_build_object(
+               'tier', t.rating_tier,
+               'count', t.business_count,
+               'avg_reviews', t.avg_reviews
+             ) ORDER BY t.min_rating DESC), '[]'::jsonb)
+      FROM (
+        SELECT
+          CASE
+            WHEN rating >= 4.8 THEN 'Excellent (4.8+)'
+            WHEN rating >= 4.5 THEN 'Very Good (4.5-4.7)'
+            WHEN rating >= 4.0 THEN 'Good (4.0-4.4)'
+            WHEN rating >= 3.5 THEN 'Average (3.5-3.9)'
+            ELSE 'Below Average (<3.5)'
+          END as rating_tier,
+          COUNT(*) as business_count,
+          COALESCE(TRUNC(AVG(review_count)), 0)::int as avg_reviews,
+          MIN(rating) as min_rating
+        FROM leads
+        WHERE city = p_city AND state = p_state AND rating IS NOT NULL
+        GROUP BY 1
+      ) t
+    ),
+    COUNT(*),
+    AVG(review_count),
+    MAX(review_count),
+    PERCENTILE_CONT(0.75) WITHIN GROUP (ORDER BY review_count),
+    COUNT(*) FILTER (WHERE website IS NOT NULL),
+    COUNT(*) FILTER (WHERE email IS NOT NULL),
+    COUNT(*) FILTER (WHERE instagram_handle IS NOT NULL OR facebook_handle IS NOT NULL),
+    COUNT(*) FILTER (WHERE pricing_botox IS NOT NULL OR pricing_filler IS NOT NULL),
+    CURRENT_TIMESTAMP
+  FROM leads
+  WHERE city = p_city AND state = p_state
+  HAVING COUNT(*) > 0;
+
+  INSERT INTO market_niche_rollups (
+    city, state, niche_is_null, search_niche,
+    total_businesses, rating_sum, rating_count, review_sum, reviewed_count,
+    max_reviews, min_reviews, review_count_freq,
+    top_3_count, rank_4_to_10, with_email, with_owner,
+    review_histogram,
+    with_botox_pricing, botox_price_sum, botox_price_count, min_botox_price, max_botox_price,
+    with_instagram, with_facebook, with_website, with_medical_director,
+    refreshed_at
+  )
+  SELECT
+    p_city, p_state, n.search_niche IS NULL, COALESCE(n.search_niche, ''),
+    n.total_businesses, n.rating_sum, n.rating_count, n.review_sum, n.reviewed_count,
+    n.max_reviews, n.min_reviews,
+    (
+      SELECT COALESCE(jsonb_object_agg(f.review_count::text, f.business_count), '{}'::jsonb)
+      FROM (
+        SELECT review_count, COUNT(*) as business_count
+        FROM leads
+        WHERE city = p_city AND state = p_state
+        AND search_niche IS NOT DISTINCT FROM n.search_niche
+        AND review_count IS NOT NULL
+        GROUP BY review_count
+      ) f
+    ),
+    n.top_3_count, n.rank_4_to_10, n.with_email, n.with_owner,
+    (
+      SELECT COALESCE(jsonb_object_agg(h.review_range, h.business_count), '{}'::jsonb)
+      FROM (
+        SELECT
+          CASE
+            WHEN review_count = 0 THEN '0'
+            WHEN review_count BETWEEN 1 AND 10 THEN '1-10'
+            WHEN review_count BETWEEN 11 AND 50 THEN '11-50'
+            WHEN review_count BETWEEN 51 AND 100 THEN '51-100'
+            WHEN review_count BETWEEN 101 AND 200 THEN '101-200'
+            WHEN review_count BETWEEN 201 AND 500 THEN '201-500'
+            ELSE '500+'
+          END as review_range,
+          COUNT(*) as business_count
+        FROM leads
+        WHERE city = p_city AND state = p_state
+        AND search_niche IS NOT DISTINCT FROM n.search_niche
+        GROUP BY 1
+      ) h
+    ),
+    n.with_botox_pricing, n.botox_price_sum, n.botox_price_count, n.min_botox_price, n.max_botox_price,
+    n.with_instagram, n.with_facebook, n.with_website, n.with_medical_director,
+    CURRENT_TIMESTAMP
+  FROM (
+    SELECT
+      search_niche,
+      COUNT(*) as total_businesses,
+      COALESCE(SUM(rating), 0) as rating_sum,
+      COUNT(rating) as rating_count,
+      COALESCE(SUM(review_count), 0) as review_sum,
+      COUNT(review_count) as reviewed_count,
+      MAX(review_count) as max_reviews,
+      MIN(review_count) as min_reviews,
+      COUNT(*) FILTER (WHERE local_pack_rank <= 3) as top_3_count,
+      COUNT(*) FILTER (WHERE local_pack_rank BETWEEN 4 AND 10) as rank_4_to_10,
+      COUNT(*) FILTER (WHERE email IS NOT NULL) as with_email,
+      COUNT(*) FILTER (WHERE owner_name IS NOT NULL) as with_owner,
+      COUNT(*) FILTER (WHERE pricing_botox IS NOT NULL) as with_botox_pricing,
+      COALESCE(SUM(botox_price), 0) as botox_price_sum,
+      COUNT(botox_price) as botox_price_count,
+      MIN(botox_price) as min_botox_price,
+      MAX(botox_price) as max_botox_price,
+      COUNT(*) FILTER (WHERE instagram_handle IS NOT NULL) as with_instagram,
+      COUNT(*) FILTER (WHERE facebook_handle IS NOT NULL) as with_facebook,
+      COUNT(*) FILTER (WHERE website IS NOT NULL) as with_website,
+      COUNT(*) FILTER (WHERE medical_director_name IS NOT NULL) as with_medical_director
+    FROM (
+      SELECT
+        *,
+        CASE
+          WHEN pricing_botox ~ '^[0-9]+$' THEN CAST(pricing_botox AS NUMERIC)
+          WHEN pricing_botox ~ '^\$([0-9]+)' THEN CAST(SUBSTRING(pricing_botox FROM '\$([0-9]+)') AS NUMERIC)
+          ELSE NULL
+        END as botox_price
+      FROM leads
+      WHERE city = p_city AND state = p_state
+    ) priced
+    GROUP BY search_niche
+  ) n;
+END;
+$$ LANGUAGE plpgsql;
+
+-- ============================================
+-- 4. INCREMENTAL MAINTENANCE TRIGGERS
+-- ============================================
+-- Statement-level with transition tables, so a bulk ingest of 1,000 leads
+-- refreshes each touched market once rather than once per row.
+CREATE OR REPLACE FUNCTION leads_refresh_market_rollups()
+RETURNS trigger AS $$
+DECLARE
+  m RECORD;
+BEGIN
+  IF TG_OP = 'INSERT' THEN
+    FOR m IN
+      SELECT DISTINCT city, state FROM new_rows
+      WHERE city IS NOT NULL AND state IS NOT NULL
+    LOOP
+      PERFORM refresh_market_rollup(m.city, m.state);
+    END LOOP;
+  ELSIF TG_OP = 'DELETE' THEN
+    FOR m IN
+      SELECT DISTINCT city, state FROM old_rows
+      WHERE city IS NOT NULL AND state IS NOT NULL
+    LOOP
+      PERFORM refresh_market_rollup(m.city, m.state);
+    END LOOP;
+  ELSE
+    -- Only markets where an aggregated column changed (JSONB enrichment
+    -- updates, for example, leave the rollups untouched)
+    FOR m IN
+      WITH changed AS (
+        SELECT o.city as old_city, o.state as old_state, n.city as new_city, n.state as new_state
+        FROM old_rows o
+        JOIN new_rows n ON n.id = o.id
+        WHERE (o.city, o.state, o.search_niche, o.rating, o.review_count, o.local_pack_rank,
+               o.email, o.owner_name, o.medical_director_name, o.website,
+               o.instagram_handle, o.facebook_handle,
+               o.pricing_botox, o.pricing_filler, o.pricing_membership)
+          IS DISTINCT FROM
+              (n.city, n.state, n.search_niche, n.rating, n.review_count, n.local_pack_rank,
+               n.email, n.owner_name, n.medical_director_name, n.website,
+               n.instagram_handle, n.facebook_handle,
+               n.pricing_botox, n.pricing_filler, n.pricing_membership)
+      )
+      SELECT old_city as city, old_state as state FROM changed
+      WHERE old_city IS NOT NULL AND old_state IS NOT NULL
+      UNION
+      SELECT new_city, new_state FROM changed
+      WHERE new_city IS NOT NULL AND new_state IS NOT NULL
+    LOOP
+      PERFORM refresh_market_rollup(m.city, m.state);
+    END LOOP;
+  END IF;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Transition tables require one trigger per event
+DROP TRIGGER IF EXISTS leads_market_rollups_insert ON leads;
+CREATE TRIGGER leads_market_rollups_insert
+  AFTER INSERT ON leads
+  REFERENCING NEW TABLE AS new_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION leads_refresh_market_rollups();
+
+DROP TRIGGER IF EXISTS leads_market_rollups_update ON leads;
+CREATE TRIGGER leads_market_rollups_update
+  AFTER UPDATE ON leads
+  REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION leads_refresh_market_rollups();
+
+DROP TRIGGER IF EXISTS leads_market_rollups_delete ON leads;
+CREATE TRIGGER leads_market_rollups_delete
+  AFTER DELETE ON leads
+  REFERENCING OLD TABLE AS old_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION leads_refresh_market_rollups();
+
+-- ============================================
+-- 5. BACKFILL
+-- ============================================
+SELECT refresh_market_rollup(city, state)
+FROM (
+  SELECT DISTINCT city, state FROM leads
+  WHERE city IS NOT NULL AND state IS NOT NULL
+) markets;
+
+COMMENT ON TABLE market_rollups IS 'Per (city, state) market aggregates, refreshed by leads triggers';
+COMMENT ON TABLE market_niche_rollups IS 'Mergeable per (city, state, search_niche) aggregates, refreshed by leads triggers';
@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+Adaptive Grid - coarse-to-fine sampling of a rank heat map
+
+Instead of searching every point of an NxN grid, start from a coarse grid
+(5x5 by default, on the same lattice) and only subdivide cells whose corner
+ranks for the target business disagree. Flat regions stay coarse; edges where
+the business drops out or changes rank band get full resolution. Unsampled
+lattice points are filled from their cell's corners, so the output is the
+same NxN rank grid a full run produces.
+
+The refiner only deals in (row, col) lattice cells and ranks, so the same
+logic drives live searches (GridSearchOrchestrator.perform_adaptive_grid_search)
+and offline replays against a saved full grid (compare_adaptive_grid.py).
+
+Usage:
+    refiner = AdaptiveGridRefiner(grid_size=13)
+    batch = refiner.initial_points()
+    while batch:
+        ranks.update(search(batch))  # (row, col) -> rank, None if not found
+        batch = refiner.next_points(ranks)
+    rank_grid = refiner.fill(ranks)
+"""
+import re
+from typing import Dict, Iterable, List, Optional, Tuple
+
+Cell = Tuple[int, int]
+Rect = Tuple[int, int, int, int]  # (row0, col0, row1, col1), corners inclusive
+
+# Same bands as GridSearchOrchestrator._format_heat_map colors
+RANK_BANDS = ((3, 'green'), (10, 'yellow'), (20, 'orange'))
+
+
+def rank_band(rank: Optional[int]) -> str:
+    if rank is None:
+        return 'missing'
+    for limit, band in RANK_BANDS:
+        if rank <= limit:
+            return band
+    return 'red'
+
+
+def normalize_name(name: Optional[str]) -> str:
+    return re.sub(r'[^a-z0-9]+', ' ', (name or '').lower()).strip()
+
+
+def names_match(name: Optional[str], target: Optional[str]) -> bool:
+    """
+    Same business name: equal once normalized, or the same set of words.
+    A shorter name inside the other ("Med Spa" in "Glow Med Spa") doesn't count
+    """
+    name, target = normalize_name(name), normalize_name(target)
+    if not name or not target:
+        return False
+    return name == target or set(name.split()) == set(target.split())
+
+
+def target_rank(businesses: Optional[List[Dict]], business_name: str) -> Optional[int]:
+    """Rank of business_name in one point's result list (None if absent)"""
+    for position, business in enumerate(businesses or [], 1):
+        if names_match(business.get('name'), business_name):
+            return business.get('rank') or position
+    return None
+
+
+def lattice_indices(size: int, count: int) -> List[int]:
+    """count roughly evenly spaced indices over 0..size-1, always including both ends"""
+    count = max(2, min(count, size))
+    return sorted({round(i * (size - 1) / (count - 1)) for i in range(count)})
+
+
+class AdaptiveGridRefiner:
+    """Decides which lattice points to search next from the ranks seen so far"""
+
+    def __init__(self, grid_size: int, coarse_size: int = 5, rank_tolerance: int = 1):
+        """
+        Args:
+            grid_size: Full lattice dimensions (e.g. 13 for the 13x13 grid)
+            coarse_size: Initial grid dimensions sampled on that lattice
+            rank_tolerance: Largest rank difference between a cell's corners
+                that still counts as flat (same band is also required)
+        """
+        if grid_size < 2:
+            raise ValueError("grid_size must be at least 2")
+        self.grid_size = grid_size
+        self.rank_tolerance = rank_tolerance
+        self.coarse = lattice_indices(grid_size, coarse_size)
+        self.rounds = 0
+        # Cells still to be judged, and cells that are final (flat or minimal)
+        self._open: List[Rect] = [
+            (r0, c0, r1, c1)
+            for r0, r1 in zip(self.coarse, self.coarse[1:])
+            for c0, c1 in zip(self.coarse, self.coarse[1:])
+        ]
+        self.leaves: List[Rect] = []
+
+    def initial_points(self) -> List[Cell]:
+        self.rounds = 1
+        return [(row, col) for row in self.coarse for col in self.coarse]
+
+    def corners_agree(self, rect: Rect, ranks: Dict[Cell, Optional[int]]) -> bool:
+        """
+        True if a cell's corners show a flat rank surface. A corner missing
+        from ``ranks`` (search failed) never agrees, so its cell is refined
+        """
+        r0, c0, r1, c1 = rect
+        corners = [(r0, c0), (r0, c1), (r1, c0), (r1, c1)]
+        if any(corner not in ranks for corner in corners):
+            return False
+        values = [ranks[corner] for corner in corners]
+        if len({rank_band(value) for value in values}) > 1:
+            return False
+        found = [value for value in values if value is not None]
+        return not found or max(found) - min(found) <= self.rank_tolerance
+
+    def next_points(self, ranks: Dict[Cell, Optional[int]]) -> List[Cell]:
+        """
+        Split every open cell whose corners disagree and return the lattice
+        points needed to judge the new sub-cells (empty when refinement is done)
+        """
+        new_points = set()
+        still_open = []
+        for rect in self._open:
+            r0, c0, r1, c1 = rect
+            if self.corners_agree(rect, ranks) or (r1 - r0 <= 1 and c1 - c0 <= 1):
+                self.leaves.append(rect)
+                continue
+            rows = [r0, (r0 + r1) // 2, r1] if r1 - r0 > 1 else [r0, r1]
+            cols = [c0, (c0 + c1) // 2, c1] if c1 - c0 > 1 else [c0, c1]
+            for ra, rb in zip(rows, rows[1:]):
+                for ca, cb in zip(cols, cols[1:]):
+                    still_open.append((ra, ca, rb, cb))
+            new_points.update((row, col) for row in rows for col in cols)
+        self._open = still_open
+        batch = sorted(point for point in new_points if point not in ranks)
+        if not batch and self._open:
+            # Every corner of the new cells is known already; judge them now
+            return self.next_points(ranks)
+        if batch:
+            self.rounds += 1
+        return batch
+
+    def fill(self, ranks: Dict[Cell, Optional[int]]) -> List[List[Optional[int]]]:
+        """
+        Full rank grid: sampled points as searched, every other point
+        bilinearly interpolated from the corners of the final cell holding it
+        """
+        grid: List[List[Optional[int]]] = [[None] * self.grid_size for _ in range(self.grid_size)]
+        filled = set()
+        for (row, col), rank in ranks.items():
+            grid[row][col] = rank
+            filled.add((row, col))
+        for rect in self.leaves + self._open:
+            r0, c0, r1, c1 = rect
+            corners = [ranks.get((r0, c0)), ranks.get((r0, c1)), ranks.get((r1, c0)), ranks.get((r1, c1))]
+            known = [value for value in corners if value is not None]
+            for row in range(r0, r1 + 1):
+                for col in range(c0, c1 + 1):
+                    if (row, col) in filled:
+                        continue
+                    filled.add((row, col))
+                    if len(known) < 4:
+                        # Business missing at some corners: keep it where most
+                        # corners saw it, otherwise treat it as absent
+                        grid[row][col] = round(sum(known) / len(known)) if len(known) > 2 else None
+                        continue
+                    ty = (row - r0) / (r1 - r0) if r1 > r0 else 0
+                    tx = (col - c0) / (c1 - c0) if c1 > c0 else 0
+                    top = corners[0] * (1 - tx) + corners[1] * tx
+                    bottom = corners[2] * (1 - tx) + corners[3] * tx
+                    grid[row][col] = round(top * (1 - ty) + bottom * ty)
+        return grid
+
+
+def compare_rank_grids(
+    reference: List[List[Optional[int]]],
+    candidate: List[List[Optional[int]]],
+    skip: Iterable[Cell] = ()
+) -> Dict:
+    """
+    Fidelity of a candidate rank grid against a reference (full) grid,
+    leaving out ``skip`` cells (e.g. points that failed in the reference run)
+    """
+    skip = set(skip)
+    cells = exact = same_band = presence = 0
+    errors = []
+    for row, (ref_row, cand_row) in enumerate(zip(reference, candidate)):
+        for col, (ref, cand) in enumerate(zip(ref_row, cand_row)):
+            if (row, col) in skip:
+                continue
+            cells += 1
+            exact += ref == cand
+            same_band += rank_band(ref) == rank_band(cand)
+            presence += (ref is None) == (cand is None)
+            if ref is not None and cand is not None:
+                errors.append(abs(ref - cand))
+    return {
+        'cells': cells,
+        'exact_match_pct': round(exact / cells * 100, 1) if cells else 0.0,
+        'same_band_pct': round(same_band / cells * 100, 1) if cells else 0.0,
+        'presence_match_pct': round(presence / cells * 100, 1) if cells else 0.0,
+        'mean_abs_rank_error': round(sum(errors) / len(errors), 2) if errors else 0.0,
+        'max_abs_rank_error': max(errors) if errors else 0
+    }
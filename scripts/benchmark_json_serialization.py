@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+JSON Serialization Benchmark
+Times serialization of a realistic /api/analyze payload (20 market rankings,
+10 top competitors, review distribution, Decimal ratings and prices from the
+database) with FastAPI's default path - jsonable_encoder + JSONResponse -
+against OrjsonResponse, and checks both produce the same JSON.
+
+Usage:
+    python benchmark_json_serialization.py --iterations 2000
+"""
+
+import json
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timezone
+from decimal import Decimal
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+import typer
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'api'))
+
+from json_response import OrjsonResponse, orjson
+
+app = typer.Typer(help='Benchmark /api/analyze response serialization')
+
+
+def rating(rng: random.Random) -> Decimal:
+    return Decimal(str(round(rng.uniform(3.5, 5.0), 2)))
+
+
+def analyze_payload(seed_value: int) -> Dict[str, Any]:
+    """Shape of build_analysis_response() output with database-typed values"""
+    rng = random.Random(seed_value)
+    competitors = [
+        {
+            'id': rng.randint(1, 100000),
+            'name': f"Competitor {i}",
+            'rank': i + 1,
+            'reviews': rng.randint(50, 1500),
+            'rating': rating(rng),
+            'advantages': [f"Advantage {j}" for j in range(3)],
+            'city': 'Austin',
+            'state': 'TX',
+            'website': f"https://competitor{i}.example.com",
+            'phone': '512-555-0100',
+        }
+        for i in range(3)
+    ]
+    market_intel = {
+        'market_summary': {
+            'total_businesses': 145,
+            'avg_rating': Decimal('4.3125'),
+            'avg_reviews': 86,
+            'median_reviews': 45,
+            'max_reviews': 1250,
+            'min_reviews': 0,
+            'top_3_count': 3,
+            'rank_4_to_10': 7,
+            'with_email': 88,
+            'with_owner': 61,
+        },
+        'top_competitors': [
+            {
+                'name': f"Top Business {i}",
+                'rating': rating(rng),
+                'reviews': rng.randint(100, 2000),
+                'rank': rng.randint(1, 20),
+                'website': f"https://top{i}.example.com",
+                'botox_price': f"${rng.randint(9, 16)}/unit",
+                'instagram': f"@top{i}",
+                'has_owner': rng.random() > 0.5,
+            }
+            for i in range(10)
+        ],
+        'review_distribution': [
+            {'range': label, 'count': rng.randint(1, 60)}
+            for label in ['0', '1-10', '11-50', '51-100', '101-200', '201-500', '500+']
+        ],
+        'pricing_intelligence': {
+            'businesses_with_pricing': 42,
+            'avg_botox_price': Decimal('12.4761904761904762'),
+            'min_botox_price': Decimal('9'),
+            'max_botox_price': Decimal('16'),
+        },
+        'market_rankings': [
+            {'name': f"Ranked Business {i}", 'reviews': 2000 - i * 75, 'position': i + 1}
+            for i in range(20)
+        ],
+    }
+    return {
+        'business': {
+            'name': 'Average Med Spa',
+            'rating': Decimal('4.20'),
+            'reviewCount': 85,
+            'city': 'Austin',
+            'state': 'TX',
+            'niche': 'med spas',
+            'website': 'averagemedspa.com',
+            'phone': '512-555-0100',
+            'address': '123 Main St',
+            'ownerName': 'Dr. Sarah Johnson',
+            'leadScore': 72,
+            'matchConfidence': 0.913,
+            'socialMedia': {'instagram': '@averagemedspa', 'facebook': None},
+            'pricing': {'botox': '$12/unit', 'filler': None},
+            'businessIntel': {'isExpanding': True, 'isHiring': False, 'foundedYear': 2016},
+            'updatedAt': datetime(2025, 9, 2, 14, 30, tzinfo=timezone.utc),
+        },
+        'analysis': {
+            'currentRank': 7,
+            'potentialTraffic': '15%',
+            'lostRevenue': 75000,
+            'reviewDeficit': 320,
+            'competitorsAvgReviews': 405,
+            'painPoints': [
+                {'issue': f"Issue {i}", 'severity': 'high', 'impact': f"Impact {i}"} for i in range(3)
+            ],
+            'competitors': competitors,
+            'competitorLocations': [],
+            'solutions': [f"Solution {i}" for i in range(6)],
+            'timeline': '60-90 days',
+            'urgency': 'high',
+            'actionPlan': [{'week': i, 'tasks': [f"Task {i}.{j}" for j in range(4)]} for i in range(1, 9)],
+            'marketIntel': market_intel,
+            'businessPercentile': {
+                'business_name': 'Average Med Spa',
+                'review_count': 85,
+                'rating': 4.2,
+                'local_pack_rank': 7,
+                'review_percentile': 48.6,
+                'rating_percentile': 35.2,
+                'total_businesses': 145,
+            },
+        },
+        'pitch': {'headline': 'You are losing customers to 6 competitors', 'urgency': 'high'},
+        'reputation': None,
+        'degraded': [],
+    }
+
+
+def fastapi_default(payload: Dict[str, Any]) -> bytes:
+    """What FastAPI does for a returned dict: jsonable_encoder, then JSONResponse.render"""
+    return JSONResponse(jsonable_encoder(payload)).body
+
+
+def orjson_response(payload: Dict[str, Any]) -> bytes:
+    """Returning OrjsonResponse directly (analyze_business)"""
+    return OrjsonResponse(payload).body
+
+
+def time_calls(serialize: Callable, payload: Dict[str, Any], iterations: int) -> List[float]:
+    timings = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        serialize(payload)
+        timings.append((time.perf_counter() - started) * 1_000_000)
+    return timings
+
+
+def summarize(label: str, timings: List[float]):
+    ordered = sorted(timings)
+    p95 = ordered[min(len(ordered) - 1, int(0.95 * (len(ordered) - 1)))]
+    print(f"{label:<34} mean: {statistics.mean(timings):8.1f} µs  "
+          f"p50: {statistics.median(timings):8.1f} µs  p95: {p95:8.1f} µs")
+
+
+@app.command()
+def main(
+    iterations: int = typer.Option(2000, help='Serializations per implementation'),
+    seed_value: int = typer.Option(42, '--seed', help='Random seed for the synthetic payload'),
+):
+    """Compare serialization cost of the default and orjson response paths"""
+    payload = analyze_payload(seed_value)
+
+    default_body = fastapi_default(payload)
+    orjson_body = orjson_response(payload)
+    if json.loads(default_body) != json.loads(orjson_body):
+        print("❌ Serialized payloads differ")
+        raise typer.Exit(1)
+
+    # Warm up both paths
+    time_calls(fastapi_default, payload, 50)
+    time_calls(orjson_response, payload, 50)
+
+    default_t = time_calls(fastapi_default, payload, iterations)
+    orjson_t = time_calls(orjson_response, payload, iterations)
+
+    print("=" * 80)
+    print(f"ANALYZE PAYLOAD SERIALIZATION ({len(default_body):,} bytes, {iterations} iterations, "
+          f"{'orjson' if orjson is not None else 'stdlib json fallback'})")
+    print("=" * 80)
+    summarize('jsonable_encoder + JSONResponse', default_t)
+    summarize('OrjsonResponse', orjson_t)
+    print(f"Speedup: {statistics.mean(default_t) / statistics.mean(orjson_t):.1f}x")
+    print("✅ Identical JSON from both paths")
+
+
+if __name__ == '__main__':
+    app()
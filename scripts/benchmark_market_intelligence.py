@@ -0,0 +1,398 @@
+#!/usr/bin/env python3
+"""
+Market Intelligence Benchmark
+Seeds a local Postgres with synthetic leads and compares the legacy six-query
+get_market_intelligence implementation against the single-pass
+MARKET_INTELLIGENCE_SQL: round-trips and wall time per call, plus a check that
+both produce the same response.
+
+Usage:
+    python benchmark_market_intelligence.py --dsn postgresql://localhost/bench --leads 50000
+"""
+
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+import psycopg
+import typer
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'api'))
+
+from market_intelligence import (
+    MARKET_INTELLIGENCE_SQL,
+    build_market_intelligence,
+    market_intelligence_params,
+)
+
+app = typer.Typer(help='Benchmark legacy vs single-pass market intelligence queries')
+
+BENCH_SCHEMA = 'bench_market'
+ROLLUP_MIGRATION = Path(__file__).resolve().parent.parent / 'migrations' / 'create_market_rollup_tables.sql'
+
+CITIES = [
+    ('Austin', 'TX'), ('Dallas', 'TX'), ('Houston', 'TX'), ('San Antonio', 'TX'),
+    ('Miami', 'FL'), ('Orlando', 'FL'), ('Tampa', 'FL'), ('Los Angeles', 'CA'),
+    ('San Diego', 'CA'), ('San Francisco', 'CA'), ('Ashburn', 'VA'), ('Leesburg', 'VA'),
+    ('Denver', 'CO'), ('Phoenix', 'AZ'), ('Scottsdale', 'AZ'), ('Seattle', 'WA'),
+]
+NICHES = ['med spas', 'medical spa', 'dentist', 'plastic surgeon', None]
+
+
+class CountingCursor:
+    """Cursor wrapper that counts statements sent to the server"""
+
+    def __init__(self, cur):
+        self._cur = cur
+        self.round_trips = 0
+
+    def execute(self, query, params=None):
+        self.round_trips += 1
+        return self._cur.execute(query, params)
+
+    def fetchone(self):
+        return self._cur.fetchone()
+
+    def fetchall(self):
+        return self._cur.fetchall()
+
+
+def seed(conn, total_leads: int, seed_value: int):
+    """Create bench_market.leads, fill it with synthetic leads and build its rollups"""
+    rng = random.Random(seed_value)
+    # Skew market sizes so a few cities dominate, like the real leads table
+    weights = [1.0 / (i + 1) for i in range(len(CITIES))]
+    with conn.cursor() as cur:
+        cur.execute(f"CREATE SCHEMA IF NOT EXISTS {BENCH_SCHEMA}")
+        cur.execute(f"DROP TABLE IF EXISTS {BENCH_SCHEMA}.leads")
+        cur.execute(f"""
+            CREATE TABLE {BENCH_SCHEMA}.leads (
+                id SERIAL PRIMARY KEY,
+                business_name VARCHAR(255),
+                rating DECIMAL(3,2),
+                review_count INTEGER,
+                local_pack_rank INTEGER,
+                city VARCHAR(100),
+                state VARCHAR(50),
+                search_niche VARCHAR(255),
+                website VARCHAR(255),
+                phone VARCHAR(50),
+                street_address TEXT,
+                email VARCHAR(255),
+                owner_name VARCHAR(255),
+                medical_director_name VARCHAR(255),
+                pricing_botox VARCHAR(100),
+                pricing_filler VARCHAR(100),
+                pricing_membership VARCHAR(100),
+                instagram_handle VARCHAR(255),
+                facebook_handle VARCHAR(255)
+            )
+        """)
+        with cur.copy(f"""
+            COPY {BENCH_SCHEMA}.leads (
+                business_name, rating, review_count, local_pack_rank, city, state,
+                search_niche, website, email, owner_name, medical_director_name,
+                pricing_botox, instagram_handle, facebook_handle
+            ) FROM STDIN
+        """) as copy:
+            for i in range(total_leads):
+                city, state = rng.choices(CITIES, weights=weights)[0]
+                botox = rng.choice([None, None, str(rng.randint(9, 16)), f"${rng.randint(9, 16)}/unit", 'Call'])
+                copy.write_row((
+                    f"Business {i}",
+                    round(rng.uniform(3.0, 5.0), 1) if rng.random() > 0.05 else None,
+                    int(rng.paretovariate(1.2) * 10) if rng.random() > 0.03 else None,
+                    rng.randint(1, 20) if rng.random() > 0.4 else None,
+                    city,
+                    state,
+                    rng.choice(NICHES),
+                    f"https://business{i}.example.com" if rng.random() > 0.2 else None,
+                    f"info@business{i}.example.com" if rng.random() > 0.5 else None,
+                    f"Owner {i}" if rng.random() > 0.6 else None,
+                    f"Dr. Director {i}" if rng.random() > 0.8 else None,
+                    botox,
+                    f"@business{i}" if rng.random() > 0.5 else None,
+                    f"business{i}" if rng.random() > 0.4 else None,
+                ))
+        cur.execute(f"CREATE INDEX ON {BENCH_SCHEMA}.leads (city, state)")
+        # Rollup tables, triggers and backfill land in bench_market via search_path
+        cur.execute(ROLLUP_MIGRATION.read_text())
+        cur.execute(f"ANALYZE {BENCH_SCHEMA}.leads")
+    conn.commit()
+
+
+def legacy_market_intelligence(cur, city: str, state: str, niche: str) -> Dict[str, Any]:
+    """
+    Pre-consolidation implementation: six separate scans of the market
+    """
+    market_data = {}
+
+    # 1. Overall market summary for the city
+    cur.execute("""
+        SELECT 
+            COUNT(*) as total_businesses,
+            AVG(rating) as avg_rating,
+            AVG(review_count) as avg_reviews,
+            PERCENTILE_CONT(0.5) WITHIN GROUP (ORDER BY review_count) as median_reviews,
+            MAX(review_count) as max_reviews,
+            MIN(review_count) as min_reviews,
+            COUNT(CASE WHEN local_pack_rank <= 3 THEN 1 END) as top_3_count,
+            COUNT(CASE WHEN local_pack_rank BETWEEN 4 AND 10 THEN 1 END) as rank_4_to_10,
+            COUNT(CASE WHEN email IS NOT NULL THEN 1 END) as with_email,
+            COUNT(CASE WHEN owner_name IS NOT NULL THEN 1 END) as with_owner
+        FROM leads 
+        WHERE city = %s AND state = %s 
+        AND (search_niche ILIKE %s OR search_niche IS NULL)
+    """, (city, state, f'%{niche}%'))
+    
+    result = cur.fetchone()
+    if result:
+        market_data['market_summary'] = {
+            'total_businesses': result[0],
+            'avg_rating': float(result[1]) if result[1] else 0,
+            'avg_reviews': int(result[2]) if result[2] else 0,
+            'median_reviews': int(result[3]) if result[3] else 0,
+            'max_reviews': result[4] or 0,
+            'min_reviews': result[5] or 0,
+            'top_3_count': result[6],
+            'rank_4_to_10': result[7],
+            'with_email': result[8],
+            'with_owner': result[9]
+        }
+    
+    # 2. Top 10 competitors by review count
+    cur.execute("""
+        SELECT 
+            business_name,
+            rating,
+            review_count,
+            local_pack_rank,
+            website,
+            CASE 
+                WHEN pricing_botox IS NOT NULL THEN pricing_botox
+                ELSE NULL
+            END as botox_price,
+            instagram_handle,
+            owner_name
+        FROM leads 
+        WHERE city = %s AND state = %s 
+        AND (search_niche ILIKE %s OR search_niche IS NULL)
+        ORDER BY review_count DESC NULLS LAST
+        LIMIT 10
+    """, (city, state, f'%{niche}%'))
+    
+    top_competitors = []
+    for row in cur.fetchall():
+        top_competitors.append({
+            'name': row[0],
+            'rating': float(row[1]) if row[1] is not None else None,
+            'reviews': row[2] or 0,
+            'rank': row[3],
+            'website': row[4],
+            'botox_price': row[5],
+            'instagram': row[6],
+            'has_owner': bool(row[7])
+        })
+    market_data['top_competitors'] = top_competitors
+    
+    # 3. Review distribution analysis
+    cur.execute("""
+        SELECT 
+            CASE 
+                WHEN review_count = 0 THEN '0'
+                WHEN review_count BETWEEN 1 AND 10 THEN '1-10'
+                WHEN review_count BETWEEN 11 AND 50 THEN '11-50'
+                WHEN review_count BETWEEN 51 AND 100 THEN '51-100'
+                WHEN review_count BETWEEN 101 AND 200 THEN '101-200'
+                WHEN review_count BETWEEN 201 AND 500 THEN '201-500'
+                ELSE '500+'
+            END as review_range,
+            COUNT(*) as business_count
+        FROM leads 
+        WHERE city = %s AND state = %s 
+        AND (search_niche ILIKE %s OR search_niche IS NULL)
+        GROUP BY review_range
+        ORDER BY 
+            CASE review_range
+                WHEN '0' THEN 1
+                WHEN '1-10' THEN 2
+                WHEN '11-50' THEN 3
+                WHEN '51-100' THEN 4
+                WHEN '101-200' THEN 5
+                WHEN '201-500' THEN 6
+                ELSE 7
+            END
+    """, (city, state, f'%{niche}%'))
+    
+    review_distribution = []
+    for row in cur.fetchall():
+        review_distribution.append({
+            'range': row[0],
+            'count': row[1]
+        })
+    market_data['review_distribution'] = review_distribution
+    
+    # 4. Pricing intelligence
+    cur.execute("""
+        SELECT 
+            COUNT(CASE WHEN pricing_botox IS NOT NULL THEN 1 END) as with_botox_pricing,
+            AVG(CASE 
+                WHEN pricing_botox ~ '^[0-9]+$' THEN CAST(pricing_botox AS NUMERIC)
+                WHEN pricing_botox ~ '^\\$([0-9]+)' THEN CAST(SUBSTRING(pricing_botox FROM '\\$([0-9]+)') AS NUMERIC)
+                ELSE NULL
+            END) as avg_botox_price,
+            MIN(CASE 
+                WHEN pricing_botox ~ '^[0-9]+$' THEN CAST(pricing_botox AS NUMERIC)
+                WHEN pricing_botox ~ '^\\$([0-9]+)' THEN CAST(SUBSTRING(pricing_botox FROM '\\$([0-9]+)') AS NUMERIC)
+                ELSE NULL
+            END) as min_botox_price,
+            MAX(CASE 
+                WHEN pricing_botox ~ '^[0-9]+$' THEN CAST(pricing_botox AS NUMERIC)
+                WHEN pricing_botox ~ '^\\$([0-9]+)' THEN CAST(SUBSTRING(pricing_botox FROM '\\$([0-9]+)') AS NUMERIC)
+                ELSE NULL
+            END) as max_botox_price
+        FROM leads 
+        WHERE city = %s AND state = %s 
+        AND (search_niche ILIKE %s OR search_niche IS NULL)
+    """, (city, state, f'%{niche}%'))
+    
+    pricing_result = cur.fetchone()
+    if pricing_result:
+        market_data['pricing_intelligence'] = {
+            'businesses_with_pricing': pricing_result[0] or 0,
+            'avg_botox_price': float(pricing_result[1]) if pricing_result[1] else None,
+            'min_botox_price': float(pricing_result[2]) if pricing_result[2] else None,
+            'max_botox_price': float(pricing_result[3]) if pricing_result[3] else None
+        }
+    
+    # 5. Growth indicators
+    cur.execute("""
+        SELECT 
+            COUNT(CASE WHEN instagram_handle IS NOT NULL THEN 1 END) as with_instagram,
+            COUNT(CASE WHEN facebook_handle IS NOT NULL THEN 1 END) as with_facebook,
+            COUNT(CASE WHEN website IS NOT NULL THEN 1 END) as with_website,
+            COUNT(CASE WHEN medical_director_name IS NOT NULL THEN 1 END) as with_medical_director
+        FROM leads 
+        WHERE city = %s AND state = %s 
+        AND (search_niche ILIKE %s OR search_niche IS NULL)
+    """, (city, state, f'%{niche}%'))
+    
+    growth_result = cur.fetchone()
+    if growth_result:
+        market_data['digital_presence'] = {
+            'with_instagram': growth_result[0] or 0,
+            'with_facebook': growth_result[1] or 0,
+            'with_website': growth_result[2] or 0,
+            'with_medical_director': growth_result[3] or 0
+        }
+        
+    # 6. Get business's own ranking position
+    cur.execute("""
+        SELECT 
+            business_name,
+            review_count,
+            (SELECT COUNT(*) + 1 FROM leads l2 
+             WHERE l2.city = l1.city AND l2.state = l1.state 
+             AND l2.review_count > l1.review_count) as review_rank
+        FROM leads l1
+        WHERE city = %s AND state = %s 
+        AND (search_niche ILIKE %s OR search_niche IS NULL)
+        ORDER BY review_count DESC
+    """, (city, state, f'%{niche}%'))
+    
+    rankings = []
+    for row in cur.fetchall():
+        rankings.append({
+            'business': row[0],
+            'reviews': row[1] or 0,
+            'position': row[2]
+        })
+    market_data['market_rankings'] = rankings[:20]  # Top 20 for context
+    
+    return market_data
+
+
+def single_pass_market_intelligence(cur, city: str, state: str, niche: str) -> Dict[str, Any]:
+    """Current implementation: one statement, one round-trip"""
+    cur.execute(MARKET_INTELLIGENCE_SQL, market_intelligence_params(city, state, niche))
+    return build_market_intelligence(cur.fetchone())
+
+
+def comparable(market_data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Project LIMITed lists onto tie-invariant fields - rows with equal review
+    counts may legitimately come back in a different order
+    """
+    data = dict(market_data)
+    data['top_competitors'] = [c['reviews'] for c in data.get('top_competitors', [])]
+    data['market_rankings'] = [(r['reviews'], r['position']) for r in data.get('market_rankings', [])]
+    return data
+
+
+def run(conn, impl, markets: List[Tuple[str, str]], niche: str, iterations: int):
+    timings = []
+    round_trips = []
+    results = {}
+    for _ in range(iterations):
+        for city, state in markets:
+            cur = CountingCursor(conn.cursor())
+            started = time.perf_counter()
+            results[(city, state)] = impl(cur, city, state, niche)
+            timings.append((time.perf_counter() - started) * 1000)
+            round_trips.append(cur.round_trips)
+            conn.rollback()
+    return timings, round_trips, results
+
+
+def summarize(label: str, timings: List[float], round_trips: List[int]):
+    ordered = sorted(timings)
+    p95 = ordered[min(len(ordered) - 1, int(0.95 * (len(ordered) - 1)))]
+    print(f"{label:<14} round-trips/call: {statistics.mean(round_trips):.1f}  "
+          f"mean: {statistics.mean(timings):8.2f} ms  "
+          f"p95: {p95:8.2f} ms  "
+          f"total: {sum(timings):9.1f} ms")
+
+
+@app.command()
+def main(
+    dsn: str = typer.Option(..., help='Local Postgres DSN (a bench_market schema is created there)'),
+    leads: int = typer.Option(50000, help='Number of synthetic leads to seed'),
+    niche: str = typer.Option('med spa', help='Niche filter passed to both implementations'),
+    iterations: int = typer.Option(5, help='Passes over every seeded market'),
+    seed_value: int = typer.Option(42, '--seed', help='Random seed for synthetic data'),
+    skip_seed: bool = typer.Option(False, help='Reuse an existing bench_market.leads table'),
+):
+    """Compare round-trips and wall time before/after the single-pass rewrite"""
+    with psycopg.connect(dsn, options=f'-c search_path={BENCH_SCHEMA}') as conn:
+        if not skip_seed:
+            print(f"🌱 Seeding {leads:,} leads into {BENCH_SCHEMA}.leads...")
+            seed(conn, leads, seed_value)
+
+        # Warm the buffer cache so both runs see the same storage state
+        run(conn, single_pass_market_intelligence, CITIES, niche, 1)
+
+        legacy_t, legacy_rt, legacy_results = run(conn, legacy_market_intelligence, CITIES, niche, iterations)
+        single_t, single_rt, single_results = run(conn, single_pass_market_intelligence, CITIES, niche, iterations)
+
+    print("=" * 80)
+    print(f"MARKET INTELLIGENCE BENCHMARK ({len(CITIES)} markets x {iterations} iterations)")
+    print("=" * 80)
+    summarize('legacy', legacy_t, legacy_rt)
+    summarize('single-pass', single_t, single_rt)
+    print(f"Speedup: {sum(legacy_t) / sum(single_t):.2f}x")
+
+    mismatches = [
+        market for market in CITIES
+        if comparable(legacy_results[market]) != comparable(single_results[market])
+    ]
+    if mismatches:
+        print(f"❌ Output differs for: {mismatches}")
+        raise typer.Exit(1)
+    print("✅ Identical output for every market")
+
+
+if __name__ == '__main__':
+    app()
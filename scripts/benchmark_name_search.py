@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+Business Name Search Benchmark
+Seeds a local Postgres with synthetic leads (1M by default) and compares the
+legacy `business_name ILIKE '%name%' ORDER BY review_count DESC LIMIT 1`
+lookup against the trigram KNN NAME_MATCH_SQL: latency percentiles plus how
+often each returns the intended business for exact, partial, lower-cased and
+misspelled names.
+
+Usage:
+    python benchmark_name_search.py --dsn postgresql://localhost/bench --leads 1000000
+"""
+
+import random
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+import psycopg
+import typer
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'api'))
+
+from name_search import name_match_params, name_match_sql
+
+app = typer.Typer(help='Benchmark legacy ILIKE vs trigram KNN business-name lookup')
+
+BENCH_SCHEMA = 'bench_names'
+
+LEGACY_NAME_SQL = """
+    SELECT id FROM leads
+    WHERE business_name ILIKE %s
+    ORDER BY review_count DESC NULLS LAST
+    LIMIT 1
+"""
+
+PREFIXES = ['Glow', 'Radiance', 'Pure', 'Elite', 'Luxe', 'Serenity', 'Revive', 'Bella', 'Vitality',
+            'Ageless', 'Sculpt', 'Allure', 'Evolve', 'Opal', 'Harmony', 'Skin', 'Aura', 'Nova']
+CORES = ['Aesthetics', 'Med Spa', 'Medical Spa', 'Dental', 'Wellness', 'Skin Clinic', 'Laser Center',
+         'Plastic Surgery', 'Dermatology', 'Beauty Bar', 'Body Studio', 'Smile Studio']
+SUFFIXES = ['', '', 'Austin', 'of Dallas', '& Wellness', 'Co', 'Institute', 'Group', 'Lounge', 'Studio']
+CITIES = ['Austin', 'Dallas', 'Houston', 'Miami', 'Tampa', 'Denver', 'Phoenix', 'Seattle']
+
+
+def synthetic_name(rng: random.Random, i: int) -> str:
+    parts = [rng.choice(PREFIXES), rng.choice(CORES), rng.choice(SUFFIXES)]
+    # A surname-ish token keeps names distinct at 1M rows
+    if rng.random() < 0.7:
+        parts.insert(0, f"{rng.choice('BCDFGHJKLMNPRSTVWZ')}{rng.choice('aeiou')}"
+                        f"{rng.choice('lnrst')}{rng.choice('aeiouy')}{i % 997}")
+    return ' '.join(p for p in parts if p)
+
+
+def seed(conn, total_leads: int, seed_value: int):
+    """Create bench_names.leads with both the legacy GIN and the GiST trigram index"""
+    rng = random.Random(seed_value)
+    with conn.cursor() as cur:
+        cur.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        cur.execute(f"CREATE SCHEMA IF NOT EXISTS {BENCH_SCHEMA}")
+        cur.execute(f"DROP TABLE IF EXISTS {BENCH_SCHEMA}.leads")
+        cur.execute(f"""
+            CREATE TABLE {BENCH_SCHEMA}.leads (
+                id SERIAL PRIMARY KEY,
+                business_name VARCHAR(255),
+                review_count INTEGER,
+                city VARCHAR(100)
+            )
+        """)
+        with cur.copy(f"COPY {BENCH_SCHEMA}.leads (business_name, review_count, city) FROM STDIN") as copy:
+            for i in range(total_leads):
+                copy.write_row((
+                    synthetic_name(rng, i),
+                    int(rng.paretovariate(1.2) * 10) if rng.random() > 0.03 else None,
+                    rng.choice(CITIES),
+                ))
+        print("🔧 Building trigram indexes...")
+        cur.execute(f"CREATE INDEX ON {BENCH_SCHEMA}.leads USING gin (business_name gin_trgm_ops)")
+        cur.execute(f"CREATE INDEX ON {BENCH_SCHEMA}.leads USING gist (business_name gist_trgm_ops)")
+        cur.execute(f"ANALYZE {BENCH_SCHEMA}.leads")
+    conn.commit()
+
+
+def misspell(rng: random.Random, name: str) -> str:
+    """Swap two adjacent letters somewhere past the first character"""
+    if len(name) < 4:
+        return name
+    i = rng.randrange(1, len(name) - 2)
+    return name[:i] + name[i + 1] + name[i] + name[i + 2:]
+
+
+def sample_queries(conn, samples: int, seed_value: int) -> Dict[str, List[Tuple[int, str]]]:
+    """(expected id, query text) pairs per variant, drawn from random leads"""
+    rng = random.Random(seed_value + 1)
+    rows = conn.execute(
+        "SELECT id, business_name FROM leads ORDER BY random() LIMIT %s", (samples,)
+    ).fetchall()
+    return {
+        'exact': [(i, name) for i, name in rows],
+        'lowercase': [(i, name.lower()) for i, name in rows],
+        'partial': [(i, ' '.join(name.split()[:2])) for i, name in rows],
+        'misspelled': [(i, misspell(rng, name)) for i, name in rows],
+    }
+
+
+def legacy_lookup(cur, name: str) -> Optional[int]:
+    cur.execute(LEGACY_NAME_SQL, (f"%{name}%",))
+    row = cur.fetchone()
+    return row[0] if row else None
+
+
+def knn_lookup(cur, name: str) -> Optional[int]:
+    cur.execute(name_match_sql(), name_match_params(name))
+    row = cur.fetchone()
+    return row[0] if row else None
+
+
+def run(conn, lookup: Callable, queries: List[Tuple[int, str]], names: Dict[int, str]):
+    """Time each lookup; a hit is the expected lead or one with the same name"""
+    timings = []
+    hits = 0
+    with conn.cursor() as cur:
+        for expected_id, name in queries:
+            started = time.perf_counter()
+            found = lookup(cur, name)
+            timings.append((time.perf_counter() - started) * 1000)
+            if found is not None and (found == expected_id or names.get(found) == names[expected_id]):
+                hits += 1
+    return timings, hits
+
+
+def percentile(ordered: List[float], q: float) -> float:
+    return ordered[min(len(ordered) - 1, int(q * (len(ordered) - 1)))]
+
+
+def summarize(label: str, timings: List[float], hits: int, total: int):
+    ordered = sorted(timings)
+    print(f"{label:<24} p50: {percentile(ordered, 0.5):8.2f} ms  "
+          f"p95: {percentile(ordered, 0.95):8.2f} ms  "
+          f"max: {ordered[-1]:8.2f} ms  "
+          f"correct: {hits / total:6.1%}")
+
+
+@app.command()
+def main(
+    dsn: str = typer.Option(..., help='Local Postgres DSN (a bench_names schema is created there)'),
+    leads: int = typer.Option(1_000_000, help='Number of synthetic leads to seed'),
+    samples: int = typer.Option(200, help='Lookups per name variant'),
+    seed_value: int = typer.Option(42, '--seed', help='Random seed for synthetic data'),
+    skip_seed: bool = typer.Option(False, help='Reuse an existing bench_names.leads table'),
+):
+    """Compare latency and match quality before/after the trigram KNN lookup"""
+    with psycopg.connect(dsn, autocommit=True, options=f'-c search_path={BENCH_SCHEMA},public') as conn:
+        if not skip_seed:
+            print(f"🌱 Seeding {leads:,} leads into {BENCH_SCHEMA}.leads...")
+            seed(conn, leads, seed_value)
+
+        variants = sample_queries(conn, samples, seed_value)
+        ids = {i for queries in variants.values() for i, _ in queries}
+        names = dict(conn.execute("SELECT id, business_name FROM leads WHERE id = ANY(%s)", (list(ids),)).fetchall())
+
+        # Warm the buffer cache so both runs see the same storage state
+        run(conn, knn_lookup, variants['exact'][:20], names)
+        run(conn, legacy_lookup, variants['exact'][:20], names)
+
+        results = {}
+        for variant, queries in variants.items():
+            results[variant] = (
+                run(conn, legacy_lookup, queries, names),
+                run(conn, knn_lookup, queries, names),
+            )
+
+    print("=" * 80)
+    print(f"NAME SEARCH BENCHMARK ({leads:,} leads, {samples} lookups per variant)")
+    print("=" * 80)
+    all_knn = []
+    for variant, ((legacy_t, legacy_hits), (knn_t, knn_hits)) in results.items():
+        summarize(f"{variant} / ILIKE", legacy_t, legacy_hits, samples)
+        summarize(f"{variant} / trigram KNN", knn_t, knn_hits, samples)
+        all_knn.extend(knn_t)
+
+    p95 = percentile(sorted(all_knn), 0.95)
+    print(f"Trigram KNN p95 across variants: {p95:.2f} ms")
+    if p95 >= 10:
+        print("⚠️  p95 is above the 10 ms target")
+        raise typer.Exit(1)
+    print("✅ Single-digit millisecond p95")
+
+
+if __name__ == '__main__':
+    app()
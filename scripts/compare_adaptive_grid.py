@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Compare adaptive grid refinement against a full grid run
+
+Replays AdaptiveGridRefiner over a saved full-grid result file (output of
+grid_search_orchestrator.py or grid_search_169_tabs_batched.py), answering
+each "search" from the saved results, and reports how many scrapes each
+setting needs and how closely its filled heat map matches the full grid for
+one business. A live adaptive run (--adaptive-results) can be scored against
+the same full grid.
+
+Usage:
+    python compare_adaptive_grid.py grid_results/grid_169_tabs_batched_<run>.json --business "The Fix Clinic"
+    python compare_adaptive_grid.py full.json --business "Glow Med Spa" --tolerance 0 --tolerance 2 --show
+    python compare_adaptive_grid.py full.json --business "Glow Med Spa" --adaptive-results adaptive.json
+"""
+import json
+import math
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import typer
+
+from adaptive_grid import AdaptiveGridRefiner, compare_rank_grids, rank_band, target_rank
+
+app = typer.Typer(help='Scrape count and heat map fidelity of adaptive grid refinement vs the full grid')
+
+BAND_SYMBOLS = {'green': 'G', 'yellow': 'Y', 'orange': 'O', 'red': 'R', 'missing': '.'}
+
+
+def load_full_grid(path: Path, business: str) -> Tuple[int, Dict[Tuple[int, int], Optional[int]], int]:
+    """
+    (grid dimension, (row, col) -> target rank for every successful point,
+    number of failed points) from a saved full grid run
+    """
+    data = json.loads(path.read_text())
+    results = data.get('grid_results') or data.get('raw_results') or []
+    ranks = {}
+    failed = 0
+    for result in results:
+        point = result.get('search_point') or result.get('point') or {}
+        if 'error' in result or result.get('success') is False or 'grid_row' not in point:
+            failed += 1
+            continue
+        ranks[(point['grid_row'], point['grid_col'])] = target_rank(result.get('results'), business)
+    dimension = data.get('grid_dimension') or int(math.sqrt(len(results)))
+    return dimension, ranks, failed
+
+
+def simulate(
+    dimension: int,
+    full_ranks: Dict[Tuple[int, int], Optional[int]],
+    coarse_size: int,
+    rank_tolerance: int
+) -> Tuple[AdaptiveGridRefiner, Dict[Tuple[int, int], Optional[int]], int]:
+    """Run the refiner with the saved full grid standing in for live searches"""
+    refiner = AdaptiveGridRefiner(dimension, coarse_size, rank_tolerance)
+    ranks = {}
+    scrapes = 0
+    batch = refiner.initial_points()
+    while batch:
+        scrapes += len(batch)
+        for cell in batch:
+            # Points that failed in the full run fail here too (and get refined around)
+            if cell in full_ranks:
+                ranks[cell] = full_ranks[cell]
+        batch = refiner.next_points(ranks)
+    return refiner, ranks, scrapes
+
+
+def full_rank_grid(dimension: int, full_ranks: Dict[Tuple[int, int], Optional[int]]) -> List[List[Optional[int]]]:
+    return [[full_ranks.get((row, col)) for col in range(dimension)] for row in range(dimension)]
+
+
+def band_map(grid: List[List[Optional[int]]]) -> List[str]:
+    return [' '.join(BAND_SYMBOLS[rank_band(rank)] for rank in row) for row in grid]
+
+
+@app.command()
+def main(
+    full_results: Path = typer.Argument(..., exists=True, help='Saved full grid run (JSON)'),
+    business: str = typer.Option(..., help='Target business whose heat map is compared'),
+    coarse_size: int = typer.Option(5, help='Initial coarse grid dimensions'),
+    tolerance: List[int] = typer.Option([0, 1, 2, 3], help='Rank tolerance(s) to evaluate (repeatable)'),
+    adaptive_results: Optional[Path] = typer.Option(None, exists=True, help='Live adaptive run (JSON) to score as well'),
+    show: bool = typer.Option(False, help='Print rank band maps (G<=3, Y<=10, O<=20, R>20, . absent)'),
+):
+    """Report scrapes and heat map fidelity of adaptive refinement vs the full grid"""
+    dimension, full_ranks, failed = load_full_grid(full_results, business)
+    full_points = dimension * dimension
+    reference = full_rank_grid(dimension, full_ranks)
+    unknown = [(row, col) for row in range(dimension) for col in range(dimension) if (row, col) not in full_ranks]
+    found = sum(1 for rank in full_ranks.values() if rank is not None)
+    print(f"Full grid: {dimension}x{dimension} = {full_points} scrapes, {failed} failed "
+          f"(left out of fidelity), '{business}' found at {found} points")
+    if not found:
+        print("⚠️ Target business never appears in the full grid; every setting will look perfect")
+
+    rows = []
+    maps = []
+    for rank_tolerance in tolerance:
+        refiner, ranks, scrapes = simulate(dimension, full_ranks, coarse_size, rank_tolerance)
+        filled = refiner.fill(ranks)
+        rows.append((f"replay tol={rank_tolerance}", scrapes, refiner.rounds, compare_rank_grids(reference, filled, unknown)))
+        maps.append((f"tol={rank_tolerance}", filled))
+
+    if adaptive_results:
+        live = json.loads(adaptive_results.read_text())
+        adaptive = live.get('adaptive')
+        if not adaptive:
+            raise typer.BadParameter(f"{adaptive_results} is not an adaptive run")
+        if len(adaptive['rank_grid']) != dimension:
+            raise typer.BadParameter(f"Adaptive run is {len(adaptive['rank_grid'])}x, full grid is {dimension}x")
+        if adaptive.get('target_business') != business:
+            print(f"⚠️ Adaptive run targeted '{adaptive.get('target_business')}', comparing for '{business}'")
+        rows.append(("live adaptive", adaptive['sampled_points'], adaptive['rounds'],
+                     compare_rank_grids(reference, adaptive['rank_grid'], unknown)))
+        maps.append(("live", adaptive['rank_grid']))
+
+    print("")
+    print(f"{'setting':<18}{'scrapes':>9}{'of full':>9}{'rounds':>8}{'exact':>8}{'band':>8}{'present':>9}{'MAE':>7}{'max':>6}")
+    print(f"{'full grid':<18}{full_points:>9}{'100%':>9}{1:>8}{'100%':>8}{'100%':>8}{'100%':>9}{0:>7}{0:>6}")
+    for label, scrapes, rounds, fidelity in rows:
+        print(
+            f"{label:<18}{scrapes:>9}{scrapes / full_points * 100:>8.0f}%{rounds:>8}"
+            f"{fidelity['exact_match_pct']:>7.1f}%{fidelity['same_band_pct']:>7.1f}%"
+            f"{fidelity['presence_match_pct']:>8.1f}%{fidelity['mean_abs_rank_error']:>7.2f}"
+            f"{fidelity['max_abs_rank_error']:>6}"
+        )
+
+    if show:
+        print("\nfull grid")
+        print('\n'.join(band_map(reference)))
+        for label, grid in maps:
+            print(f"\n{label}")
+            print('\n'.join(band_map(grid)))
+
+
+if __name__ == '__main__':
+    app()
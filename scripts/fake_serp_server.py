@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+Fake SERP Server
+Serves deterministic Google-Maps-style local result pages (same card markup
+the rank checker and grid scripts parse) so the rank-check pipeline can be
+exercised without hitting Google. Results depend only on the query, with
+optional businesses planted at fixed ranks and artificial latency.
+
+Usage:
+    python fake_serp_server.py serve --port 8765 --plant "Glow Med Spa=4" --latency 0.5
+    RANK_CHECK_SERP_URL='http://127.0.0.1:8765/maps/search/{query}' uvicorn funnel_api:app
+
+    # End-to-end check of api/rank_checker.py: warm pool, coalescing, cache
+    python fake_serp_server.py smoke
+"""
+
+import asyncio
+import hashlib
+import html
+import json
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, List, Optional
+from urllib.parse import unquote_plus, urlparse
+
+import typer
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'api'))
+
+app = typer.Typer(help='Local fake SERP server for rank-check testing')
+
+PREFIXES = ['Elite', 'Glow', 'Radiant', 'Pure', 'Luxe', 'Revive', 'Serenity', 'Bella', 'Vitality', 'Ageless',
+            'Renew', 'Bloom', 'Aura', 'Evolve', 'Sculpt', 'Halo', 'Lumina', 'Vivid', 'Nova', 'Opal']
+SUFFIXES = ['Aesthetics', 'Med Spa', 'Medical Spa', 'Skin Clinic', 'Wellness', 'Beauty Bar', 'Laser Center']
+
+RESULTS_PER_QUERY = 20
+
+
+def fake_results(query: str, planted: Dict[str, int]) -> List[Dict]:
+    """Deterministic result list for a query, with planted names moved to their ranks"""
+    rng = random.Random(int(hashlib.sha1(query.lower().encode()).hexdigest()[:8], 16))
+    names = set()
+    while len(names) < RESULTS_PER_QUERY:
+        names.add(f"{rng.choice(PREFIXES)} {rng.choice(SUFFIXES)}")
+    results = [
+        {'name': name, 'rating': round(rng.uniform(3.8, 5.0), 1), 'reviews': rng.randint(5, 900)}
+        for name in sorted(names, key=lambda _: rng.random())
+    ]
+    for name, rank in sorted(planted.items(), key=lambda item: item[1]):
+        results = [r for r in results if r['name'] != name]
+        results.insert(max(0, rank - 1), {'name': name, 'rating': 4.6, 'reviews': 120})
+    return results[:RESULTS_PER_QUERY]
+
+
+def render_page(query: str, results: List[Dict]) -> bytes:
+    cards = ''.join(
+        f'<div class="Nv2PK" role="article" aria-label="{html.escape(r["name"])}, {r["rating"]}">'
+        f'<div class="qBF1Pd fontHeadlineSmall">{html.escape(r["name"])}</div>'
+        f'<span role="img" aria-label="{r["rating"]} stars ({r["reviews"]:,})"></span>'
+        f'</div>'
+        for r in results
+    )
+    return (
+        f'<!doctype html><html><head><title>{html.escape(query)} - Fake Maps</title></head><body>'
+        f'<div role="feed" class="m6QErb" style="height:600px;overflow:auto">{cards}</div>'
+        f'</body></html>'
+    ).encode()
+
+
+class FakeSerpServer:
+    """ThreadingHTTPServer wrapper that counts search hits per query"""
+
+    def __init__(self, port: int = 0, planted: Optional[Dict[str, int]] = None, latency: float = 0.0):
+        self.planted = planted or {}
+        self.latency = latency
+        self.hits: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                path = urlparse(self.path).path
+                if path == '/__stats':
+                    with server._lock:
+                        body = json.dumps({'hits': server.hits}).encode()
+                    return self._send(200, body, 'application/json')
+                if not path.startswith('/maps/search/'):
+                    return self._send(404, b'not found', 'text/plain')
+                query = unquote_plus(path[len('/maps/search/'):].split('/@')[0].strip('/'))
+                with server._lock:
+                    server.hits[query] = server.hits.get(query, 0) + 1
+                if server.latency:
+                    time.sleep(server.latency)
+                self._send(200, render_page(query, fake_results(query, server.planted)), 'text/html; charset=utf-8')
+
+            def _send(self, status: int, body: bytes, content_type: str):
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', port), Handler)
+        self.port = self.httpd.server_address[1]
+
+    @property
+    def serp_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}/maps/search/{{query}}"
+
+    def start(self):
+        threading.Thread(target=self.httpd.serve_forever, name='fake-serp', daemon=True).start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def parse_planted(plant: List[str]) -> Dict[str, int]:
+    planted = {}
+    for item in plant:
+        name, _, rank = item.rpartition('=')
+        if not name or not rank.isdigit():
+            raise typer.BadParameter(f"Expected NAME=RANK, got {item!r}")
+        planted[name] = int(rank)
+    return planted
+
+
+@app.command()
+def serve(
+    port: int = typer.Option(8765, help='Port to listen on'),
+    plant: List[str] = typer.Option([], help='Business to place at a fixed rank, as NAME=RANK (repeatable)'),
+    latency: float = typer.Option(0.0, help='Seconds to delay every search response'),
+):
+    """Run the fake SERP server until interrupted"""
+    server = FakeSerpServer(port, parse_planted(plant), latency)
+    print(f"🌐 Fake SERP server on {server.serp_url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+
+
+@app.command()
+def smoke(
+    concurrency: int = typer.Option(10, help='Concurrent checks for the same (keyword, location)'),
+    latency: float = typer.Option(0.5, help='Fake search latency in seconds'),
+):
+    """Check coalescing, caching and ranking of api/rank_checker.py against the fake server"""
+    from rank_checker import RankChecker, TokenBucket
+
+    server = FakeSerpServer(planted={'Glow Med Spa': 4}, latency=latency).start()
+    checker = RankChecker(limiter=TokenBucket(rate_per_minute=600, burst=5), serp_url=server.serp_url)
+
+    async def run():
+        try:
+            started = time.perf_counter()
+            first = await asyncio.gather(*[
+                checker.check('Glow Med Spa' if i == 0 else f"Other Business {i}", 'med spa', 'Austin, TX')
+                for i in range(concurrency)
+            ])
+            cold = time.perf_counter() - started
+            started = time.perf_counter()
+            second = await checker.check('Glow Med Spa', 'med spa', 'Austin, TX')
+            warm = time.perf_counter() - started
+            await checker.check('Glow Med Spa', 'med spas', 'Dallas, TX')
+            return first, second, cold, warm
+        finally:
+            await checker.close()
+
+    try:
+        first, second, cold, warm = asyncio.run(run())
+    finally:
+        server.stop()
+
+    hits = server.hits
+    print(f"Cold: {concurrency} concurrent checks in {cold:.2f}s; cached check in {warm * 1000:.1f}ms")
+    print(f"SERP hits: {hits}")
+    print(f"Checker stats: {checker.stats()}")
+    failures = []
+    if hits.get('med spa Austin, TX') != 1:
+        failures.append('concurrent checks were not coalesced into one lookup')
+    if first[0]['rank'] != 4 or second['rank'] != 4:
+        failures.append(f"expected rank 4, got {first[0]['rank']} / {second['rank']}")
+    if not second['cached']:
+        failures.append('repeat check was not served from cache')
+    if checker.pool.counters['launches'] != 1:
+        failures.append('browser was relaunched instead of reused')
+    for failure in failures:
+        print(f"❌ {failure}")
+    if failures:
+        raise typer.Exit(1)
+    print("✅ Coalescing, caching and ranking OK")
+
+
+if __name__ == '__main__':
+    app()
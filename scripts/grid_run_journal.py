@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Grid Run Journal - append-only checkpoint of a grid search run
+
+Every finished grid point is appended (and fsynced) to
+grid_results/runs/<run_id>.jsonl as soon as it completes, so a run that dies
+at point 140 keeps the 139 points before it. The first line records the run
+parameters and the full list of grid points; each later line is one attempt
+at one point. The latest attempt per grid_index wins, so resuming a run only
+searches points that are missing or whose last attempt failed.
+
+Usage:
+    journal = GridRunJournal.create(new_run_id(), grid_points, {'niche': 'medical spa'})
+    journal.record(point, result, success=True)
+
+    journal = GridRunJournal.load(run_id)
+    todo = journal.pending()
+"""
+import json
+import os
+import re
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+JOURNAL_DIR = Path(__file__).parent / 'grid_results' / 'runs'
+
+RUN_ID_PATTERN = re.compile(r'^[A-Za-z0-9_-]{1,80}$')
+
+
+def new_run_id() -> str:
+    return f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:6]}"
+
+
+def journal_path(run_id: str, journal_dir: Path = JOURNAL_DIR) -> Path:
+    if not RUN_ID_PATTERN.match(run_id or ''):
+        raise ValueError(f"Invalid run id: {run_id!r}")
+    return Path(journal_dir) / f"{run_id}.jsonl"
+
+
+class GridRunJournal:
+    """Checkpointed results of one grid search run, keyed by grid_index"""
+
+    def __init__(self, path: Path, header: Dict, attempts: Dict[int, List[Dict]]):
+        self.path = path
+        self.header = header
+        self.run_id = header['run_id']
+        self.grid_points: List[Dict] = header['grid_points']
+        self._attempts = attempts  # grid_index -> attempt records, oldest first
+
+    @classmethod
+    def create(
+        cls,
+        run_id: str,
+        grid_points: List[Dict],
+        params: Optional[Dict] = None,
+        journal_dir: Path = JOURNAL_DIR
+    ) -> 'GridRunJournal':
+        """Start a new journal; refuses to overwrite an existing run"""
+        path = journal_path(run_id, journal_dir)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        header = {
+            'type': 'run',
+            'run_id': run_id,
+            'created_at': datetime.now().isoformat(),
+            'params': params or {},
+            'grid_points': grid_points
+        }
+        with open(path, 'x') as f:
+            f.write(json.dumps(header) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        return cls(path, header, {})
+
+    @classmethod
+    def load(cls, run_id: str, journal_dir: Path = JOURNAL_DIR) -> 'GridRunJournal':
+        """Read a journal back; a torn last line from a crash is ignored"""
+        path = journal_path(run_id, journal_dir)
+        if not path.is_file():
+            raise FileNotFoundError(f"No grid run journal for {run_id} ({path})")
+        header = None
+        attempts: Dict[int, List[Dict]] = {}
+        with open(path) as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if record.get('type') == 'run':
+                    header = record
+                elif record.get('type') == 'point':
+                    attempts.setdefault(record['grid_index'], []).append(record)
+        if header is None:
+            raise ValueError(f"Grid run journal {path} has no header")
+        return cls(path, header, attempts)
+
+    @staticmethod
+    def exists(run_id: str, journal_dir: Path = JOURNAL_DIR) -> bool:
+        return journal_path(run_id, journal_dir).is_file()
+
+    @property
+    def params(self) -> Dict:
+        return self.header.get('params') or {}
+
+    def record(self, point: Dict, result: Dict, success: bool):
+        """Append one attempt at a grid point and flush it to disk"""
+        grid_index = point['grid_index']
+        record = {
+            'type': 'point',
+            'grid_index': grid_index,
+            'attempt': len(self._attempts.get(grid_index, [])) + 1,
+            'success': success,
+            'recorded_at': datetime.now().isoformat(),
+            'result': result
+        }
+        line = json.dumps(record) + '\n'
+        with open(self.path, 'a') as f:
+            f.write(line)
+            f.flush()
+            os.fsync(f.fileno())
+        self._attempts.setdefault(grid_index, []).append(record)
+
+    def latest(self, grid_index: int) -> Optional[Dict]:
+        attempts = self._attempts.get(grid_index)
+        return attempts[-1] if attempts else None
+
+    def pending(self, grid_points: Optional[List[Dict]] = None) -> List[Dict]:
+        """Points never attempted or whose latest attempt failed"""
+        pending = []
+        for point in grid_points if grid_points is not None else self.grid_points:
+            latest = self.latest(point['grid_index'])
+            if latest is None or not latest['success']:
+                pending.append(point)
+        return pending
+
+    def results(self, grid_points: Optional[List[Dict]] = None) -> List[Dict]:
+        """Latest result for every attempted point, in grid order"""
+        results = []
+        for point in grid_points if grid_points is not None else self.grid_points:
+            latest = self.latest(point['grid_index'])
+            if latest is not None:
+                results.append(latest['result'])
+        return results
+
+    def summary(self) -> Dict:
+        latest = [self.latest(point['grid_index']) for point in self.grid_points]
+        return {
+            'run_id': self.run_id,
+            'journal': str(self.path),
+            'total_points': len(self.grid_points),
+            'successful': sum(1 for record in latest if record and record['success']),
+            'failed': sum(1 for record in latest if record and not record['success']),
+            'not_attempted': sum(1 for record in latest if record is None),
+            'attempts': sum(len(records) for records in self._attempts.values())
+        }
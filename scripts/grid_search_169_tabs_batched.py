@@ -7,15 +7,26 @@ import asyncio
 import json
 import math
 import time
-from datetime import datetime
 from pathlib import Path
+from typing import Optional
+
+import typer
 from playwright.async_api import async_playwright
 
+from grid_run_journal import GridRunJournal, new_run_id
+from maps_page_pool import MapsPagePool, search_maps_at
+
+app = typer.Typer(help='169-point Ashburn med spa grid search in batches of 50 tabs')
+
 class GridSearch169TabsBatched:
     def __init__(self):
         self.grid_size = 13  # ALWAYS 13x13 = 169
         self.total_searches = 169
+        self.search_query = 'medical spa near me'
         self.batch_size = 50  # Chrome's reliable limit
+        self.pool_contexts = 5  # batch_size pages spread over this many contexts
+        self.retry_rounds = 2  # end-of-run retries of failed points
+        self.retry_backoff = 30  # seconds before the first retry round, doubled each round
         self.results_dir = Path(__file__).parent / 'grid_results'
         self.results_dir.mkdir(exist_ok=True)
         
@@ -50,58 +61,10 @@ class GridSearch169TabsBatched:
     async def search_in_tab(self, page, point):
         """Search from one grid point in a tab with scrolling"""
         try:
-            # Search medical spa from this specific point
-            url = f"https://www.google.com/maps/search/medical+spa+near+me/@{point['lat']},{point['lng']},15z"
-            
-            await page.goto(url, wait_until='domcontentloaded', timeout=30000)
-            await asyncio.sleep(2)  # Initial wait
-            
-            # SCROLL TO LOAD MORE RESULTS
-            feed = await page.query_selector('[role="feed"]')
-            if not feed:
-                feed = await page.query_selector('.m6QErb')
-            
-            if feed:
-                # Do 5 quick scrolls to load more results
-                for _ in range(5):
-                    await feed.evaluate('element => element.scrollTop = element.scrollHeight')
-                await asyncio.sleep(1)  # Wait for new results to load
-            
-            # Extract results
-            results = await page.evaluate('''() => {
-                const businesses = [];
-                const cards = document.querySelectorAll('[role="article"], .Nv2PK');
-                
-                for (let i = 0; i < cards.length; i++) {
-                    const card = cards[i];
-                    const name = card.querySelector('.fontHeadlineSmall, .qBF1Pd')?.textContent || 
-                               card.getAttribute('aria-label')?.split(',')[0] || '';
-                    
-                    if (name) {
-                        // Get rating
-                        const ratingEl = card.querySelector('[role="img"][aria-label*="star"]');
-                        let rating = 0;
-                        let reviews = 0;
-                        
-                        if (ratingEl) {
-                            const ariaLabel = ratingEl.getAttribute('aria-label') || '';
-                            const ratingMatch = ariaLabel.match(/([0-9.]+)/);
-                            const reviewMatch = ariaLabel.match(/\\(([0-9,]+)\\)/);
-                            
-                            if (ratingMatch) rating = parseFloat(ratingMatch[1]);
-                            if (reviewMatch) reviews = parseInt(reviewMatch[1].replace(/,/g, ''));
-                        }
-                        
-                        businesses.push({
-                            rank: i + 1,
-                            name: name,
-                            rating: rating,
-                            reviews: reviews
-                        });
-                    }
-                }
-                return businesses;
-            }''')
+            # Search medical spa from this specific point, scrolling the feed
+            # for more results; a page without results or Maps' no-results
+            # state (captcha, consent wall) raises and counts as failed
+            results = await search_maps_at(page, self.search_query, point, max_results=None)
             
             return {
                 'point': point,
@@ -117,48 +80,67 @@ class GridSearch169TabsBatched:
                 'success': False
             }
     
-    async def process_batch(self, browser, grid_points_batch, batch_num, total_batches):
-        """Process one batch of up to 50 tabs"""
+    async def search_in_pooled_tab(self, page_pool, point, journal):
+        """Search from one grid point on a tab leased from the pool and checkpoint it"""
+        try:
+            async with page_pool.page() as page:
+                result = await self.search_in_tab(page, point)
+                if not result['success']:
+                    # Don't hand a tab that just failed to the next point
+                    page_pool.discard(page)
+        except Exception as e:
+            # Couldn't even open a tab; record it so a retry/resume picks it up
+            result = {'point': point, 'error': str(e)[:50], 'results': [], 'success': False}
+        journal.record(point, result, result['success'])
+        return result
+    
+    async def process_batch(self, page_pool, journal, grid_points_batch, batch_num, total_batches):
+        """Process one batch of up to 50 tabs, reusing the pool's warm tabs"""
         print(f"\n📦 Batch {batch_num}/{total_batches}: Processing {len(grid_points_batch)} points...")
-        
-        context = await browser.new_context(
-            viewport={'width': 1280, 'height': 720}
-        )
-        
-        # Open tabs for this batch
-        pages = []
-        print(f"  📑 Opening {len(grid_points_batch)} tabs...")
-        for i in range(len(grid_points_batch)):
-            page = await context.new_page()
-            pages.append(page)
-        
         print(f"  ⚡ Executing searches...")
         
         # Create tasks for this batch
         tasks = []
-        for page, point in zip(pages, grid_points_batch):
-            task = self.search_in_tab(page, point)
+        for point in grid_points_batch:
+            task = self.search_in_pooled_tab(page_pool, point, journal)
             tasks.append(task)
         
         # Execute this batch simultaneously
         batch_results = await asyncio.gather(*tasks)
         
-        # Clean up this batch
-        print(f"  🧹 Cleaning up batch {batch_num}...")
-        for page in pages:
-            try:
-                await page.close()
-            except:
-                pass
-        await context.close()
-        
         successful = sum(1 for r in batch_results if r.get('success', False))
         print(f"  ✅ Batch {batch_num} complete: {successful}/{len(batch_results)} successful")
         
         return batch_results
     
-    async def run_169_tabs_batched(self):
-        """Run 169 searches in batches of 50 tabs"""
+    async def process_in_batches(self, page_pool, journal, points, label=''):
+        """Search points in consecutive batches of up to batch_size tabs"""
+        num_batches = math.ceil(len(points) / self.batch_size)
+        for batch_num in range(num_batches):
+            start_idx = batch_num * self.batch_size
+            batch_points = points[start_idx:start_idx + self.batch_size]
+            
+            await self.process_batch(
+                page_pool, 
+                journal, 
+                batch_points, 
+                f"{label}{batch_num + 1}", 
+                num_batches
+            )
+            
+            # Small delay between batches
+            if batch_num < num_batches - 1:
+                print(f"  💤 Pausing before next batch...")
+                await asyncio.sleep(2)
+    
+    async def run_169_tabs_batched(self, run_id: Optional[str] = None):
+        """
+        Run 169 searches in batches of 50 tabs
+        
+        Each point is checkpointed to a GridRunJournal as it finishes; passing
+        the run_id of an existing journal only searches its missing/failed
+        points. Failed points are retried at the end with backoff.
+        """
         start_time = time.time()
         
         print("=" * 60)
@@ -170,17 +152,28 @@ class GridSearch169TabsBatched:
         print("📦 Batch size: 50 tabs max")
         print("📡 Radius: 5 miles")
         
+        if run_id and GridRunJournal.exists(run_id):
+            journal = GridRunJournal.load(run_id)
+            grid_points = journal.grid_points
+            print(f"♻️ Resuming run {run_id}")
+        else:
+            # Generate all 169 points
+            grid_points = self.generate_grid_points()
+            print(f"✅ Generated {len(grid_points)} grid points")
+            journal = GridRunJournal.create(run_id or new_run_id(), grid_points, {
+                'location': 'Ashburn, VA',
+                'niche': 'medical spa',
+                'method': 'tabs_batched_50'
+            })
+        print(f"📒 Checkpointing to {journal.path}")
+        
         # Calculate batches
-        num_batches = math.ceil(self.total_searches / self.batch_size)
+        pending = journal.pending()
+        num_batches = math.ceil(len(pending) / self.batch_size)
+        print(f"🔍 Points to search: {len(pending)}/{len(grid_points)}")
         print(f"🔢 Total batches: {num_batches}")
         print("-" * 60)
         
-        # Generate all 169 points
-        grid_points = self.generate_grid_points()
-        print(f"✅ Generated {len(grid_points)} grid points")
-        
-        all_results = []
-        
         async with async_playwright() as p:
             print(f"🌐 Launching browser...")
             
@@ -200,25 +193,29 @@ class GridSearch169TabsBatched:
                 ]
             )
             
+            # One set of tabs for the whole run instead of a new context per batch
+            page_pool = MapsPagePool(
+                contexts=self.pool_contexts,
+                pages_per_context=math.ceil(self.batch_size / self.pool_contexts),
+                browser=browser
+            )
+            
             # Process in batches
-            for batch_num in range(num_batches):
-                start_idx = batch_num * self.batch_size
-                end_idx = min(start_idx + self.batch_size, self.total_searches)
-                batch_points = grid_points[start_idx:end_idx]
-                
-                batch_results = await self.process_batch(
-                    browser, 
-                    batch_points, 
-                    batch_num + 1, 
-                    num_batches
-                )
-                
-                all_results.extend(batch_results)
-                
-                # Small delay between batches
-                if batch_num < num_batches - 1:
-                    print(f"  💤 Pausing before next batch...")
-                    await asyncio.sleep(2)
+            await self.process_in_batches(page_pool, journal, pending)
+            
+            # Retry failed points, backing off between rounds
+            for round_num in range(1, self.retry_rounds + 1):
+                failed = journal.pending()
+                if not failed:
+                    break
+                delay = self.retry_backoff * 2 ** (round_num - 1)
+                print(f"\n🔁 Retrying {len(failed)} failed points in {delay}s (round {round_num}/{self.retry_rounds})")
+                await asyncio.sleep(delay)
+                await self.process_in_batches(page_pool, journal, failed, label=f"retry {round_num}.")
+            
+            pool_stats = page_pool.stats()
+            await page_pool.close()
+            print(f"📑 Tabs opened: {pool_stats['pages_created']} for {pool_stats['leases']} searches")
             
             # Close browser
             await browser.close()
@@ -226,6 +223,7 @@ class GridSearch169TabsBatched:
         
         # Calculate statistics
         elapsed = time.time() - start_time
+        all_results = journal.results()
         successful = sum(1 for r in all_results if r.get('success', False))
         
         print("-" * 60)
@@ -301,8 +299,7 @@ class GridSearch169TabsBatched:
             print(f"   Coverage: {biz['coverage']:.1f}% | Avg: #{biz['avg_rank']:.1f} | ⭐ {biz['rating']}")
         
         # Save results
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        output_file = self.results_dir / f"grid_169_tabs_batched_{timestamp}.json"
+        output_file = self.results_dir / f"grid_169_tabs_batched_{journal.run_id}.json"
         
         final_results = {
             'search_params': {
@@ -318,7 +315,9 @@ class GridSearch169TabsBatched:
                 'successful': successful,
                 'failed': 169 - successful,
                 'batch_size': self.batch_size,
-                'num_batches': num_batches
+                'num_batches': num_batches,
+                'page_pool': pool_stats,
+                'run': journal.summary()
             },
             'the_fix_clinic': the_fix,
             'top_20_businesses': business_stats[:20],
@@ -330,24 +329,36 @@ class GridSearch169TabsBatched:
         
         print(f"\n💾 Results saved: {output_file.name}")
         print(f"📊 Unique businesses found: {len(business_stats)}")
+        if successful < len(grid_points):
+            print(f"♻️ {len(grid_points) - successful} points failed; rerun with --resume {journal.run_id}")
         
         return final_results
 
 
-async def main():
+async def main(run_id: Optional[str] = None):
     searcher = GridSearch169TabsBatched()
-    await searcher.run_169_tabs_batched()
+    await searcher.run_169_tabs_batched(run_id)
 
 
-if __name__ == "__main__":
+@app.command()
+def run(
+    resume: Optional[str] = typer.Option(None, help='Run id of a checkpointed run to finish (reruns only missing/failed points)'),
+    yes: bool = typer.Option(False, '--yes', '-y', help='Skip the confirmation prompt'),
+):
+    """Run (or resume) the batched 169-point grid search"""
     print("BATCHED TABS VERSION - RELIABLE 50 TAB BATCHES")
     print("This will run 169 searches in 4 batches (50, 50, 50, 19)")
     print("More reliable than 169 tabs at once")
     print("Estimated time: 60-90 seconds")
     print("")
     
-    response = input("Start batched search? (y/n): ")
-    if response.lower() == 'y':
-        asyncio.run(main())
-    else:
-        print("Cancelled.")
\ No newline at end of file
+    if not yes:
+        response = input("Start batched search? (y/n): ")
+        if response.lower() != 'y':
+            print("Cancelled.")
+            return
+    asyncio.run(main(resume))
+
+
+if __name__ == "__main__":
+    app()
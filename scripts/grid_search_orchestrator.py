@@ -8,21 +8,75 @@ import json
 import math
 import os
 import sys
+import time
 from datetime import datetime
 from pathlib import Path
-from typing import List, Dict, Tuple
+from typing import Callable, List, Dict, Optional, Tuple
 import aiohttp
+import typer
 
 # Add parent directories to path for imports
 sys.path.insert(0, str(Path(__file__).parent.parent.parent / 'production'))
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from production.google_maps_max_extract import scrape_google_maps_max
+from maps_page_pool import MapsPagePool, search_maps_at
+from grid_run_journal import GridRunJournal, new_run_id
+from adaptive_grid import AdaptiveGridRefiner, target_rank
+from heat_map_interpolation import interpolate_at, interpolate_rank_surface
+
+class AdaptiveConcurrency:
+    """
+    AIMD concurrency limit for grid searches: the limit grows by one after
+    a full window of consecutive successes and halves on an error/timeout,
+    staying within [minimum, maximum]
+    """
+
+    def __init__(self, initial: int, minimum: int = 1, maximum: int = 10):
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.limit = min(self.maximum, max(self.minimum, initial))
+        self.in_flight = 0
+        self.peak = 0
+        self.increases = 0
+        self.decreases = 0
+        self._streak = 0
+        self._cond = asyncio.Condition()
+
+    async def acquire(self):
+        """Wait until fewer than ``limit`` searches are in flight"""
+        async with self._cond:
+            await self._cond.wait_for(lambda: self.in_flight < self.limit)
+            self.in_flight += 1
+            self.peak = max(self.peak, self.in_flight)
+
+    async def release(self, success: bool):
+        async with self._cond:
+            self.in_flight -= 1
+            if success:
+                self._streak += 1
+                if self._streak >= self.limit and self.limit < self.maximum:
+                    self.limit += 1
+                    self.increases += 1
+                    self._streak = 0
+            else:
+                self._streak = 0
+                reduced = max(self.minimum, self.limit // 2)
+                if reduced < self.limit:
+                    self.limit = reduced
+                    self.decreases += 1
+            self._cond.notify_all()
 
 class GridSearchOrchestrator:
-    def __init__(self, api_key: str = None):
-        """Initialize grid search with optional Google Maps API key"""
+    def __init__(self, api_key: str = None, page_pool: Optional[MapsPagePool] = None):
+        """
+        Initialize grid search with optional Google Maps API key
+        
+        With a page_pool, each grid point is searched on a leased warm page
+        instead of a fresh scrape_google_maps_max browser session
+        """
         self.api_key = api_key or os.getenv('NEXT_PUBLIC_GOOGLE_MAPS_API_KEY')
+        self.page_pool = page_pool
         
     def generate_grid_points(
         self, 
@@ -174,8 +228,13 @@ class GridSearchOrchestrator:
             # Modify the search to use coordinates
             location = f"@{point['lat']},{point['lng']},15z"
             
-            # Use existing scraper with coordinate-based location
-            results = await scrape_google_maps_max(niche, location)
+            if self.page_pool is not None:
+                # Search on a warm pooled page; a failure recycles that page
+                async with self.page_pool.page() as page:
+                    results = {'results': await search_maps_at(page, niche, point, max_results=max_results)}
+            else:
+                # Use existing scraper with coordinate-based location
+                results = await scrape_google_maps_max(niche, location)
             
             # Add grid point info to results
             results['search_point'] = point
@@ -205,11 +264,29 @@ class GridSearchOrchestrator:
         radius_miles: float = 5,
         grid_size: int = 13,
         batch_size: int = 10,
-        use_city_bounds: bool = True
+        use_city_bounds: bool = True,
+        min_concurrency: int = 1,
+        initial_concurrency: Optional[int] = None,
+        point_timeout: float = 120,
+        error_backoff: float = 2,
+        run_id: Optional[str] = None,
+        retry_rounds: int = 2,
+        retry_backoff: float = 30
     ) -> Dict:
         """
         Perform grid search across multiple points
         
+        Points run through a sliding window: a new search starts as soon as
+        one finishes, with the number in flight adapted between
+        min_concurrency and batch_size (up after sustained success, halved
+        on errors/timeouts)
+        
+        Every finished point is checkpointed to a GridRunJournal. Passing the
+        run_id of an existing journal resumes that run: its grid is reused
+        and only missing or failed points are searched again. Points still
+        failing at the end are retried for up to retry_rounds rounds, waiting
+        retry_backoff seconds before the first and doubling each round.
+        
         Args:
             niche: Search term (e.g., "medical spa")
             city: City name (required if use_city_bounds=True)
@@ -218,14 +295,116 @@ class GridSearchOrchestrator:
             center_lng: Center longitude (required if use_city_bounds=False)
             radius_miles: Radius in miles (if not using city bounds)
             grid_size: Grid dimensions (if not using city bounds)
-            batch_size: Number of concurrent searches
+            batch_size: Maximum number of concurrent searches
             use_city_bounds: Whether to use city viewport or radius
+            min_concurrency: Floor the concurrency backs off to
+            initial_concurrency: Starting concurrency (default: half of batch_size)
+            point_timeout: Seconds before a single point's search counts as failed
+            error_backoff: Seconds a failed search keeps its slot before releasing it
+            run_id: Journal to resume, or the id for a new run (default: generated)
+            retry_rounds: End-of-run retry rounds for failed points
+            retry_backoff: Seconds before the first retry round
         
         Returns:
             Dictionary with all grid search results
         """
         print(f"🗺️ Starting grid search for '{niche}'")
         
+        journal = await self.open_run_journal(
+            niche, run_id, city, state, center_lat, center_lng, radius_miles, grid_size, use_city_bounds
+        )
+        grid_points = journal.grid_points
+        search_center = journal.params.get('center')
+        location_name = journal.params.get('location')
+        
+        # Perform searches with a sliding window of adaptive concurrency
+        pending = journal.pending(grid_points)
+        concurrency = AdaptiveConcurrency(
+            initial_concurrency or max(1, batch_size // 2),
+            minimum=min_concurrency,
+            maximum=batch_size
+        )
+        _, execution = await self.run_grid_points(
+            pending, niche, concurrency, point_timeout, error_backoff, on_result=journal.record
+        )
+        
+        # Retry points that failed, backing off between rounds
+        retried = 0
+        for round_num in range(1, retry_rounds + 1):
+            failed = journal.pending(grid_points)
+            if not failed:
+                break
+            delay = retry_backoff * 2 ** (round_num - 1)
+            print(f"🔁 Retrying {len(failed)} failed points in {delay:.0f}s (round {round_num}/{retry_rounds})")
+            await asyncio.sleep(delay)
+            retried += len(failed)
+            await self.run_grid_points(
+                failed,
+                niche,
+                AdaptiveConcurrency(max(min_concurrency, concurrency.limit // 2), min_concurrency, batch_size),
+                point_timeout,
+                error_backoff,
+                on_result=journal.record
+            )
+        
+        summary = journal.summary()
+        execution.update({
+            'run_id': journal.run_id,
+            'journal': summary['journal'],
+            'searched_points': len(pending),
+            'resumed_points': len(grid_points) - len(pending),
+            'retried_points': retried,
+            'successful': summary['successful'],
+            'failed': summary['failed'] + summary['not_attempted']
+        })
+        all_results = journal.results(grid_points)
+        
+        print(f"⏱️ {execution['successful']}/{len(grid_points)} points OK; searched {len(pending)} in "
+              f"{execution['duration_seconds']:.1f}s ({execution['points_per_second']:.2f} points/sec, "
+              f"peak concurrency {execution['peak_concurrency']})")
+        
+        # Aggregate results
+        aggregated = self.aggregate_grid_results(all_results)
+        
+        return {
+            'search_term': niche,
+            'location': location_name,
+            'center': search_center,
+            'grid_points': len(grid_points),
+            'grid_dimension': int(math.sqrt(len(grid_points))),
+            'timestamp': datetime.now().isoformat(),
+            'grid_results': all_results,
+            'aggregated': aggregated,
+            'execution': execution,
+            'page_pool': self.page_pool.stats() if self.page_pool is not None else None
+        }
+    
+    async def open_run_journal(
+        self,
+        niche: str,
+        run_id: Optional[str] = None,
+        city: str = None,
+        state: str = None,
+        center_lat: float = None,
+        center_lng: float = None,
+        radius_miles: float = 5,
+        grid_size: int = 13,
+        use_city_bounds: bool = True,
+        params: Optional[Dict] = None
+    ) -> GridRunJournal:
+        """
+        Load the journal of run_id to resume it, or generate the grid and
+        start a new journal (extra params are stored in its header)
+        """
+        if run_id and GridRunJournal.exists(run_id):
+            # Resume: same grid and location as the original run
+            journal = GridRunJournal.load(run_id)
+            if journal.params.get('niche') != niche:
+                raise ValueError(f"Run {run_id} searched '{journal.params.get('niche')}', not '{niche}'")
+            done = len(journal.grid_points) - len(journal.pending())
+            print(f"♻️ Resuming run {run_id}: {done}/{len(journal.grid_points)} points already done")
+            return journal
+        
         # Generate grid points
         if use_city_bounds and city and state:
             print(f"📍 Getting bounds for {city}, {state}...")
@@ -242,40 +421,195 @@ class GridSearchOrchestrator:
             location_name = f"{center_lat}, {center_lng}"
         
         print(f"📊 Generated {len(grid_points)} grid points")
+        journal = GridRunJournal.create(run_id or new_run_id(), grid_points, {
+            'niche': niche,
+            'location': location_name,
+            'center': search_center,
+            **(params or {})
+        })
+        print(f"📒 Checkpointing run {journal.run_id} to {journal.path}")
+        return journal
+    
+    async def perform_adaptive_grid_search(
+        self,
+        niche: str,
+        target_business: str,
+        city: str = None,
+        state: str = None,
+        center_lat: float = None,
+        center_lng: float = None,
+        radius_miles: float = 5,
+        grid_size: int = 13,
+        use_city_bounds: bool = True,
+        coarse_size: int = 5,
+        rank_tolerance: int = 1,
+        batch_size: int = 10,
+        min_concurrency: int = 1,
+        point_timeout: float = 120,
+        error_backoff: float = 2,
+        run_id: Optional[str] = None
+    ) -> Dict:
+        """
+        Grid search that samples coarse first and refines where it matters
         
-        # Perform searches in batches
-        all_results = []
-        total_points = len(grid_points)
+        Searches a coarse_size x coarse_size subset of the full grid, then
+        repeatedly subdivides the cells whose corners disagree on
+        target_business's rank (different rank band, or ranks further apart
+        than rank_tolerance) until every cell is flat or can't be split.
+        The unsampled points are filled from their cell's corners, giving a
+        full-resolution rank grid from a fraction of the searches.
         
-        for i in range(0, total_points, batch_size):
-            batch = grid_points[i:i + batch_size]
-            batch_num = i // batch_size + 1
-            total_batches = (total_points + batch_size - 1) // batch_size
-            
-            print(f"🔍 Processing batch {batch_num}/{total_batches} ({len(batch)} points)...")
-            
-            # Run batch searches concurrently
-            tasks = [self.search_from_point(point, niche) for point in batch]
-            batch_results = await asyncio.gather(*tasks)
-            
-            all_results.extend(batch_results)
-            
-            # Small delay between batches to avoid rate limiting
-            if i + batch_size < total_points:
-                await asyncio.sleep(2)
+        Args:
+            niche: Search term (e.g., "medical spa")
+            target_business: Business whose rank drives the refinement
+            coarse_size: Dimensions of the initial coarse grid
+            rank_tolerance: Max corner rank spread for a cell to count as flat
+            (other arguments as for perform_grid_search)
         
-        # Aggregate results
-        aggregated = self.aggregate_grid_results(all_results)
+        Returns:
+            perform_grid_search-style results for the sampled points, plus an
+            'adaptive' block with the filled rank grid and sampling stats
+        """
+        print(f"🗺️ Starting adaptive grid search for '{niche}' (target: {target_business})")
+        
+        journal = await self.open_run_journal(
+            niche, run_id, city, state, center_lat, center_lng, radius_miles, grid_size, use_city_bounds,
+            params={'mode': 'adaptive', 'target_business': target_business}
+        )
+        grid_points = journal.grid_points
+        dimension = int(math.sqrt(len(grid_points)))
+        by_cell = {(point['grid_row'], point['grid_col']): point for point in grid_points}
+        
+        refiner = AdaptiveGridRefiner(dimension, coarse_size, rank_tolerance)
+        concurrency = AdaptiveConcurrency(max(1, batch_size // 2), minimum=min_concurrency, maximum=batch_size)
+        ranks: Dict[Tuple[int, int], Optional[int]] = {}
+        sampled: Dict[int, Dict] = {}  # grid_index -> point; retried corners are asked for again
+        searched = 0
+        started = time.perf_counter()
+        
+        batch = refiner.initial_points()
+        while batch:
+            points = [by_cell[cell] for cell in batch]
+            todo = journal.pending(points)
+            print(f"🔎 Refinement round {refiner.rounds}: {len(points)} points "
+                  f"({len(points) - len(todo)} already checkpointed)")
+            await self.run_grid_points(
+                todo, niche, concurrency, point_timeout, error_backoff, on_result=journal.record
+            )
+            searched += len(todo)
+            sampled.update((point['grid_index'], point) for point in points)
+            for cell, point in zip(batch, points):
+                latest = journal.latest(point['grid_index'])
+                # Failed points stay out of ranks, so the cells around them get refined
+                if latest and latest['success']:
+                    ranks[cell] = target_rank(latest['result'].get('results'), target_business)
+            batch = refiner.next_points(ranks)
+        
+        elapsed = time.perf_counter() - started
+        sampled_points = [sampled[index] for index in sorted(sampled)]
+        all_results = journal.results(sampled_points)
+        successful = sum(1 for result in all_results if 'error' not in result)
+        print(f"⏱️ Sampled {len(sampled)}/{len(grid_points)} points in {refiner.rounds} rounds "
+              f"({len(sampled) / len(grid_points) * 100:.0f}% of the full grid, {elapsed:.1f}s)")
         
         return {
             'search_term': niche,
-            'location': location_name,
-            'center': search_center,
-            'grid_points': len(grid_points),
-            'grid_dimension': int(math.sqrt(len(grid_points))),
+            'location': journal.params.get('location'),
+            'center': journal.params.get('center'),
+            'grid_points': len(all_results),
+            'grid_dimension': dimension,
             'timestamp': datetime.now().isoformat(),
             'grid_results': all_results,
-            'aggregated': aggregated
+            'aggregated': self.aggregate_grid_results(all_results),
+            'adaptive': {
+                'target_business': target_business,
+                'coarse_size': coarse_size,
+                'rank_tolerance': rank_tolerance,
+                'rounds': refiner.rounds,
+                'sampled_points': len(sampled),
+                'full_grid_points': len(grid_points),
+                'rank_grid': refiner.fill(ranks),
+                'sampled_cells': sorted([point['grid_row'], point['grid_col']] for point in sampled_points)
+            },
+            'execution': {
+                'run_id': journal.run_id,
+                'journal': str(journal.path),
+                'searched_points': searched,
+                'duration_seconds': round(elapsed, 2),
+                'points_per_second': round(searched / elapsed, 3) if elapsed > 0 and searched else 0.0,
+                'successful': successful,
+                'failed': len(all_results) - successful,
+                'peak_concurrency': concurrency.peak
+            },
+            'page_pool': self.page_pool.stats() if self.page_pool is not None else None
+        }
+    
+    async def run_grid_points(
+        self,
+        grid_points: List[Dict],
+        niche: str,
+        concurrency: AdaptiveConcurrency,
+        point_timeout: float = 120,
+        error_backoff: float = 2,
+        on_result: Optional[Callable[[Dict, Dict, bool], None]] = None
+    ) -> Tuple[List[Dict], Dict]:
+        """
+        Search every point, keeping up to ``concurrency.limit`` in flight
+        
+        on_result(point, result, success) is called as each point finishes
+        (e.g. GridRunJournal.record to checkpoint it)
+        
+        Returns:
+            (results in grid_index order, execution / throughput stats)
+        """
+        total_points = len(grid_points)
+        results: Dict[int, Dict] = {}
+        timeouts = 0
+        started = time.perf_counter()
+        
+        async def run_point(point: Dict):
+            nonlocal timeouts
+            try:
+                result = await asyncio.wait_for(self.search_from_point(point, niche), point_timeout)
+            except asyncio.TimeoutError:
+                timeouts += 1
+                result = {'search_point': point, 'error': f'timeout after {point_timeout:.0f}s', 'results': []}
+            success = 'error' not in result
+            if not success and error_backoff:
+                # Hold the slot briefly so a struggling target isn't hit again immediately
+                await asyncio.sleep(error_backoff)
+            results[point['grid_index']] = result
+            try:
+                if on_result is not None:
+                    on_result(point, result, success)
+            finally:
+                await concurrency.release(success)
+            
+            done = len(results)
+            if done % 10 == 0 or done == total_points:
+                elapsed = time.perf_counter() - started
+                print(f"🔍 {done}/{total_points} points ({done / elapsed:.2f} points/sec, "
+                      f"concurrency {concurrency.limit})")
+        
+        tasks = []
+        for point in grid_points:
+            await concurrency.acquire()
+            tasks.append(asyncio.create_task(run_point(point)))
+        await asyncio.gather(*tasks)
+        
+        elapsed = time.perf_counter() - started
+        ordered = [results[point['grid_index']] for point in grid_points]
+        successful = sum(1 for r in ordered if 'error' not in r)
+        return ordered, {
+            'duration_seconds': round(elapsed, 2),
+            'points_per_second': round(total_points / elapsed, 3) if elapsed > 0 and total_points else 0.0,
+            'successful': successful,
+            'failed': total_points - successful,
+            'timeouts': timeouts,
+            'peak_concurrency': concurrency.peak,
+            'final_concurrency': concurrency.limit,
+            'concurrency_increases': concurrency.increases,
+            'concurrency_decreases': concurrency.decreases,
         }
     
     def aggregate_grid_results(self, grid_results: List[Dict]) -> Dict:
@@ -364,32 +698,104 @@ class GridSearchOrchestrator:
             }
         }
     
-    def generate_heat_map_data(self, grid_results: Dict, business_name: str = None) -> Dict:
+    def generate_heat_map_data(
+        self,
+        grid_results: Dict,
+        business_name: str = None,
+        interpolate: bool = True,
+        resolution: Optional[int] = None
+    ) -> Dict:
         """
         Generate heat map data for a specific business or top competitors
         
         Args:
             grid_results: Full grid search results
             business_name: Optional specific business to generate heat map for
+            interpolate: Fill grid cells that weren't searched (sparse or
+                adaptive runs) from the surrounding samples
+            resolution: Also return a dense interpolated 'surface' with this
+                many cells along its longer side
         
         Returns:
             Heat map data ready for visualization
         """
+        # Points searched successfully, i.e. where a missing ranking means "not in results"
+        searched_points = [
+            result['search_point'] for result in grid_results['grid_results']
+            if 'error' not in result and 'search_point' in result
+        ]
+        options = {
+            'searched_points': searched_points if interpolate or resolution else None,
+            # Every point of the run, failed ones included, locates the lattice
+            'lattice_points': [result['search_point'] for result in grid_results['grid_results'] if 'search_point' in result],
+            'interpolate': interpolate,
+            'resolution': resolution
+        }
         if business_name:
             # Find specific business
             for business_stat in grid_results['aggregated']['top_businesses']:
                 if business_name.lower() in business_stat['business']['name'].lower():
-                    return self._format_heat_map(business_stat, grid_results['grid_dimension'])
+                    return self._format_heat_map(business_stat, grid_results['grid_dimension'], **options)
             return None
         else:
             # Return heat maps for top 3 businesses
             heat_maps = []
             for business_stat in grid_results['aggregated']['top_businesses'][:3]:
-                heat_maps.append(self._format_heat_map(business_stat, grid_results['grid_dimension']))
+                heat_maps.append(self._format_heat_map(business_stat, grid_results['grid_dimension'], **options))
             return heat_maps
     
-    def _format_heat_map(self, business_stat: Dict, grid_size: int) -> Dict:
-        """Format business rankings as heat map data"""
+    @staticmethod
+    def _lattice_axes(points: List[Dict], grid_size: int) -> Optional[Tuple[List[float], List[float]]]:
+        """
+        Latitude of every grid row and longitude of every grid column, fitted
+        from any points of the grid (lat is linear in row, lng in col), so
+        unsearched cells get their own coordinates even when a whole edge row
+        or column failed; None if the points span a single row or column
+        """
+        def fit(pairs: List[Tuple[int, float]]) -> Optional[List[float]]:
+            if not pairs:
+                return None
+            mean_i = sum(i for i, _ in pairs) / len(pairs)
+            mean_v = sum(v for _, v in pairs) / len(pairs)
+            spread = sum((i - mean_i) ** 2 for i, _ in pairs)
+            if spread == 0:
+                return None
+            slope = sum((i - mean_i) * (v - mean_v) for i, v in pairs) / spread
+            return [round(mean_v + slope * (i - mean_i), 6) for i in range(grid_size)]
+
+        lats = fit([(point['grid_row'], point['lat']) for point in points])
+        lngs = fit([(point['grid_col'], point['lng']) for point in points])
+        if lats is None or lngs is None:
+            return None
+        return lats, lngs
+
+    @staticmethod
+    def _rank_color(rank: float) -> str:
+        if rank <= 3:
+            return 'green'
+        elif rank <= 10:
+            return 'yellow'
+        elif rank <= 20:
+            return 'orange'
+        return 'red'
+    
+    def _format_heat_map(
+        self,
+        business_stat: Dict,
+        grid_size: int,
+        searched_points: Optional[List[Dict]] = None,
+        interpolate: bool = False,
+        resolution: Optional[int] = None,
+        lattice_points: Optional[List[Dict]] = None
+    ) -> Dict:
+        """
+        Format business rankings as heat map data
+        
+        With searched_points, cells that were never searched are filled by
+        IDW interpolation at their own coordinates (marked 'interpolated',
+        located from lattice_points) and, if resolution is set, a dense rank
+        surface is added; searched cells keep their real value
+        """
         # Initialize grid with nulls (not searched)
         grid = [[None for _ in range(grid_size)] for _ in range(grid_size)]
         
@@ -399,24 +805,44 @@ class GridSearchOrchestrator:
             col = ranking['grid_col']
             rank = ranking['rank']
             
-            # Color coding
-            if rank <= 3:
-                color = 'green'
-            elif rank <= 10:
-                color = 'yellow'
-            elif rank <= 20:
-                color = 'orange'
-            else:
-                color = 'red'
-            
             grid[row][col] = {
                 'rank': rank,
-                'color': color,
+                'color': self._rank_color(rank),
                 'lat': ranking['lat'],
                 'lng': ranking['lng']
             }
         
-        return {
+        surface = None
+        if searched_points:
+            searched = {(point['grid_row'], point['grid_col']) for point in searched_points}
+            axes = self._lattice_axes(lattice_points or searched_points, grid_size)
+            if interpolate and axes and len(searched) < grid_size * grid_size:
+                lats, lngs = axes
+                cells = [
+                    (row, col) for row in range(grid_size) for col in range(grid_size)
+                    if (row, col) not in searched
+                ]
+                ranks = interpolate_at(
+                    business_stat['grid_rankings'],
+                    [{'lat': lats[row], 'lng': lngs[col]} for row, col in cells],
+                    searched_points
+                )
+                for (row, col), rank in zip(cells, ranks):
+                    if rank is None:
+                        continue
+                    grid[row][col] = {
+                        'rank': round(rank),
+                        'color': self._rank_color(rank),
+                        'lat': lats[row],
+                        'lng': lngs[col],
+                        'interpolated': True
+                    }
+            if resolution:
+                surface = interpolate_rank_surface(
+                    business_stat['grid_rankings'], searched_points, resolution=resolution
+                )
+        
+        heat_map = {
             'business': business_stat['business'],
             'stats': {
                 'coverage': f"{business_stat['coverage_percentage']:.1f}%",
@@ -427,26 +853,59 @@ class GridSearchOrchestrator:
             },
             'grid': grid
         }
+        if surface is not None:
+            heat_map['surface'] = surface
+        return heat_map
+
+
+app = typer.Typer(help='Grid search rankings from many points across a city')
 
 
-async def main():
+async def main(
+    niche: str = "medical spa",
+    city: str = "Ashburn",
+    state: str = "VA",
+    batch_size: int = 10,
+    run_id: Optional[str] = None,
+    adaptive_target: Optional[str] = None
+):
     """Example usage"""
-    orchestrator = GridSearchOrchestrator()
+    # 10 warm pages (2 contexts x 5) shared by every grid point
+    async with MapsPagePool(contexts=2, pages_per_context=5) as page_pool:
+        orchestrator = GridSearchOrchestrator(page_pool=page_pool)
+        
+        if adaptive_target:
+            # Coarse 5x5 first, refined only where the target's rank changes
+            results = await orchestrator.perform_adaptive_grid_search(
+                niche=niche,
+                target_business=adaptive_target,
+                city=city,
+                state=state,
+                batch_size=batch_size,
+                run_id=run_id
+            )
+        else:
+            # Example 1: Search using city bounds (recommended)
+            results = await orchestrator.perform_grid_search(
+                niche=niche,
+                city=city,
+                state=state,
+                batch_size=batch_size,  # Max searches in flight
+                run_id=run_id
+            )
     
-    # Example 1: Search using city bounds (recommended)
-    results = await orchestrator.perform_grid_search(
-        niche="medical spa",
-        city="Ashburn",
-        state="VA",
-        batch_size=10  # Run 10 searches concurrently
-    )
+    # Heat maps for the top businesses (unsearched cells of an adaptive run interpolated)
+    results['heat_maps'] = orchestrator.generate_heat_map_data(results)
     
     # Save results
-    output_file = f"grid_search_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    output_file = f"grid_search_{results['execution']['run_id']}.json"
     with open(output_file, 'w') as f:
         json.dump(results, f, indent=2)
     
     print(f"\n✅ Grid search complete! Results saved to {output_file}")
+    print(f"   Throughput: {results['execution']['points_per_second']:.2f} points/sec")
+    if results['execution']['failed']:
+        print(f"   {results['execution']['failed']} points still failing; rerun with --resume {results['execution']['run_id']}")
     
     # Generate heat map for top business
     if results['aggregated']['top_businesses']:
@@ -466,5 +925,24 @@ async def main():
     # )
 
 
+@app.command()
+def run(
+    niche: Optional[str] = typer.Option(None, help="Search term (default: medical spa, or the resumed run's)"),
+    city: str = typer.Option("Ashburn", help='City to cover'),
+    state: str = typer.Option("VA", help='State code'),
+    batch_size: int = typer.Option(10, help='Maximum concurrent searches'),
+    resume: Optional[str] = typer.Option(None, help='Run id of a checkpointed run to finish (reruns only missing/failed points)'),
+    adaptive_target: Optional[str] = typer.Option(None, help='Business name: sample coarse-to-fine around its rank changes instead of the full grid'),
+):
+    """Run a grid search, checkpointing every point"""
+    if resume:
+        # Pick up the resumed run's search (and adaptive target, if it had one)
+        params = GridRunJournal.load(resume).params
+        niche = niche or params.get('niche')
+        adaptive_target = adaptive_target or params.get('target_business')
+    niche = niche or "medical spa"
+    asyncio.run(main(niche, city, state, batch_size, run_id=resume, adaptive_target=adaptive_target))
+
+
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    app()
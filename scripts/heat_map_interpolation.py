@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""
+Heat Map Interpolation - dense rank surfaces from sparse grid samples
+
+Turns the per-point rankings of one business (``grid_rankings`` from
+GridSearchOrchestrator.aggregate_grid_results) into a rank surface at any
+resolution with inverse distance weighting (IDW), vectorized with NumPy.
+
+Two fields are interpolated from the searched points:
+- presence: 1 where the business appeared, 0 where a search ran but it did
+  not; cells whose interpolated presence is below ``presence_threshold`` are
+  reported as absent (None), like unranked points in the sampled grid
+- rank: interpolated only from the points where it appeared, so "not in the
+  results" never gets averaged into a numeric rank
+
+Distances use a local equirectangular projection in miles, which is accurate
+at the scale of a city grid.
+
+Usage:
+    surface = interpolate_rank_surface(business_stat['grid_rankings'], searched_points, resolution=100)
+    ranks = interpolate_at(business_stat['grid_rankings'], unsearched_points, searched_points)
+"""
+import math
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+MILES_PER_DEGREE_LAT = 69.0
+
+
+def _to_miles(lat, lng, origin_lat: float, origin_lng: float):
+    """Project lat/lng arrays to (x, y) miles around an origin"""
+    miles_per_degree_lng = math.cos(math.radians(origin_lat)) * MILES_PER_DEGREE_LAT
+    return (np.asarray(lng) - origin_lng) * miles_per_degree_lng, (np.asarray(lat) - origin_lat) * MILES_PER_DEGREE_LAT
+
+
+def idw(
+    sample_xy: np.ndarray,
+    sample_values: np.ndarray,
+    target_xy: np.ndarray,
+    power: float = 2.0,
+    neighbors: Optional[int] = 12,
+    chunk_size: int = 4096
+) -> np.ndarray:
+    """
+    Inverse distance weighted estimate at each target point
+
+    Args:
+        sample_xy: (n, 2) sample coordinates
+        sample_values: (n,) sample values
+        target_xy: (m, 2) coordinates to estimate
+        power: Distance exponent (higher = more local)
+        neighbors: Use only the k nearest samples (None = all of them)
+        chunk_size: Targets per distance matrix, bounding memory to chunk_size x n
+
+    Returns:
+        (m,) estimates; a target on top of a sample takes that sample's value
+    """
+    sample_xy = np.asarray(sample_xy, dtype=float)
+    sample_values = np.asarray(sample_values, dtype=float)
+    target_xy = np.asarray(target_xy, dtype=float)
+    if len(sample_values) == 0:
+        return np.full(len(target_xy), np.nan)
+    k = len(sample_values) if neighbors is None else min(neighbors, len(sample_values))
+
+    out = np.empty(len(target_xy))
+    for start in range(0, len(target_xy), chunk_size):
+        chunk = target_xy[start:start + chunk_size]
+        dist = np.hypot(chunk[:, None, 0] - sample_xy[None, :, 0], chunk[:, None, 1] - sample_xy[None, :, 1])
+        if k < len(sample_values):
+            nearest = np.argpartition(dist, k - 1, axis=1)[:, :k]
+            dist = np.take_along_axis(dist, nearest, axis=1)
+            values = sample_values[nearest]
+        else:
+            values = np.broadcast_to(sample_values, dist.shape)
+
+        exact = dist < 1e-9
+        with np.errstate(divide='ignore', invalid='ignore'):
+            weights = 1.0 / dist ** power
+            weights[exact] = 0.0
+            estimate = (weights * values).sum(axis=1) / weights.sum(axis=1)
+        # Targets sitting on a sample take its value
+        hit = exact.any(axis=1)
+        estimate[hit] = values[hit, exact[hit].argmax(axis=1)]
+        out[start:start + len(chunk)] = estimate
+    return out
+
+
+def _estimate(
+    grid_rankings: List[Dict],
+    searched_points: Optional[List[Dict]],
+    target_lat: np.ndarray,
+    target_lng: np.ndarray,
+    origin_lat: float,
+    origin_lng: float,
+    power: float,
+    neighbors: Optional[int],
+    presence_threshold: float
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """(rank, presence, absent) estimates at the target coordinates"""
+    target_xy = np.column_stack(_to_miles(target_lat, target_lng, origin_lat, origin_lng))
+
+    ranked_xy = np.column_stack(_to_miles(
+        [r['lat'] for r in grid_rankings], [r['lng'] for r in grid_rankings], origin_lat, origin_lng
+    )) if grid_rankings else np.empty((0, 2))
+    rank_values = np.array([r['rank'] for r in grid_rankings], dtype=float)
+
+    if searched_points:
+        # Presence indicator over every searched point (1 = business in results)
+        ranked_at = {(round(r['lat'], 6), round(r['lng'], 6)) for r in grid_rankings}
+        searched_xy = np.column_stack(_to_miles(
+            [p['lat'] for p in searched_points], [p['lng'] for p in searched_points], origin_lat, origin_lng
+        ))
+        present = np.array([
+            1.0 if (round(p['lat'], 6), round(p['lng'], 6)) in ranked_at else 0.0 for p in searched_points
+        ])
+        presence = idw(searched_xy, present, target_xy, power, neighbors)
+    else:
+        presence = np.ones(len(target_xy))
+
+    ranks = idw(ranked_xy, rank_values, target_xy, power, neighbors)
+    absent = (presence < presence_threshold) | np.isnan(ranks)
+    return ranks, presence, absent
+
+
+def interpolate_at(
+    grid_rankings: List[Dict],
+    targets: List[Dict],
+    searched_points: Optional[List[Dict]] = None,
+    power: float = 2.0,
+    neighbors: Optional[int] = 12,
+    presence_threshold: float = 0.5
+) -> List[Optional[float]]:
+    """
+    Rank estimates at explicit points (e.g. the unsearched points of a grid)
+
+    Args:
+        grid_rankings: Points where the business ranked ({'lat', 'lng', 'rank'})
+        targets: Points to estimate ({'lat', 'lng'})
+        searched_points: Every successfully searched point (see interpolate_rank_surface)
+        power: IDW distance exponent
+        neighbors: Nearest samples per target (None = all)
+        presence_threshold: Interpolated presence below which a target is absent
+
+    Returns:
+        One rank per target (rounded to 0.1), None where the business is absent
+    """
+    if not targets:
+        return []
+    points = searched_points if searched_points else grid_rankings
+    if not points:
+        raise ValueError("Nothing to interpolate: no searched points or rankings")
+    origin_lat = sum(p['lat'] for p in points) / len(points)
+    origin_lng = sum(p['lng'] for p in points) / len(points)
+    ranks, _, absent = _estimate(
+        grid_rankings, searched_points,
+        np.array([t['lat'] for t in targets], dtype=float), np.array([t['lng'] for t in targets], dtype=float),
+        origin_lat, origin_lng, power, neighbors, presence_threshold
+    )
+    return [None if is_absent else round(float(rank), 1) for rank, is_absent in zip(ranks, absent)]
+
+
+def interpolate_rank_surface(
+    grid_rankings: List[Dict],
+    searched_points: Optional[List[Dict]] = None,
+    resolution: int = 100,
+    shape: Optional[Tuple[int, int]] = None,
+    bounds: Optional[Dict] = None,
+    power: float = 2.0,
+    neighbors: Optional[int] = 12,
+    presence_threshold: float = 0.5
+) -> Dict:
+    """
+    Dense rank surface for one business
+
+    Args:
+        grid_rankings: Points where the business ranked ({'lat', 'lng', 'rank'})
+        searched_points: Every successfully searched point ({'lat', 'lng'}); without
+            it the business is assumed present everywhere it's interpolated
+        resolution: Cells along the longer side of the bounds
+        shape: Exact (rows, cols) instead of resolution
+        bounds: {'northeast': {lat, lng}, 'southwest': {lat, lng}} (default:
+            extent of the searched points)
+        power: IDW distance exponent
+        neighbors: Nearest samples per cell (None = all)
+        presence_threshold: Interpolated presence below which a cell is absent
+
+    Returns:
+        Dictionary with the cell center lats/lngs, the rank surface (rows
+        south to north, None = absent) and the presence surface
+    """
+    points = searched_points if searched_points else grid_rankings
+    if not points:
+        raise ValueError("Nothing to interpolate: no searched points or rankings")
+
+    if bounds is None:
+        bounds = {
+            'southwest': {'lat': min(p['lat'] for p in points), 'lng': min(p['lng'] for p in points)},
+            'northeast': {'lat': max(p['lat'] for p in points), 'lng': max(p['lng'] for p in points)}
+        }
+    sw, ne = bounds['southwest'], bounds['northeast']
+    origin_lat = (sw['lat'] + ne['lat']) / 2
+    origin_lng = (sw['lng'] + ne['lng']) / 2
+
+    # Square-ish cells: resolution along the longer side in miles
+    width, height = _to_miles(ne['lat'], ne['lng'], sw['lat'], sw['lng'])
+    resolution = max(2, resolution)
+    if shape:
+        rows, cols = shape
+    elif width >= height:
+        cols = resolution
+        rows = max(2, round(resolution * height / width)) if width > 0 else resolution
+    else:
+        rows = resolution
+        cols = max(2, round(resolution * width / height)) if height > 0 else resolution
+    lats = np.linspace(sw['lat'], ne['lat'], rows)
+    lngs = np.linspace(sw['lng'], ne['lng'], cols)
+    grid_lat, grid_lng = np.meshgrid(lats, lngs, indexing='ij')
+    ranks, presence, absent = _estimate(
+        grid_rankings, searched_points, grid_lat.ravel(), grid_lng.ravel(),
+        origin_lat, origin_lng, power, neighbors, presence_threshold
+    )
+
+    rank_grid = np.round(ranks, 1).reshape(rows, cols)
+    absent_grid = absent.reshape(rows, cols)
+    return {
+        'resolution': {'rows': rows, 'cols': cols},
+        'bounds': bounds,
+        'lats': np.round(lats, 6).tolist(),
+        'lngs': np.round(lngs, 6).tolist(),
+        'ranks': [
+            [None if is_absent else float(rank) for rank, is_absent in zip(rank_row, absent_row)]
+            for rank_row, absent_row in zip(rank_grid, absent_grid)
+        ],
+        'presence': np.round(presence, 3).reshape(rows, cols).tolist(),
+        'method': {'type': 'idw', 'power': power, 'neighbors': neighbors, 'presence_threshold': presence_threshold}
+    }
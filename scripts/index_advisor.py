@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+Index Advisor for the leads access paths
+Runs EXPLAIN (ANALYZE, BUFFERS) for every query shape the funnel API issues
+against `leads`, optionally applies migrations/create_leads_lookup_indexes.sql,
+and reports the plans before and after so sequential scans are easy to spot.
+The city/niche key paths need migrations/add_normalized_market_keys.sql and the
+name lookups migrations/create_business_name_search_index.sql.
+
+Usage:
+    python index_advisor.py report
+    python index_advisor.py apply --city Austin --state TX --niche "med spas"
+"""
+
+import os
+import re
+import sys
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import psycopg
+from psycopg.rows import dict_row
+import typer
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'api'))
+
+from name_search import name_match_params, name_match_sql
+
+app = typer.Typer(help='Explain and index the funnel API query patterns on leads')
+
+INDEX_MIGRATION = Path(__file__).resolve().parent.parent / 'migrations' / 'create_leads_lookup_indexes.sql'
+KEYS_MIGRATION = Path(__file__).resolve().parent.parent / 'migrations' / 'add_normalized_market_keys.sql'
+
+# Query shapes mirrored from api/funnel_api.py and api/market_intelligence.py
+ACCESS_PATHS = [
+    ('business by name', name_match_sql()),
+    ('business by name + city', name_match_sql(in_city=True)),
+    (
+        'top 3 competitors',
+        """
+            SELECT id, business_name, local_pack_rank, rating, review_count::int AS review_count,
+                   city, state, website, phone, street_address
+            FROM leads
+            WHERE niche_key = normalize_niche_key(%(niche)s) AND city_key = normalize_market_key(%(city)s)
+            AND local_pack_rank BETWEEN 1 AND 3 AND state = %(state)s
+            ORDER BY local_pack_rank ASC
+            LIMIT 3
+        """,
+    ),
+    (
+        'first lead in niche/city',
+        """
+            SELECT id, business_name, review_count FROM leads
+            WHERE (niche_key IS NULL OR niche_key = normalize_niche_key(%(niche)s))
+            AND city_key = normalize_market_key(%(city)s)
+            ORDER BY review_count DESC NULLS LAST
+            LIMIT 1
+        """,
+    ),
+    (
+        'market top 10',
+        """
+            SELECT business_name, rating, review_count, local_pack_rank, website,
+                   pricing_botox, instagram_handle, owner_name
+            FROM leads
+            WHERE city = %(city)s AND state = %(state)s
+            AND (search_niche ILIKE %(niche_pattern)s OR search_niche IS NULL)
+            ORDER BY review_count DESC NULLS LAST
+            LIMIT 10
+        """,
+    ),
+    (
+        'market review ranks',
+        """
+            SELECT business_name, review_count,
+                   RANK() OVER (ORDER BY review_count DESC NULLS LAST) as review_rank
+            FROM leads
+            WHERE city = %(city)s AND state = %(state)s
+        """,
+    ),
+    (
+        'business percentile',
+        """
+            SELECT business_name, review_count, rating, local_pack_rank
+            FROM leads
+            WHERE business_name = %(name)s AND city = %(city)s AND state = %(state)s
+            LIMIT 1
+        """,
+    ),
+]
+
+
+def connect(dsn: Optional[str]):
+    dsn = dsn or os.getenv('DATABASE_URL')
+    if not dsn:
+        print("ERROR: DATABASE_URL not found")
+        raise typer.Exit(1)
+    return psycopg.connect(dsn, autocommit=True, row_factory=dict_row)
+
+
+def sample_params(conn, name: Optional[str], city: Optional[str], state: Optional[str], niche: Optional[str]) -> Dict[str, Any]:
+    """Fill any missing parameter from the largest-review lead in the table"""
+    if not (name and city and state and niche):
+        row = conn.execute("""
+            SELECT business_name, city, state, search_niche FROM leads
+            WHERE city IS NOT NULL AND state IS NOT NULL AND search_niche IS NOT NULL
+            ORDER BY review_count DESC NULLS LAST
+            LIMIT 1
+        """).fetchone() or {}
+        name = name or row.get('business_name') or ''
+        city = city or row.get('city') or ''
+        state = state or row.get('state') or ''
+        niche = niche or row.get('search_niche') or ''
+    return {
+        **name_match_params(name, city),
+        'name': name,
+        'city': city,
+        'state': state,
+        'niche': niche,
+        'niche_pattern': f'%{niche}%',
+    }
+
+
+def walk(node: Dict[str, Any]):
+    yield node
+    for child in node.get('Plans', []):
+        yield from walk(child)
+
+
+def explain(conn, sql: str, params: Dict[str, Any]) -> Dict[str, Any]:
+    """EXPLAIN ANALYZE one query and summarize the scans it used"""
+    row = conn.execute(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {sql}", params).fetchone()
+    plan = row['QUERY PLAN'][0]
+    scans = []
+    for node in walk(plan['Plan']):
+        if 'Scan' in node['Node Type'] and node.get('Relation Name') == 'leads':
+            scans.append(node['Node Type'] + (f" ({node['Index Name']})" if node.get('Index Name') else ''))
+    return {
+        'execution_ms': plan['Execution Time'],
+        'shared_blocks': plan['Plan'].get('Shared Hit Blocks', 0) + plan['Plan'].get('Shared Read Blocks', 0),
+        'scans': scans,
+        'seq_scan': any(scan.startswith('Seq Scan') for scan in scans),
+    }
+
+
+def report(conn, params: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    return {label: explain(conn, sql, params) for label, sql in ACCESS_PATHS}
+
+
+def print_report(title: str, results: Dict[str, Dict[str, Any]]):
+    print(f"\n{title}")
+    print("-" * 80)
+    for label, result in results.items():
+        flag = "⚠️ " if result['seq_scan'] else "✅"
+        print(f"{flag} {label:<24} {result['execution_ms']:9.2f} ms  "
+              f"{result['shared_blocks']:>7} blocks  {', '.join(result['scans']) or '-'}")
+
+
+def has_market_keys(conn) -> bool:
+    """True once add_normalized_market_keys.sql has added leads.city_key / niche_key"""
+    row = conn.execute("""
+        SELECT COUNT(*) AS found FROM information_schema.columns
+        WHERE table_name = 'leads' AND column_name IN ('city_key', 'niche_key')
+    """).fetchone()
+    return row['found'] == 2
+
+
+def migration_statements() -> List[str]:
+    """Split the index migration into single statements (it contains no functions)"""
+    sql = re.sub(r'--[^\n]*', '', INDEX_MIGRATION.read_text())
+    return [stmt.strip() for stmt in sql.split(';') if stmt.strip()]
+
+
+@app.command('report')
+def report_command(
+    dsn: Optional[str] = typer.Option(None, help='Postgres DSN (defaults to DATABASE_URL)'),
+    name: Optional[str] = typer.Option(None, help='Business name to look up'),
+    city: Optional[str] = typer.Option(None),
+    state: Optional[str] = typer.Option(None),
+    niche: Optional[str] = typer.Option(None),
+):
+    """Show current plans for every access path"""
+    with connect(dsn) as conn:
+        params = sample_params(conn, name, city, state, niche)
+        print_report(f"CURRENT PLANS ({params['name']} / {params['city']}, {params['state']} / {params['niche']})",
+                     report(conn, params))
+
+
+@app.command('apply')
+def apply_command(
+    dsn: Optional[str] = typer.Option(None, help='Postgres DSN (defaults to DATABASE_URL)'),
+    name: Optional[str] = typer.Option(None, help='Business name to look up'),
+    city: Optional[str] = typer.Option(None),
+    state: Optional[str] = typer.Option(None),
+    niche: Optional[str] = typer.Option(None),
+):
+    """Create the lookup indexes and compare plans before/after"""
+    with connect(dsn) as conn:
+        if not has_market_keys(conn):
+            print(f"ERROR: leads.city_key / niche_key missing; apply {KEYS_MIGRATION.name} first")
+            raise typer.Exit(1)
+        params = sample_params(conn, name, city, state, niche)
+        before = report(conn, params)
+        print_report("BEFORE", before)
+
+        print(f"\n🔧 Applying {INDEX_MIGRATION.name}...")
+        for stmt in migration_statements():
+            print(f"   {stmt.splitlines()[0]}")
+            conn.execute(stmt)
+
+        after = report(conn, params)
+        print_report("AFTER", after)
+
+    print("\nSPEEDUP")
+    print("-" * 80)
+    for label in before:
+        b, a = before[label]['execution_ms'], after[label]['execution_ms']
+        print(f"{label:<24} {b:9.2f} ms -> {a:9.2f} ms  ({b / a if a else 0:.1f}x)")
+
+
+if __name__ == '__main__':
+    app()
@@ -0,0 +1,343 @@
+#!/usr/bin/env python3
+"""
+Maps Page Pool - warm Chromium pages reused across grid searches
+
+A grid run leases one page per grid point instead of opening (and closing)
+a page or browser context for every search:
+- Pages live in ``contexts`` browser contexts of ``pages_per_context`` pages
+  each, opened on first lease and kept warm between points
+- A page is closed and reopened after ``max_page_uses`` searches, and its
+  whole context is replaced after ``max_context_uses`` (cookies, cache and
+  renderer memory don't pile up over a long run)
+- A lease that raises, or whose page was ``discard``-ed, closes that page and
+  the slot gets a fresh one next time; if the pool's own browser crashes it
+  is relaunched on the next lease
+
+Usage:
+    async with MapsPagePool(contexts=5, pages_per_context=10) as pool:
+        async with pool.page() as page:
+            results = await search_maps_at(page, 'medical spa', point)
+"""
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional
+from urllib.parse import quote_plus
+
+from playwright.async_api import async_playwright
+
+BROWSER_ARGS = [
+    '--no-sandbox',
+    '--disable-setuid-sandbox',
+    '--disable-dev-shm-usage',
+    '--disable-gpu',
+    '--disable-background-timer-throttling',
+    '--disable-backgrounding-occluded-windows',
+    '--disable-renderer-backgrounding'
+]
+
+MAPS_SEARCH_URL = "https://www.google.com/maps/search/{query}/@{lat},{lng},{zoom}z"
+
+CARD_SELECTOR = '[role="article"], .Nv2PK'
+FEED_SCROLLS = 5
+FEED_SCROLL_WAIT_MS = 2000  # per scroll, for lazy-loaded cards to appear
+
+# Same card extraction as grid_search_169_tabs_batched.py
+EXTRACT_RESULTS_JS = '''() => {
+    const businesses = [];
+    const cards = document.querySelectorAll('[role="article"], .Nv2PK');
+    for (let i = 0; i < cards.length; i++) {
+        const card = cards[i];
+        const name = card.querySelector('.fontHeadlineSmall, .qBF1Pd')?.textContent ||
+                     card.getAttribute('aria-label')?.split(',')[0] || '';
+        if (!name) continue;
+        let rating = 0;
+        let reviews = 0;
+        const ratingEl = card.querySelector('[role="img"][aria-label*="star"]');
+        if (ratingEl) {
+            const ariaLabel = ratingEl.getAttribute('aria-label') || '';
+            const ratingMatch = ariaLabel.match(/([0-9.]+)/);
+            const reviewMatch = ariaLabel.match(/\\(([0-9,]+)\\)/);
+            if (ratingMatch) rating = parseFloat(ratingMatch[1]);
+            if (reviewMatch) reviews = parseInt(reviewMatch[1].replace(/,/g, ''));
+        }
+        businesses.push({rank: businesses.length + 1, name: name.trim(), rating: rating, reviews: reviews});
+    }
+    return businesses;
+}'''
+
+COUNT_CARDS_JS = f"() => document.querySelectorAll('{CARD_SELECTOR}').length"
+CARDS_GREW_JS = f"count => document.querySelectorAll('{CARD_SELECTOR}').length > count"
+
+# Maps' own empty state ("Google Maps can't find ...")
+NO_RESULTS_JS = r"() => /can[\u2019']t find|no results found/i.test(document.body ? document.body.innerText : '')"
+
+PLACE_NAME_JS = "() => document.querySelector('h1')?.textContent?.trim() || ''"
+
+
+class MapsSearchFailed(Exception):
+    """
+    Raised when a search page shows neither results nor Maps' no-results
+    state (captcha, consent wall, slow load), so the point counts as failed
+    instead of as a successful empty search
+    """
+
+
+class _PooledContext:
+    """One browser context plus the bookkeeping needed to retire it safely"""
+
+    def __init__(self, context):
+        self.context = context
+        self.uses = 0
+        self.leased = 0
+        self.retired = False
+
+
+class _PageSlot:
+    def __init__(self, group: int):
+        self.group = group  # index of the context this slot's page belongs to
+        self.ctx: Optional[_PooledContext] = None
+        self.page = None
+        self.uses = 0
+
+
+class MapsPagePool:
+    """Fixed set of warm pages, leased one search at a time"""
+
+    def __init__(
+        self,
+        contexts: int = 5,
+        pages_per_context: int = 10,
+        max_page_uses: int = 25,
+        max_context_uses: int = 100,
+        browser=None,
+        headless: bool = True,
+        page_timeout_ms: int = 30000
+    ):
+        """
+        Args:
+            contexts: Number of browser contexts
+            pages_per_context: Pages per context (pool size is contexts * pages_per_context)
+            max_page_uses: Searches before a page is closed and reopened
+            max_context_uses: Searches before a context is replaced
+            browser: Existing Playwright browser to open contexts in (the pool
+                then never launches or closes a browser itself)
+            headless: Launch mode when the pool owns its browser
+            page_timeout_ms: Default timeout for page operations
+        """
+        self.contexts = max(1, contexts)
+        self.pages_per_context = max(1, pages_per_context)
+        self.max_page_uses = max(1, max_page_uses)
+        self.max_context_uses = max(1, max_context_uses)
+        self.headless = headless
+        self.page_timeout_ms = page_timeout_ms
+        self._browser = browser
+        self._owns_browser = browser is None
+        self._playwright = None
+        self._current: List[Optional[_PooledContext]] = [None] * self.contexts
+        self._context_locks = [asyncio.Lock() for _ in range(self.contexts)]
+        self._slots: Optional[asyncio.Queue] = None
+        self._discarded = set()
+        self._lock = asyncio.Lock()
+        self.counters = {
+            'launches': 0,
+            'contexts_created': 0,
+            'contexts_recycled': 0,
+            'pages_created': 0,
+            'pages_recycled': 0,
+            'pages_discarded': 0,
+            'leases': 0
+        }
+
+    @property
+    def size(self) -> int:
+        return self.contexts * self.pages_per_context
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def start(self):
+        """Launch the browser if the pool owns one (idempotent; relaunches after a crash)"""
+        async with self._lock:
+            if self._slots is None:
+                self._slots = asyncio.Queue()
+                for group in range(self.contexts):
+                    for _ in range(self.pages_per_context):
+                        self._slots.put_nowait(_PageSlot(group))
+            if not self._owns_browser or (self._browser is not None and self._browser.is_connected()):
+                return
+            if self._browser is not None:
+                print("⚠️ Browser disconnected, relaunching...")
+                await self._stop_browser()
+                # Every context died with the browser; slots reopen pages lazily
+                self._current = [None] * self.contexts
+            self._playwright = await async_playwright().start()
+            self._browser = await self._playwright.chromium.launch(headless=self.headless, args=BROWSER_ARGS)
+            self.counters['launches'] += 1
+
+    async def _context_for(self, group: int) -> _PooledContext:
+        async with self._context_locks[group]:
+            ctx = self._current[group]
+            if ctx is None:
+                context = await self._browser.new_context(viewport={'width': 1280, 'height': 720})
+                ctx = self._current[group] = _PooledContext(context)
+                self.counters['contexts_created'] += 1
+            return ctx
+
+    @asynccontextmanager
+    async def page(self):
+        """
+        Lease a page for one search; it goes back to the pool afterwards, or
+        is closed and replaced if the search raised or the page was discarded
+        """
+        await self.start()
+        slots = self._slots
+        slot = await slots.get()
+        ctx = None
+        healthy = False
+        try:
+            ctx = await self._context_for(slot.group)
+            if slot.ctx is not ctx:
+                # The slot's old page went away with its retired context
+                slot.ctx, slot.page, slot.uses = ctx, None, 0
+            ctx.leased += 1
+            if slot.page is None or slot.page.is_closed():
+                slot.page = await ctx.context.new_page()
+                slot.page.set_default_timeout(self.page_timeout_ms)
+                slot.uses = 0
+                self.counters['pages_created'] += 1
+            self.counters['leases'] += 1
+            yield slot.page
+            healthy = True
+        finally:
+            await self._release(slot, ctx, healthy)
+            slots.put_nowait(slot)
+
+    def discard(self, page):
+        """Have a leased page closed on release instead of reused (e.g. after a failed search)"""
+        self._discarded.add(id(page))
+
+    async def _release(self, slot: _PageSlot, ctx: Optional[_PooledContext], healthy: bool):
+        page = slot.page
+        if page is not None:
+            slot.uses += 1
+            discarded = id(page) in self._discarded
+            self._discarded.discard(id(page))
+            if not healthy or discarded or page.is_closed():
+                self.counters['pages_discarded'] += 1
+                slot.page = None
+                await self._close(page)
+            elif slot.uses >= self.max_page_uses:
+                self.counters['pages_recycled'] += 1
+                slot.page = None
+                await self._close(page)
+        if ctx is not None and slot.ctx is ctx:
+            ctx.leased -= 1
+            ctx.uses += 1
+            if ctx.uses >= self.max_context_uses and not ctx.retired:
+                # New leases in this group open a fresh context; the old
+                # one closes once its last leased page comes back
+                ctx.retired = True
+                if self._current[slot.group] is ctx:
+                    self._current[slot.group] = None
+                self.counters['contexts_recycled'] += 1
+            if ctx.retired and ctx.leased == 0:
+                await self._close(ctx.context)
+
+    @staticmethod
+    async def _close(resource):
+        try:
+            await resource.close()
+        except Exception:
+            pass
+
+    async def _stop_browser(self):
+        for resource, method in ((self._browser, 'close'), (self._playwright, 'stop')):
+            if resource is not None:
+                try:
+                    await getattr(resource, method)()
+                except Exception:
+                    pass
+        self._browser = None
+        self._playwright = None
+
+    async def close(self):
+        """Close every context (and the browser, if the pool launched it)"""
+        async with self._lock:
+            if self._slots is not None:
+                while not self._slots.empty():
+                    slot = self._slots.get_nowait()
+                    if slot.ctx is not None:
+                        await self._close(slot.ctx.context)
+                self._slots = None
+            for ctx in self._current:
+                if ctx is not None:
+                    await self._close(ctx.context)
+            self._current = [None] * self.contexts
+            if self._owns_browser:
+                await self._stop_browser()
+
+    def stats(self) -> Dict:
+        return {'size': self.size, **self.counters}
+
+
+async def search_maps_at(
+    page,
+    query: str,
+    point: Dict,
+    zoom: int = 15,
+    max_results: Optional[int] = 20
+) -> List[Dict]:
+    """
+    Run a Maps search centered on a grid point and return the ranked local
+    result cards (max_results=None keeps everything the scrolls loaded).
+    Raises MapsSearchFailed on a page without results or Maps' no-results
+    state, and any page error, so the pool replaces the page and the point
+    is retried
+    """
+    url = MAPS_SEARCH_URL.format(query=quote_plus(query), lat=point['lat'], lng=point['lng'], zoom=zoom)
+    await page.goto(url, wait_until='domcontentloaded')
+    try:
+        await page.wait_for_selector(f'[role="feed"], {CARD_SELECTOR}', timeout=15000)
+    except Exception:
+        return await _results_without_feed(page)
+
+    # Scroll the feed to load more results
+    feed = await page.query_selector('[role="feed"]') or await page.query_selector('.m6QErb')
+    if feed:
+        await _scroll_feed(page, feed, max_results)
+
+    results = await page.evaluate(EXTRACT_RESULTS_JS)
+    return results[:max_results] if max_results else results
+
+
+async def _scroll_feed(page, feed, max_results: Optional[int]):
+    """Scroll until max_results cards are loaded or a scroll loads nothing new"""
+    for _ in range(FEED_SCROLLS):
+        count = await page.evaluate(COUNT_CARDS_JS)
+        if max_results and count >= max_results:
+            return
+        await feed.evaluate('element => element.scrollTop = element.scrollHeight')
+        try:
+            await page.wait_for_function(CARDS_GREW_JS, arg=count, timeout=FEED_SCROLL_WAIT_MS)
+        except Exception:
+            # Nothing new within the wait: end of the list
+            return
+
+
+async def _results_without_feed(page) -> List[Dict]:
+    """
+    A page that never showed a result list: a single-place redirect ranks
+    that place first and Maps' no-results state is a genuine empty search;
+    anything else raises MapsSearchFailed
+    """
+    if '/maps/place/' in page.url:
+        name = await page.evaluate(PLACE_NAME_JS)
+        if name:
+            return [{'rank': 1, 'name': name, 'rating': 0, 'reviews': 0}]
+    if await page.evaluate(NO_RESULTS_JS):
+        return []
+    raise MapsSearchFailed(f"Maps search page showed no results list: {page.url}")
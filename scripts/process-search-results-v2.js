@@ -274,6 +274,13 @@ async function processSearchResults() {
     console.log(`   Total leads (enriched): ${leadCount[0].count}`);
     console.log(`   Total prospects (unenriched): ${prospectCount[0].count}`);
 
+    // Market aggregates served by the funnel API are cached; drop them so new
+    // leads show up immediately (see api/cache.py)
+    if (stats.leadsInserted + stats.leadsUpdated > 0) {
+      await refreshMarketCentroids();
+      await invalidateMarketCache();
+    }
+
     process.exit(0);
 
   } catch (error) {
@@ -282,5 +289,29 @@ async function processSearchResults() {
   }
 }
 
+async function refreshMarketCentroids() {
+  // Nearest-market competitor fallback (migrations/create_market_centroids_table.sql)
+  try {
+    const result = await sql`SELECT refresh_market_centroids() as markets`;
+    console.log(`\n📍 Market centroids refreshed (${result[0].markets} markets)`);
+  } catch (e) {
+    console.log(`\n⚠️ Could not refresh market centroids: ${e.message}`);
+  }
+}
+
+async function invalidateMarketCache() {
+  const apiUrl = process.env.FUNNEL_API_URL || 'http://localhost:8000';
+  try {
+    const response = await fetch(`${apiUrl}/api/cache/invalidate`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({}),
+    });
+    console.log(`\n🧹 Market cache invalidated (${response.status})`);
+  } catch (e) {
+    console.log(`\n⚠️ Could not invalidate market cache at ${apiUrl}: ${e.message}`);
+  }
+}
+
 // Run the processor
 processSearchResults();
\ No newline at end of file
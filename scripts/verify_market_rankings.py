@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Verify market rankings
+Regression check for the window-function review_rank in MARKET_INTELLIGENCE_SQL:
+replays the original correlated-subquery ranking for the largest markets and
+asserts both produce the same (reviews, position) sequence.
+
+Usage:
+    python verify_market_rankings.py --markets 25 --niche "med spa"
+"""
+
+import os
+import sys
+import time
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import psycopg
+import typer
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'api'))
+
+from market_intelligence import (
+    MARKET_INTELLIGENCE_SQL,
+    MARKET_RANKINGS_LIMIT,
+    build_market_intelligence,
+    market_intelligence_params,
+)
+
+app = typer.Typer(help='Compare window-function market rankings with the legacy correlated subquery')
+
+# Section 6 of get_market_intelligence before the window-function rewrite
+LEGACY_RANKINGS_SQL = """
+    SELECT
+        business_name,
+        review_count,
+        (SELECT COUNT(*) + 1 FROM leads l2
+         WHERE l2.city = l1.city AND l2.state = l1.state
+         AND l2.review_count > l1.review_count) as review_rank
+    FROM leads l1
+    WHERE city = %s AND state = %s
+    AND (search_niche ILIKE %s OR search_niche IS NULL)
+    ORDER BY review_count DESC
+"""
+
+
+def legacy_rankings(cur, city: str, state: str, niche: str) -> List[Tuple[int, int]]:
+    cur.execute(LEGACY_RANKINGS_SQL, (city, state, f'%{niche}%'))
+    return [(row[1] or 0, row[2]) for row in cur.fetchall()][:MARKET_RANKINGS_LIMIT]
+
+
+def window_rankings(cur, city: str, state: str, niche: str) -> List[Tuple[int, int]]:
+    cur.execute(MARKET_INTELLIGENCE_SQL, market_intelligence_params(city, state, niche))
+    market_data = build_market_intelligence(cur.fetchone())
+    return [(r['reviews'], r['position']) for r in market_data['market_rankings']]
+
+
+@app.command()
+def main(
+    dsn: Optional[str] = typer.Option(None, help='Postgres DSN (defaults to DATABASE_URL)'),
+    markets: int = typer.Option(25, help='Number of largest (city, state) markets to check'),
+    niche: str = typer.Option('med spa', help='Niche filter'),
+    schema: str = typer.Option('public', help="Schema holding leads (e.g. 'bench_market')"),
+):
+    """Fail if any market's rankings differ from the legacy query"""
+    dsn = dsn or os.getenv('DATABASE_URL')
+    if not dsn:
+        print("ERROR: DATABASE_URL not found")
+        raise typer.Exit(1)
+
+    print("=" * 80)
+    print("MARKET RANKINGS VERIFICATION")
+    print("=" * 80)
+
+    mismatches = []
+    with psycopg.connect(dsn, options=f'-c search_path={schema}') as conn:
+        cur = conn.cursor()
+        cur.execute("""
+            SELECT city, state, COUNT(*) as total
+            FROM leads
+            WHERE city IS NOT NULL AND state IS NOT NULL
+            GROUP BY city, state
+            ORDER BY total DESC
+            LIMIT %s
+        """, (markets,))
+        for city, state, total in cur.fetchall():
+            started = time.perf_counter()
+            expected = legacy_rankings(cur, city, state, niche)
+            legacy_ms = (time.perf_counter() - started) * 1000
+
+            started = time.perf_counter()
+            actual = window_rankings(cur, city, state, niche)
+            window_ms = (time.perf_counter() - started) * 1000
+
+            status = "✅" if actual == expected else "❌"
+            print(f"{status} {city}, {state} ({total:,} leads): "
+                  f"legacy {legacy_ms:.1f} ms, window {window_ms:.1f} ms")
+            if actual != expected:
+                mismatches.append((city, state, expected, actual))
+
+    if mismatches:
+        print(f"\n❌ {len(mismatches)} market(s) differ")
+        for city, state, expected, actual in mismatches:
+            print(f"   {city}, {state}\n     legacy: {expected}\n     window: {actual}")
+        raise typer.Exit(1)
+    print("\n✅ Rankings match the legacy query for every market")
+
+
+if __name__ == '__main__':
+    app()